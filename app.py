@@ -1,17 +1,27 @@
+import time
+_started = time.perf_counter()  # Time to first paint is measured from here
+
 import streamlit as st
 from config import SHEET_ID, RANGE_NAME
-from services.google_services import fetch_sheet_data
+from utils.sheet_data import get_sheet_data
 from utils.contact_controller import (
-    process_contact, regenerate_email, next_contact, jump_to_line,
-    save_to_drafts, send_email_action, send_linkedin_message_action
+    process_contact, regenerate_email, next_contact, jump_to_line, current_contact,
+    save_to_drafts, send_email_action, send_linkedin_message_action, render_action_status
 )
 from utils.session_state import init_session_state
+from utils.dashboard import render_performance_sidebar
+from utils.startup import record_import_time, record_first_paint, start_warmup
+from utils.tracing import use_session_recorder
+
+# The SDKs load on first use, so this only covers the app's own modules (first run only)
+record_import_time(time.perf_counter() - _started)
 
 # Initialize session state variables
 init_session_state(st)
+use_session_recorder(st.session_state.trace)
 
-# Fetch data from Google Sheets
-rows = fetch_sheet_data(SHEET_ID, RANGE_NAME)
+# Log in to Google, Gemini and LinkedIn in the background while the page draws
+start_warmup()
 
 # Display the logo and the tool title side by side
 col1, col2, col3 = st.columns([1, 3, 1])  # Adjusted for centering
@@ -29,34 +39,43 @@ with col2:
 
 # Add a separator below the title and logo
 st.divider()
+record_first_paint(st, _started)
+
+# Load contacts from Google Sheets (cached across reruns, re-read only when the sheet changes)
+with st.spinner("Loading contacts..."):
+    rows = get_sheet_data(SHEET_ID, RANGE_NAME)
+
+# Sends run in the background; show their results as they finish
+render_action_status(st)
 
 # Main app logic
 if st.session_state.cancelled:
     st.write("Processing has been cancelled.")
 else:
-    # Process the current contact
-    process_contact(st.session_state.current_index, rows, st)
+    # Process the current contact; its actions are disabled while another operator holds the row
+    actionable = process_contact(st.session_state.current_index, rows, st)
 
     # Button section for actions
     col1, col2, col3, col4, col5 = st.columns(5)
 
     with col1:
-        if st.button("Try Again", key='try_again'):
+        if st.button("Try Again", key='try_again', disabled=not actionable):
             regenerate_email(st, rows)
     with col2:
-        if st.button("Save to Drafts", key='save_to_drafts'):
+        if st.button("Save to Drafts", key='save_to_drafts', disabled=not actionable):
             save_to_drafts(st, rows)
     with col3:
-        if st.button("Send Email", key='send_email'):
+        if st.button("Send Email", key='send_email', disabled=not actionable):
             send_email_action(st, rows)  # "Send Email" button now only exists here
     with col4:
         # Only show "Send via LinkedIn" if a valid LinkedIn profile (urn_id) exists
-        if 'profile' in st.session_state and st.session_state.profile and st.session_state.profile.get('urn_id'):
+        profile = (current_contact(st, rows) or {}).get('profile') if actionable else None
+        if profile and profile.get('urn_id'):
             if st.button("Send via LinkedIn", key='send_linkedin'):
                 send_linkedin_message_action(st, rows)
     with col5:
         if st.button("Next", key='next_contact'):
-            next_contact(st)
+            next_contact(st, rows)
 
     # Jump to line at the bottom, in one line
     col_jump1, col_jump2, col_jump3 = st.columns([1, 1, 2])
@@ -67,3 +86,6 @@ else:
         st.selectbox("", list(range(1, len(rows) + 1)), key='jump_to_line', on_change=lambda: jump_to_line(st, rows))
     with col_jump3:
         st.text_input("Or enter line:", key='jump_to_line_manual', on_change=lambda: jump_to_line(st, rows))
+
+# Prefetch, cache and latency figures
+render_performance_sidebar(st)
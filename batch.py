@@ -0,0 +1,43 @@
+# batch.py
+#
+# Headless campaign runner: processes a whole sheet range without the Streamlit UI.
+#
+#   python batch.py --mode draft --checkpoint campaign.jsonl
+#   python batch.py --mode send --start 100 --end 2000 --gemini-workers 8
+
+import argparse
+from config import SHEET_ID, RANGE_NAME
+from utils.sheet_data import get_sheet_data
+from utils.batch_runner import (
+    BatchRunner, Checkpoint, format_summary,
+    BATCH_LINKEDIN_WORKERS, BATCH_GEMINI_WORKERS, BATCH_GMAIL_WORKERS,
+)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the outreach pipeline over a sheet range.")
+    parser.add_argument('--mode', choices=['draft', 'send'], default='draft',
+                        help="save Gmail drafts (default) or send and mark the sheet")
+    parser.add_argument('--start', type=int, default=1, help="first sheet line to process (1-based, as in the app)")
+    parser.add_argument('--end', type=int, default=None, help="last sheet line to process (inclusive)")
+    parser.add_argument('--checkpoint', default='batch_checkpoint.jsonl',
+                        help="progress file; rerun with the same file to resume after a crash")
+    parser.add_argument('--linkedin-workers', type=int, default=BATCH_LINKEDIN_WORKERS)
+    parser.add_argument('--gemini-workers', type=int, default=BATCH_GEMINI_WORKERS)
+    parser.add_argument('--gmail-workers', type=int, default=BATCH_GMAIL_WORKERS)
+    args = parser.parse_args()
+
+    rows = get_sheet_data(SHEET_ID, RANGE_NAME)
+    runner = BatchRunner(
+        mode=args.mode,
+        linkedin_workers=args.linkedin_workers,
+        gemini_workers=args.gemini_workers,
+        gmail_workers=args.gmail_workers,
+        checkpoint=Checkpoint(args.checkpoint),
+    )
+    summary = runner.run(rows, start=args.start - 1, end=args.end)
+    print(format_summary(summary))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,613 @@
+# benchmarks/fakes.py
+#
+# Local stand-ins for LinkedIn, Gemini, Sheets, Drive and Gmail. install() registers them
+# (and a generated config module) in sys.modules, so the app's own modules run unchanged
+# against backends with configurable latency, error rate and rate limits.
+
+import base64
+import email
+import hashlib
+import importlib.abc
+import importlib.util
+import random
+import sys
+import threading
+import time
+import types
+
+# Default mean latency per backend call, in seconds, before --latency-scale is applied.
+DEFAULT_LATENCIES = {
+    'linkedin.login': 2.0,
+    'linkedin.search_people': 0.35,
+    'linkedin.get_profile': 0.25,
+    'linkedin.get_profile_posts': 0.3,
+    'linkedin.send_message': 0.3,
+    'gemini.generate_content': 1.5,
+    'gemini.first_token': 0.4,
+    'sheets.get': 0.15,
+    'sheets.update': 0.15,
+    'sheets.batch_update': 0.2,
+    'drive.files_get': 0.08,
+    'gmail.create_draft': 0.2,
+    'gmail.send': 0.25,
+    'gmail.list': 0.1,
+    'gmail.batch': 0.3,
+}
+
+# Rough first-import cost of the real SDKs, in seconds, before --latency-scale is applied.
+SDK_IMPORT_LATENCIES = {
+    'google.generativeai': 1.5,
+    'googleapiclient.discovery': 0.5,
+    'google.oauth2.credentials': 0.15,
+    'google_auth_oauthlib.flow': 0.3,
+    'linkedin_api': 0.4,
+}
+
+
+class QuotaError(Exception):
+    """Raised by a backend over its rate limit; carries both Google and requests style status fields."""
+
+    def __init__(self, service):
+        super().__init__(f"{service}: rate limit exceeded")
+        self.resp = types.SimpleNamespace(status=429)
+        self.response = types.SimpleNamespace(status_code=429)
+        self.code = 429
+
+
+class Backends:
+    """Shared latency / error / rate-limit model and call counters for every fake service."""
+
+    def __init__(self, latency_scale=0.01, jitter=0.3, error_rate=0.0, rate_limits=None, seed=7):
+        self.latency_scale = latency_scale
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.rate_limits = rate_limits or {}  # backend prefix -> calls per second
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._windows = {}
+        self.calls = {}
+        self.errors = {}
+
+    def call(self, name):
+        """Account for one call to a backend operation: count it, sleep, maybe fail."""
+        service = name.split('.')[0]
+        with self._lock:
+            self.calls[name] = self.calls.get(name, 0) + 1
+            limited = self._over_limit(service)
+            failed = not limited and self._random.random() < self.error_rate
+            jitter = self._random.uniform(1 - self.jitter, 1 + self.jitter)
+            if limited or failed:
+                self.errors[name] = self.errors.get(name, 0) + 1
+        time.sleep(DEFAULT_LATENCIES.get(name, 0.1) * self.latency_scale * jitter)
+        if limited:
+            raise _quota_error(service)
+        if failed:
+            raise RuntimeError(f"{name}: injected failure")
+
+    def _over_limit(self, service):
+        # Called with self._lock held; sliding one-second window per service.
+        limit = self.rate_limits.get(service)
+        if not limit:
+            return False
+        now = time.monotonic()
+        window = [t for t in self._windows.get(service, []) if now - t < 1.0]
+        if len(window) >= limit:
+            self._windows[service] = window
+            return True
+        window.append(now)
+        self._windows[service] = window
+        return False
+
+
+backends = Backends()
+
+
+def _quota_error(service):
+    if service == 'gemini':
+        from google.api_core.exceptions import ResourceExhausted
+        return ResourceExhausted(f"{service}: quota exceeded")
+    return QuotaError(service)
+
+
+def _digest(*parts):
+    return int(hashlib.md5('|'.join(str(p) for p in parts).encode()).hexdigest(), 16)
+
+
+def make_rows(count, duplicate_rate=0.1, seed=11):
+    """Generate sheet rows [first, last, company, title, email]; some rows repeat earlier people.
+
+    A repeated person comes back as an exact copy, with the company spelled differently,
+    or under a personal address.
+    """
+    rng = random.Random(seed)
+    first_names = ['Alex', 'Sam', 'Jordan', 'Taylor', 'Morgan', 'Casey', 'Riley', 'Jamie', 'Drew', 'Avery']
+    companies = ['Rio Tinto', 'BHP Group', 'Anglo American', 'Glencore', 'Vale S.A.', 'Freeport-McMoRan',
+                 'Newmont Corp', 'Barrick Gold', 'Teck Resources', 'Fortescue Metals']
+    rows = []
+    for i in range(count):
+        if rows and rng.random() < duplicate_rate:
+            row = list(rng.choice(rows))
+            variant = rng.random()
+            if variant < 0.3:
+                row[2] = rng.choice([row[2].upper(), f'{row[2]} Ltd', f'The {row[2]} Inc.', f' {row[2].lower()} '])
+            elif variant < 0.5:
+                row[4] = f'{row[0].lower()}@gmail.com'
+            rows.append(row)
+            continue
+        first = f'{rng.choice(first_names)}{i}'
+        company = rng.choice(companies)
+        domain = company.split()[0].lower().replace('-', '') + '.com'
+        rows.append([first, 'Doe', company, 'Engineer', f'{first.lower()}@{domain}'])
+    return rows
+
+
+# --- googleapiclient -------------------------------------------------------------------
+
+
+class _Request:
+    def __init__(self, name, result):
+        self.name = name
+        self.result = result
+
+    def execute(self, http=None, num_retries=0):
+        backends.call(self.name)
+        return self.result() if callable(self.result) else self.result
+
+
+class FakeSheet:
+    """In-memory spreadsheet shared by the fake Sheets and Drive services."""
+
+    def __init__(self, rows=()):
+        self.rows = [list(row) for row in rows]
+        self.version = 1
+        self.writes = {}
+
+    def get_range(self, range_name):
+        cells = range_name.split('!')[-1]
+        start, _, end = cells.partition(':')
+        first = int(''.join(ch for ch in start if ch.isdigit()) or 1)
+        last_digits = ''.join(ch for ch in end if ch.isdigit())
+        last = int(last_digits) if last_digits else len(self.rows) + 1
+        # Data rows start at sheet row 2 (row 1 is the header)
+        return self.rows[max(first - 2, 0):last - 1]
+
+    def write(self, range_name, values):
+        self.writes[range_name] = values
+        self.version += 1
+
+
+sheet = FakeSheet()
+
+
+class _SheetsValues:
+    def get(self, spreadsheetId=None, range=None):
+        start, _, end = range.split('!')[-1].partition(':')
+        single_column = start.rstrip('0123456789') == end.rstrip('0123456789')
+
+        def result():
+            values = sheet.get_range(range)
+            if single_column:
+                values = [row[:1] for row in values]
+            return {'values': values}
+        return _Request('sheets.get', result)
+
+    def update(self, spreadsheetId=None, range=None, valueInputOption=None, body=None):
+        return _Request('sheets.update', lambda: sheet.write(range, body['values']) or {})
+
+    def batchUpdate(self, spreadsheetId=None, body=None):
+        def result():
+            for data in body['data']:
+                sheet.write(data['range'], data['values'])
+            return {'totalUpdatedRows': len(body['data'])}
+        return _Request('sheets.batch_update', result)
+
+
+class _Spreadsheets:
+    def values(self):
+        return _SheetsValues()
+
+
+class _Files:
+    def get(self, fileId=None, fields=None):
+        return _Request('drive.files_get', lambda: {'version': str(sheet.version)})
+
+
+class Mailbox:
+    """Drafts and sent messages, indexed by Message-ID for `rfc822msgid:` searches."""
+
+    def __init__(self):
+        self.drafts = {}
+        self.sent = {}
+
+    def store(self, folder, raw, prefix):
+        message = email.message_from_bytes(base64.urlsafe_b64decode(raw))
+        message_id = (message['Message-ID'] or '').strip('<>') or None
+        gmail_id = f'{prefix}-{len(folder) + 1}'
+        folder[message_id or gmail_id] = gmail_id
+        return {'id': gmail_id}
+
+    def search(self, folder, query):
+        message_id = query.partition('rfc822msgid:')[2].strip('<>')
+        return [{'id': folder[message_id]}] if message_id in folder else []
+
+
+mailbox = Mailbox()
+
+
+class _Drafts:
+    def create(self, userId=None, body=None):
+        return _Request('gmail.create_draft', lambda: mailbox.store(mailbox.drafts, body['message']['raw'], 'draft'))
+
+    def list(self, userId=None, q=''):
+        return _Request('gmail.list', lambda: {'drafts': mailbox.search(mailbox.drafts, q)})
+
+
+class _Messages:
+    def send(self, userId=None, body=None):
+        return _Request('gmail.send', lambda: mailbox.store(mailbox.sent, body['raw'], 'msg'))
+
+    def list(self, userId=None, q='', includeSpamTrash=False):
+        return _Request('gmail.list', lambda: {'messages': mailbox.search(mailbox.sent, q)})
+
+
+class _Users:
+    def drafts(self):
+        return _Drafts()
+
+    def messages(self):
+        return _Messages()
+
+
+class _BatchHttpRequest:
+    """Mimics googleapiclient.http.BatchHttpRequest: one round trip for many requests."""
+
+    def __init__(self, callback=None):
+        self.callback = callback
+        self._requests = []
+
+    def add(self, request, callback=None, request_id=None):
+        self._requests.append((request_id or str(len(self._requests)), request, callback or self.callback))
+
+    def execute(self, http=None):
+        backends.call('gmail.batch')
+        for request_id, request, callback in self._requests:
+            try:
+                response = request.result() if callable(request.result) else request.result
+                callback(request_id, response, None)
+            except Exception as error:
+                callback(request_id, None, error)
+
+
+class FakeService:
+    def __init__(self, api):
+        self.api = api
+
+    def spreadsheets(self):
+        return _Spreadsheets()
+
+    def files(self):
+        return _Files()
+
+    def users(self):
+        return _Users()
+
+    def new_batch_http_request(self, callback=None):
+        return _BatchHttpRequest(callback)
+
+
+def build(api, version, credentials=None, cache_discovery=True, **kwargs):
+    return FakeService(api)
+
+
+class Credentials:
+    valid = True
+    expired = False
+    refresh_token = 'fake-refresh-token'
+
+    @classmethod
+    def from_authorized_user_file(cls, filename, scopes=None):
+        return cls()
+
+    def refresh(self, request):
+        self.valid = True
+
+    def to_json(self):
+        return '{}'
+
+
+class InstalledAppFlow:
+    @classmethod
+    def from_client_secrets_file(cls, filename, scopes):
+        return cls()
+
+    def run_local_server(self, port=0):
+        return Credentials()
+
+
+# --- linkedin_api ----------------------------------------------------------------------
+
+
+class UnauthorizedException(Exception):
+    pass
+
+
+class Linkedin:
+    """Fake linkedin_api.Linkedin with deterministic search results, profiles and posts."""
+
+    def __init__(self, username, password, *, authenticate=True, refresh_cookies=False,
+                 debug=False, proxies=None, cookies=None, cookies_dir=None):
+        backends.call('linkedin.login')
+
+    def search_people(self, keywords=None, **kwargs):
+        backends.call('linkedin.search_people')
+        found = _digest('search', keywords) % 10
+        if found < 2:
+            return []
+        return [{'urn_id': f'urn-{_digest(keywords, i) % 10 ** 8}', 'name': keywords} for i in range(found % 3 + 1)]
+
+    def get_profile(self, public_id=None, urn_id=None):
+        backends.call('linkedin.get_profile')
+        urn_id = urn_id or public_id
+        company = 'Acme Mining Co' if _digest('profile', urn_id) % 2 else 'Acme Logistics'
+        return {'urn_id': urn_id, 'experience': [{'companyName': company}]}
+
+    def get_profile_posts(self, public_id=None, urn_id=None, post_count=10):
+        backends.call('linkedin.get_profile_posts')
+        if _digest('posts', urn_id) % 10 < 3:
+            return []
+        text = f'Excited to share our latest safety milestone at site {urn_id[-4:]}!'
+        return [{'commentary': {'text': {'text': text}}}][:post_count]
+
+    def send_message(self, message_body=None, conversation_urn_id=None, recipients=None):
+        backends.call('linkedin.send_message')
+        # Like linkedin-api, the return value is the error flag: False means the message was sent
+        return False
+
+
+# --- google.generativeai ---------------------------------------------------------------
+
+
+class _Response:
+    def __init__(self, text):
+        self.text = text
+
+
+class GenerativeModel:
+    def __init__(self, model_name, **kwargs):
+        self.model_name = model_name
+
+    def generate_content(self, prompt, stream=False, **kwargs):
+        backends.call('gemini.first_token' if stream else 'gemini.generate_content')
+        text = (
+            f"Subject: Quick note from a fellow mining enthusiast\n\n"
+            f"Hi there,\n\nI read your update and wanted to reach out. [Our site](https://example.com) "
+            f"has a short case study that may be relevant.\n\n{prompt[:80]}\n\nBest regards"
+        )
+        if not stream:
+            return _Response(text)
+        return self._stream(text)
+
+    def _stream(self, text):
+        # The first chunk arrives after the first-token latency, the rest over the remaining time
+        chunks = 8
+        size = max(1, len(text) // chunks)
+        delay = (DEFAULT_LATENCIES['gemini.generate_content'] - DEFAULT_LATENCIES['gemini.first_token']) / chunks
+        for i in range(0, len(text), size):
+            if i:
+                time.sleep(delay * backends.latency_scale)
+            yield _Response(text[i:i + size])
+
+
+def _configure(**kwargs):
+    pass
+
+
+# --- installation ----------------------------------------------------------------------
+
+
+def _module(name, **attrs):
+    module = types.ModuleType(name)
+    module.__dict__.update(attrs)
+    return module
+
+
+def _register(name, module):
+    """Put module in sys.modules and link it from its (possibly fake) parent packages."""
+    sys.modules[name] = module
+    parts = name.split('.')
+    for depth in range(len(parts) - 1, 0, -1):
+        parent_name = '.'.join(parts[:depth])
+        parent = sys.modules.get(parent_name)
+        if parent is None:
+            parent = _module(parent_name)
+            parent.__path__ = []
+            sys.modules[parent_name] = parent
+        setattr(parent, parts[depth], sys.modules['.'.join(parts[:depth + 1])])
+
+
+class _SdkImporter(importlib.abc.MetaPathFinder, importlib.abc.Loader):
+    """Serves the fake SDK modules on import, taking as long as the real SDK's first import."""
+
+    def __init__(self, modules):
+        self.modules = modules
+
+    def find_spec(self, name, path, target=None):
+        if name in self.modules:
+            return importlib.util.spec_from_loader(name, self, is_package=hasattr(self.modules[name], '__path__'))
+        return None
+
+    def create_module(self, spec):
+        time.sleep(SDK_IMPORT_LATENCIES.get(spec.name, 0.0) * backends.latency_scale)
+        return self.modules[spec.name]
+
+    def exec_module(self, module):
+        pass
+
+
+def _register_sdks(modules):
+    """Make the fake SDK modules importable without putting them in sys.modules yet."""
+    for name in modules:
+        parts = name.split('.')
+        for depth in range(1, len(parts)):
+            parent_name = '.'.join(parts[:depth])
+            if parent_name not in modules and parent_name not in sys.modules:
+                parent = _module(parent_name)
+                parent.__path__ = []
+                sys.modules[parent_name] = parent
+    sys.meta_path.insert(0, _SdkImporter(modules))
+
+
+def install(rows, workdir, config_overrides=None, **backend_options):
+    """Install the fakes and a config module; call before importing any app module."""
+    global backends, sheet, mailbox
+    backends = Backends(**backend_options)
+    sheet = FakeSheet(rows)
+    mailbox = Mailbox()
+
+    settings = {
+        'SHEET_ID': 'benchmark-sheet',
+        'RANGE_NAME': 'Sheet1!A2:I',
+        'SCOPES': [],
+        'GEMINI_API_KEY': 'fake',
+        'LINKEDIN_USERNAME': 'bench@example.com',
+        'LINKEDIN_PASSWORD': 'fake',
+        # Keep every cache and journal inside the run's scratch directory
+        'LINKEDIN_CACHE_PATH': f'{workdir}/cache/linkedin.sqlite',
+        'LINKEDIN_COOKIES_DIR': f'{workdir}/cache/linkedin_cookies/',
+        'EMAIL_CACHE_PATH': f'{workdir}/cache/emails.sqlite',
+        'SHEET_WRITE_JOURNAL': f'{workdir}/cache/sheet_writes.json',
+        'GMAIL_QUEUE_PATH': f'{workdir}/cache/gmail_queue.sqlite',
+        'CONTACT_STORE_PATH': f'{workdir}/cache/contacts.sqlite',
+        'PROSPECT_INDEX_PATH': f'{workdir}/cache/prospects.sqlite',
+        # Client-side budgets are opened up; --rate-limit exercises the backends' limits instead
+        'LINKEDIN_REQUESTS_PER_SECOND': 1000,
+        'LINKEDIN_MESSAGES_PER_MINUTE': 100000,
+        'GEMINI_REQUESTS_PER_MINUTE': 100000,
+        'GEMINI_TOKENS_PER_MINUTE': 10 ** 9,
+        'GMAIL_QUOTA_UNITS_PER_SECOND': 10 ** 6,
+        'SHEETS_REQUESTS_PER_MINUTE': 10 ** 6,
+        'DRIVE_REQUESTS_PER_MINUTE': 10 ** 6,
+        'GMAIL_DAILY_SEND_LIMIT': 10 ** 6,
+    }
+    settings.update(config_overrides or {})
+    _register('config', _module('config', **settings))
+
+    class ResourceExhausted(Exception):
+        code = 429
+
+    class TooManyRequests(ResourceExhausted):
+        pass
+
+    class ServiceUnavailable(Exception):
+        code = 503
+
+    _register('google.api_core.exceptions', _module(
+        'google.api_core.exceptions',
+        ResourceExhausted=ResourceExhausted, TooManyRequests=TooManyRequests, ServiceUnavailable=ServiceUnavailable,
+    ))
+    # The SDKs are imported on demand, like the real ones, so cold-start costs show up
+    linkedin_api = _module('linkedin_api', Linkedin=Linkedin)
+    linkedin_api.__path__ = []
+    _register_sdks({
+        'google.generativeai': _module('google.generativeai', configure=_configure, GenerativeModel=GenerativeModel),
+        'google.oauth2.credentials': _module('google.oauth2.credentials', Credentials=Credentials),
+        'google.auth.transport.requests': _module('google.auth.transport.requests', Request=object),
+        'google_auth_oauthlib.flow': _module('google_auth_oauthlib.flow', InstalledAppFlow=InstalledAppFlow),
+        'googleapiclient.discovery': _module('googleapiclient.discovery', build=build),
+        'googleapiclient.http': _module('googleapiclient.http', BatchHttpRequest=_BatchHttpRequest),
+        'linkedin_api': linkedin_api,
+        'linkedin_api.client': _module('linkedin_api.client', UnauthorizedException=UnauthorizedException),
+    })
+    return backends
+
+
+class FakeStreamlit:
+    """Just enough of the streamlit API for the controller functions, with no rendering."""
+
+    class _SessionState(dict):
+        def __getattr__(self, name):
+            try:
+                return self[name]
+            except KeyError:
+                raise AttributeError(name)
+
+        def __setattr__(self, name, value):
+            self[name] = value
+
+    class _Widget:
+        def __init__(self, st):
+            self._st = st
+
+        def __enter__(self):
+            return self
+
+        def __exit__(self, *exc):
+            return False
+
+        def __getattr__(self, name):
+            return getattr(self._st, name)
+
+    def __init__(self, query_params=None):
+        self.session_state = self._SessionState()
+        self.query_params = dict(query_params or {})
+        self.messages = []
+        self.sidebar = self._Widget(self)
+
+    def _record(self, kind, *args, **kwargs):
+        self.messages.append((kind, args[0] if args else kwargs.get('value')))
+
+    def write(self, *args, **kwargs):
+        self._record('write', *args)
+
+    def success(self, *args, **kwargs):
+        self._record('success', *args)
+
+    def error(self, *args, **kwargs):
+        self._record('error', *args)
+
+    def info(self, *args, **kwargs):
+        self._record('info', *args)
+
+    def warning(self, *args, **kwargs):
+        self._record('warning', *args)
+
+    def toast(self, *args, **kwargs):
+        self._record('toast', *args)
+
+    def caption(self, *args, **kwargs):
+        self._record('caption', *args)
+
+    def markdown(self, *args, **kwargs):
+        self._record('markdown', *args)
+
+    def text(self, *args, **kwargs):
+        self._record('text', *args)
+
+    def text_area(self, label, value='', key=None, **kwargs):
+        if key is not None:
+            self.session_state[key] = value
+        return value
+
+    def text_input(self, label, value='', key=None, **kwargs):
+        if key is not None:
+            self.session_state.setdefault(key, value)
+        return self.session_state.get(key, value)
+
+    def button(self, *args, **kwargs):
+        return False
+
+    def empty(self):
+        return self._Widget(self)
+
+    def container(self, *args, **kwargs):
+        return self._Widget(self)
+
+    def expander(self, *args, **kwargs):
+        return self._Widget(self)
+
+    def columns(self, spec, **kwargs):
+        count = spec if isinstance(spec, int) else len(spec)
+        return [self._Widget(self) for _ in range(count)]
+
+    def rerun(self):
+        pass
@@ -0,0 +1,176 @@
+# benchmarks/load_test.py
+#
+# Load test for the multi-process deployment (DEPLOYMENT_MODE = 'workers'). The same queue of
+# jobs (one 'prepare' per sheet row, one email send per row with an address) is drained by 1,
+# 2, 4, ... worker processes against the fakes. The workers share one job queue, contact
+# store, LinkedIn and email caches, prospect index and scheduler budgets in SQLite, as
+# several app.py and worker.py processes on one host would.
+#
+#   python -m benchmarks.load_test
+#   python -m benchmarks.load_test --rows 400 --workers 1 2 4 8 --latency-scale 0.05
+#   python -m benchmarks.load_test --config GEMINI_REQUESTS_PER_MINUTE=600   # a shared budget caps the gain
+
+import argparse
+import glob
+import json
+import multiprocessing
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _install(workdir, options):
+    # Every process of a run installs the same fakes and config on the same scratch directory
+    sys.path.insert(0, REPO_ROOT)
+    from benchmarks import fakes
+
+    rows = fakes.make_rows(options['rows'], duplicate_rate=options['duplicate_rate'])
+    config = {'DEPLOYMENT_MODE': 'workers', 'JOB_QUEUE_PATH': f'{workdir}/cache/jobs.sqlite',
+              'SCHEDULER_BUDGETS_PATH': f'{workdir}/cache/budgets.sqlite'}
+    config.update(options['config'])
+    backends = fakes.install(rows, workdir, config_overrides=config, latency_scale=options['latency_scale'],
+                             error_rate=options['error_rate'])
+    return fakes, rows, backends
+
+
+def worker_process(workdir, options, name):
+    """Entry point of one spawned worker process: run jobs until the queue is empty, then report."""
+    fakes, _, backends = _install(workdir, options)
+    from services.sheet_writer import get_sheet_writer
+    from config import SHEET_ID
+    from worker import serve
+
+    serve(name, options['threads'], exit_when_idle=True)
+    get_sheet_writer(SHEET_ID).flush()
+    with open(os.path.join(workdir, f'worker-{name}.json'), 'w') as f:
+        json.dump({'calls': backends.calls, 'errors': backends.errors, 'sent': list(fakes.mailbox.sent)}, f)
+
+
+def run_child(worker_count, options):
+    """Queue the jobs, drain them with worker_count processes and return the measurements."""
+    workdir = tempfile.mkdtemp(prefix='outreach-load-')
+    os.chdir(workdir)
+    _, rows, _ = _install(workdir, options)
+    from config import SHEET_ID
+    from services.gmail_mailer import message_key
+    from utils.job_queue import get_job_queue
+    from utils.scheduler import PREFETCH
+
+    queue = get_job_queue()
+    sends = 0
+    for index, cells in enumerate(rows):
+        row_number = index + 2
+        queue.enqueue('prepare', f'load:prepare:{row_number}', {'row': [row_number, cells]}, lane=PREFETCH)
+        if cells[4]:
+            args = {'subject': f"Hello {cells[0]}", 'body': f"Hi {cells[0]}, ...",
+                    'key': message_key('send', SHEET_ID, row_number, cells[4])}
+            queue.enqueue('action', f'load:send:{row_number}', {'action': 'send', 'row': [row_number, cells],
+                                                                 'args': args}, owner='load-test')
+            sends += 1
+
+    context = multiprocessing.get_context('spawn')
+    started = time.perf_counter()
+    processes = [
+        context.Process(target=worker_process, args=(workdir, options, f'load-{index}'))
+        for index in range(worker_count)
+    ]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+    wall = time.perf_counter() - started
+
+    calls, errors, sent = {}, {}, []
+    for path in glob.glob(os.path.join(workdir, 'worker-*.json')):
+        with open(path) as f:
+            report = json.load(f)
+        for totals, counts in ((calls, report['calls']), (errors, report['errors'])):
+            for name, count in counts.items():
+                totals[name] = totals.get(name, 0) + count
+        sent.extend(report['sent'])
+
+    kinds = queue.stats()['kinds']
+    done = sum(counts['done'] for counts in kinds.values())
+    return {
+        'workers': worker_count,
+        'threads': options['threads'],
+        'rows': len(rows),
+        'jobs': len(rows) + sends,
+        'done': done,
+        'failed': sum(counts['failed'] for counts in kinds.values()),
+        'left': sum(counts['queued'] + counts['running'] for counts in kinds.values()),
+        'wall_seconds': wall,
+        'jobs_per_minute': done / wall * 60 if wall else 0.0,
+        'backend_calls': dict(sorted(calls.items())),
+        'backend_errors': dict(sorted(errors.items())),
+        'emails_sent': len(sent),
+        'duplicate_sends': len(sent) - len(set(sent)),
+    }
+
+
+def run_isolated(worker_count, options):
+    completed = subprocess.run(
+        [sys.executable, '-m', 'benchmarks.load_test', '--child', str(worker_count), '--options', json.dumps(options)],
+        cwd=REPO_ROOT, capture_output=True, text=True,
+    )
+    if completed.returncode != 0:
+        raise RuntimeError(f"Load test with {worker_count} workers failed:\n{completed.stderr}")
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+def _value(text):
+    for parse in (int, float):
+        try:
+            return parse(text)
+        except ValueError:
+            pass
+    return text
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure job throughput as worker processes are added.")
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4], help="worker process counts to run")
+    parser.add_argument('--threads', type=int, default=1, help="threads per worker process")
+    parser.add_argument('--rows', type=int, default=200, help="sheet rows; each is a prepare job and a send")
+    parser.add_argument('--latency-scale', type=float, default=0.05,
+                        help="multiplier on the fakes' realistic latencies (1.0 = production-like)")
+    parser.add_argument('--error-rate', type=float, default=0.0, help="probability that a backend call fails")
+    parser.add_argument('--duplicate-rate', type=float, default=0.1, help="share of rows repeating an earlier contact")
+    parser.add_argument('--config', action='append', default=[], metavar='NAME=VALUE',
+                        help="config override for every process, e.g. GEMINI_REQUESTS_PER_MINUTE=600 (repeatable)")
+    parser.add_argument('--child', type=int, help=argparse.SUPPRESS)
+    parser.add_argument('--options', default='{}', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(run_child(args.child, json.loads(args.options))))
+        return
+
+    options = {
+        'rows': args.rows,
+        'threads': args.threads,
+        'latency_scale': args.latency_scale,
+        'error_rate': args.error_rate,
+        'duplicate_rate': args.duplicate_rate,
+        'config': {name: _value(value) for name, value in (item.split('=', 1) for item in args.config)},
+    }
+    baseline = None
+    print(f"{'workers':>7} {'jobs':>6} {'failed':>6} {'wall':>8} {'jobs/min':>9} {'speedup':>8} {'efficiency':>10}  "
+          "duplicate sends")
+    for worker_count in args.workers:
+        run = run_isolated(worker_count, options)
+        baseline = baseline or run['jobs_per_minute'] / run['workers']
+        speedup = run['jobs_per_minute'] / baseline if baseline else 0.0
+        print(f"{run['workers']:>7} {run['done']:>6} {run['failed']:>6} {run['wall_seconds']:>7.2f}s "
+              f"{run['jobs_per_minute']:>9.0f} {speedup:>7.2f}x {speedup / run['workers']:>10.0%}  "
+              f"{run['duplicate_sends']}")
+        if run['left']:
+            print(f"        {run['left']} jobs were still queued or running when the workers stopped")
+
+
+if __name__ == '__main__':
+    main()
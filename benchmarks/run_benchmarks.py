@@ -0,0 +1,167 @@
+# benchmarks/run_benchmarks.py
+#
+# Offline benchmark harness. Every (scenario, row count) pair runs in a fresh interpreter
+# against the fakes in benchmarks/fakes.py, so no LinkedIn, Gemini or Google account is
+# needed and process-wide caches never leak between runs.
+#
+#   python -m benchmarks.run_benchmarks --label before
+#   python -m benchmarks.run_benchmarks --rows 100 1000 10000 --scenario full_sheet
+#   python -m benchmarks.run_benchmarks --label after --compare benchmarks/results/before.json
+
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULTS_DIR = os.path.join(REPO_ROOT, 'benchmarks', 'results')
+
+
+def run_child(scenario, row_count, options):
+    """Run one scenario in this process (called in the child interpreter) and return its result."""
+    sys.path.insert(0, REPO_ROOT)
+    from benchmarks import fakes
+
+    rows = fakes.make_rows(row_count, duplicate_rate=options['duplicate_rate'])
+    workdir = tempfile.mkdtemp(prefix='outreach-bench-')
+    os.chdir(workdir)
+    backends = fakes.install(
+        rows, workdir, config_overrides=options.get('config'),
+        latency_scale=options['latency_scale'], error_rate=options['error_rate'],
+        rate_limits=options['rate_limits'],
+    )
+
+    from benchmarks.scenarios import SCENARIOS
+    from utils.tracing import process_recorder
+    from utils.prospect_index import get_prospect_index
+
+    started = time.perf_counter()
+    contacts = SCENARIOS[scenario](rows, options)
+    wall = time.perf_counter() - started
+
+    return {
+        'scenario': scenario,
+        'rows': row_count,
+        'contacts': contacts,
+        'wall_seconds': wall,
+        'contacts_per_minute': contacts / wall * 60 if wall else 0.0,
+        'peak_memory_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        'stages': process_recorder.snapshot(),
+        'backend_calls': dict(sorted(backends.calls.items())),
+        'backend_errors': dict(sorted(backends.errors.items())),
+        'prospect_index': get_prospect_index().stats(),
+    }
+
+
+def run_isolated(scenario, row_count, options):
+    """Run one scenario in a subprocess and return its parsed result."""
+    completed = subprocess.run(
+        [sys.executable, '-m', 'benchmarks.run_benchmarks', '--child', scenario, str(row_count),
+         '--options', json.dumps(options)],
+        cwd=REPO_ROOT, capture_output=True, text=True,
+    )
+    if completed.returncode != 0:
+        raise RuntimeError(f"{scenario} with {row_count} rows failed:\n{completed.stderr}")
+    # The app prints progress; the result is the last line of output
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+def compare(current, baseline, threshold):
+    """Print wall-time and per-stage p95 changes against a baseline; return the regressions."""
+    previous = {(run['scenario'], run['rows']): run for run in baseline['runs']}
+    regressions = []
+    print(f"\nCompared with '{baseline['label']}':")
+    for run in current['runs']:
+        old = previous.get((run['scenario'], run['rows']))
+        if old is None:
+            continue
+        change = (run['wall_seconds'] - old['wall_seconds']) / old['wall_seconds'] if old['wall_seconds'] else 0.0
+        flag = '  REGRESSION' if change > threshold else ''
+        print(f"  {run['scenario']:<16} {run['rows']:>6} rows  wall {old['wall_seconds']:.2f}s -> "
+              f"{run['wall_seconds']:.2f}s ({change:+.0%}){flag}")
+        if flag:
+            regressions.append((run['scenario'], run['rows'], change))
+        for stage, stats in run['stages'].items():
+            old_stats = old['stages'].get(stage)
+            if old_stats and old_stats['p95'] and (stats['p95'] - old_stats['p95']) / old_stats['p95'] > threshold:
+                print(f"      {stage}: p95 {old_stats['p95'] * 1000:.1f}ms -> {stats['p95'] * 1000:.1f}ms")
+    return regressions
+
+
+def print_run(run):
+    print(f"{run['scenario']:<16} {run['rows']:>6} rows  {run['contacts']:>6} contacts  "
+          f"{run['wall_seconds']:7.2f}s  {run['contacts_per_minute']:9.1f}/min  "
+          f"peak {run['peak_memory_mb']:.0f} MB")
+    for stage, stats in run['stages'].items():
+        print(f"    {stage:<36} n={stats['calls']:<6} p50={stats['p50'] * 1000:8.1f}ms "
+              f"p95={stats['p95'] * 1000:8.1f}ms errors={stats['errors']} retries={stats['retries']}")
+    index = run.get('prospect_index')
+    if index:
+        print(f"    prospect index: {index['duplicate_rows']} duplicate rows merged, {index['saved']} searches saved "
+              f"of {index['searches']} ({index['fetched']} sent on), {index['profile_hits']} profile checks local")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the outreach tool against local fake services.")
+    parser.add_argument('--scenario', action='append', choices=['cold_start', 'process_contact', 'send_actions', 'full_sheet'],
+                        help="scenario to run (repeatable; default: all)")
+    parser.add_argument('--rows', type=int, nargs='+', default=[100, 1000], help="sheet sizes to run")
+    parser.add_argument('--contacts', type=int, default=None, help="contacts walked in the UI scenarios")
+    parser.add_argument('--latency-scale', type=float, default=0.01,
+                        help="multiplier on the fakes' realistic latencies (1.0 = production-like)")
+    parser.add_argument('--think-time', type=float, default=2.0,
+                        help="operator review time per contact before --latency-scale, in seconds")
+    parser.add_argument('--error-rate', type=float, default=0.0, help="probability that a backend call fails")
+    parser.add_argument('--rate-limit', action='append', default=[], metavar='SERVICE=PER_SECOND',
+                        help="backend-side rate limit, e.g. gemini=5 (repeatable)")
+    parser.add_argument('--duplicate-rate', type=float, default=0.1, help="share of rows repeating an earlier contact")
+    parser.add_argument('--label', default=None, help="name for the results file")
+    parser.add_argument('--compare', default=None, help="results file to compare against")
+    parser.add_argument('--threshold', type=float, default=0.10, help="relative slowdown reported as a regression")
+    parser.add_argument('--child', nargs=2, metavar=('SCENARIO', 'ROWS'), help=argparse.SUPPRESS)
+    parser.add_argument('--options', default='{}', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        result = run_child(args.child[0], int(args.child[1]), json.loads(args.options))
+        print(json.dumps(result))
+        return
+
+    options = {
+        'latency_scale': args.latency_scale,
+        'think_time': args.think_time * args.latency_scale,
+        'error_rate': args.error_rate,
+        'rate_limits': {service: float(limit) for service, limit in
+                        (item.split('=', 1) for item in args.rate_limit)},
+        'duplicate_rate': args.duplicate_rate,
+    }
+    if args.contacts is not None:
+        options['contacts'] = args.contacts
+
+    label = args.label or time.strftime('%Y%m%d-%H%M%S')
+    results = {'label': label, 'created_at': time.time(), 'options': options, 'runs': []}
+    for scenario in args.scenario or ['cold_start', 'process_contact', 'send_actions', 'full_sheet']:
+        for row_count in args.rows:
+            run = run_isolated(scenario, row_count, options)
+            results['runs'].append(run)
+            print_run(run)
+
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    path = os.path.join(RESULTS_DIR, f'{label}.json')
+    with open(path, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f"\nResults written to {os.path.relpath(path, REPO_ROOT)}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        if compare(results, baseline, args.threshold):
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
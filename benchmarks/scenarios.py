@@ -0,0 +1,101 @@
+# benchmarks/scenarios.py
+#
+# Workloads driven against the fakes. Each scenario imports the app modules lazily, after
+# benchmarks.fakes.install() has put the stand-in services in place.
+
+import time
+
+# Contacts walked through the UI scenarios; the full-sheet scenario always runs every row.
+UI_CONTACTS = 50
+
+
+def process_contact_scenario(rows, options):
+    """Walk contacts like an operator: render, review for a while, press Next."""
+    from benchmarks.fakes import FakeStreamlit
+    from config import SHEET_ID, RANGE_NAME
+    from utils.contact_controller import process_contact, next_contact
+    from utils.session_state import init_session_state
+    from utils.sheet_data import get_sheet_data
+
+    st = FakeStreamlit()
+    init_session_state(st)
+    sheet_data = get_sheet_data(SHEET_ID, RANGE_NAME)
+    contacts = min(options.get('contacts', UI_CONTACTS), len(sheet_data))
+    for _ in range(contacts):
+        process_contact(st.session_state.current_index, sheet_data, st)
+        time.sleep(options['think_time'])
+        next_contact(st, sheet_data)
+    return contacts
+
+
+def send_actions_scenario(rows, options):
+    """Render each contact, then save a draft, send the email and send via LinkedIn."""
+    from benchmarks.fakes import FakeStreamlit
+    from config import SHEET_ID, RANGE_NAME
+    from services.sheet_writer import get_sheet_writer
+    from utils.contact_controller import (
+        process_contact, next_contact, current_contact, save_to_drafts, send_email_action,
+        send_linkedin_message_action, render_action_status,
+    )
+    from utils.action_queue import get_action_queue
+    from utils.session_state import init_session_state
+    from utils.sheet_data import get_sheet_data
+
+    st = FakeStreamlit()
+    init_session_state(st)
+    sheet_data = get_sheet_data(SHEET_ID, RANGE_NAME)
+    contacts = min(options.get('contacts', UI_CONTACTS), len(sheet_data))
+    for _ in range(contacts):
+        process_contact(st.session_state.current_index, sheet_data, st)
+        save_to_drafts(st, sheet_data)
+        send_email_action(st, sheet_data)
+        profile = (current_contact(st, sheet_data) or {}).get('profile')
+        if profile and profile.get('urn_id'):
+            send_linkedin_message_action(st, sheet_data)
+        next_contact(st, sheet_data)
+    # The sends run in the background; count them only once Gmail, LinkedIn and the sheet have them
+    get_action_queue().wait()
+    render_action_status(st)
+    get_sheet_writer(SHEET_ID).flush()
+    return contacts
+
+
+def full_sheet_scenario(rows, options):
+    """Draft every row of the sheet with the headless batch runner."""
+    from config import SHEET_ID, RANGE_NAME
+    from utils.batch_runner import BatchRunner
+    from utils.sheet_data import get_sheet_data
+
+    sheet_data = get_sheet_data(SHEET_ID, RANGE_NAME)
+    BatchRunner(mode='draft').run(sheet_data)
+    return len(sheet_data)
+
+
+def cold_start_scenario(rows, options):
+    """Time a fresh process's first page like app.py does: imports, first paint, first contact on screen."""
+    started = time.perf_counter()
+    from config import SHEET_ID, RANGE_NAME
+    from utils.contact_controller import process_contact
+    from utils.session_state import init_session_state
+    from utils.sheet_data import get_sheet_data
+    from utils.startup import record_import_time, record_first_paint, start_warmup
+    from utils.tracing import record
+    from benchmarks.fakes import FakeStreamlit
+
+    record_import_time(time.perf_counter() - started)
+    st = FakeStreamlit()
+    init_session_state(st)
+    start_warmup()
+    record_first_paint(st, started)
+    sheet_data = get_sheet_data(SHEET_ID, RANGE_NAME)
+    process_contact(st.session_state.current_index, sheet_data, st)
+    record('startup.first_contact', time.perf_counter() - started)
+    return 1
+
+
+SCENARIOS = {
+    'cold_start': cold_start_scenario,
+    'process_contact': process_contact_scenario,
+    'send_actions': send_actions_scenario,
+    'full_sheet': full_sheet_scenario,
+}
@@ -1,15 +1,89 @@
 # services/ai_services.py
 
+import asyncio
+import contextvars
+import hashlib
+import json
 import re
-import google.generativeai as genai
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+import config
 from config import GEMINI_API_KEY
+from utils.disk_cache import DiskCache
+from utils.scheduler import get_scheduler
+from utils.startup import import_sdk
+from utils.tracing import span, traced, record
 
-# Configure the Google Gemini API with the key from config.py
-genai.configure(api_key=GEMINI_API_KEY)
+GEMINI_MODEL = getattr(config, 'GEMINI_MODEL', 'gemini-1.5-flash-latest')
 
-def generate_email(first_name, company_name, post_text=None):
-    """Generate a personalized email using the Gemini AI model."""
-    
+# Bump whenever build_prompt changes so earlier cached emails are no longer served.
+PROMPT_VERSION = 1
+
+# Generated emails are cached by a hash of their inputs; None keeps them until evicted.
+EMAIL_CACHE_PATH = getattr(config, 'EMAIL_CACHE_PATH', 'cache/emails.sqlite')
+EMAIL_CACHE_TTL = getattr(config, 'EMAIL_CACHE_TTL', None)
+EMAIL_CACHE_MAX_ENTRIES = getattr(config, 'EMAIL_CACHE_MAX_ENTRIES', 20000)
+
+# Quota budget shared by every caller in the process, plus batch concurrency and retries.
+GEMINI_REQUESTS_PER_MINUTE = getattr(config, 'GEMINI_REQUESTS_PER_MINUTE', 15)
+GEMINI_TOKENS_PER_MINUTE = getattr(config, 'GEMINI_TOKENS_PER_MINUTE', 1000000)
+GEMINI_MAX_WORKERS = getattr(config, 'GEMINI_MAX_WORKERS', 4)
+GEMINI_MAX_RETRIES = getattr(config, 'GEMINI_MAX_RETRIES', 5)
+
+# Rough allowance for the reply when estimating a request's token cost.
+_RESPONSE_TOKENS = 400
+
+_model = None
+_model_lock = threading.Lock()
+_email_cache = None
+get_scheduler().register(
+    'gemini', {'requests': (GEMINI_REQUESTS_PER_MINUTE, 60), 'tokens': (GEMINI_TOKENS_PER_MINUTE, 60)},
+)
+
+
+def _get_model():
+    """Return the process-wide Gemini model instance, importing and configuring the SDK on first use."""
+    global _model
+    with _model_lock:
+        if _model is None:
+            # google.generativeai takes seconds to import, so it is loaded here instead of at startup
+            genai = import_sdk('google.generativeai')
+            # Configure the Google Gemini API with the key from config.py
+            genai.configure(api_key=GEMINI_API_KEY)
+            _model = genai.GenerativeModel(GEMINI_MODEL)
+        return _model
+
+
+def warm_up_model():
+    """Load the Gemini SDK and model ahead of the first generation."""
+    _get_model()
+
+
+def _get_email_cache():
+    """Return the generated-email cache, opening it on first use."""
+    global _email_cache
+    with _model_lock:
+        if _email_cache is None:
+            _email_cache = DiskCache(
+                EMAIL_CACHE_PATH, 'emails', ttl=EMAIL_CACHE_TTL, max_entries=EMAIL_CACHE_MAX_ENTRIES,
+            )
+        return _email_cache
+
+
+def email_cache_key(first_name, company_name, post_text=None):
+    """Hash everything that determines a generated email: inputs, model and prompt version."""
+    inputs = [PROMPT_VERSION, GEMINI_MODEL, first_name, company_name, post_text or None]
+    return hashlib.sha256(json.dumps(inputs).encode()).hexdigest()
+
+
+def email_cache_stats():
+    """Return hit/miss counters for the generated-email cache."""
+    return _get_email_cache().stats()
+
+
+def build_prompt(first_name, company_name, post_text=None):
+    """Build the Gemini prompt for a contact."""
     # If there's no LinkedIn post, generate a simpler email
     if post_text:
         prompt = f"Craft a personalized email for {first_name} working at {company_name} based on this LinkedIn post: {post_text}. \
@@ -18,17 +92,116 @@ def generate_email(first_name, company_name, post_text=None):
         # Simpler email without LinkedIn post
         prompt = f"Craft a personalized email for {first_name} working at {company_name}. \
         Start by mentioning that ... Be personable and less salesy. Keep it brief."
+    return prompt
+
+
+def _generate_text(prompt, on_chunk=None):
+    """Call Gemini within the scheduler's 'gemini' request/token budget, retrying quota errors.
+
+    With on_chunk the reply is streamed: on_chunk(text) is called for every chunk and the
+    time to the first chunk is recorded as 'gemini.first_token'.
+    """
+    chunks = []
 
-    # Generate content using Gemini AI
-    model = genai.GenerativeModel('gemini-1.5-flash-latest')
-    response = model.generate_content(prompt)
-    email_content = response.text
+    def call():
+        chunks.clear()
+        with span('gemini.generate_content'):
+            if on_chunk is None:
+                return _get_model().generate_content(prompt).text
+            started = time.perf_counter()
+            for chunk in _get_model().generate_content(prompt, stream=True):
+                if not chunks:
+                    record('gemini.first_token', time.perf_counter() - started)
+                chunks.append(chunk.text)
+                on_chunk(chunk.text)
+            return ''.join(chunks)
 
-    # Extract the subject line and clean up the email content
-    subject, cleaned_email_content = extract_subject_and_clean(email_content)
+    return get_scheduler().run(
+        'gemini', call, cost={'tokens': len(prompt) // 4 + _RESPONSE_TOKENS},
+        retries=GEMINI_MAX_RETRIES, stage='gemini.generate_content',
+        # A reply that already started streaming has been partly shown, so it is not retried
+        should_retry=lambda error: not chunks,
+    )
+
+
+@traced('gemini.generate_email')
+def generate_email(first_name, company_name, post_text=None, refresh=False, on_text=None):
+    """Generate a personalized email using the Gemini AI model.
+
+    Emails are served from the cache when the same inputs were generated before. Pass
+    refresh=True ("Try Again") to skip the cache and store a new variant in its place.
+    With on_text, a generated reply is streamed and on_text(body) is called with the
+    cleaned body so far each time it grows.
+    """
+    cache = _get_email_cache()
+    key = email_cache_key(first_name, company_name, post_text)
+    cached = cache.get(key)
+    if cached is not None and not refresh:
+        return cached['subject'], cached['body']
+
+    prompt = build_prompt(first_name, company_name, post_text)
+
+    if on_text is None:
+        # Generate content using Gemini AI
+        email_content = _generate_text(prompt)
+
+        # Extract the subject line and clean up the email content
+        subject, cleaned_email_content = extract_subject_and_clean(email_content)
+    else:
+        # Same cleanup, applied chunk by chunk as the reply streams in
+        cleaner = StreamingEmailCleaner()
+
+        def on_chunk(chunk):
+            body = cleaner.feed(chunk)
+            if body is not None:
+                on_text(body)
+
+        _generate_text(prompt, on_chunk)
+        subject, cleaned_email_content = cleaner.finish()
+
+    variant = cached['variant'] + 1 if cached is not None else 1
+    cache.set(key, {'subject': subject, 'body': cleaned_email_content, 'variant': variant})
 
     return subject, cleaned_email_content
 
+
+def generate_emails(contacts, max_workers=GEMINI_MAX_WORKERS, return_exceptions=False):
+    """Generate emails for many contacts concurrently; results are (subject, body) in input order.
+
+    Each contact is a dict with 'first_name', 'company_name' and optionally 'post_text'.
+    Every call is admitted by the scheduler's 'gemini' budget in the caller's lane. With
+    return_exceptions, a failed contact yields its exception instead of aborting the batch.
+    """
+    def generate(contact):
+        try:
+            return generate_email(contact['first_name'], contact['company_name'], contact.get('post_text'))
+        except Exception as error:
+            if not return_exceptions:
+                raise
+            return error
+
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='gemini') as executor:
+        # Each call runs in a copy of the caller's context, so it keeps its scheduler lane and tracing
+        futures = [executor.submit(contextvars.copy_context().run, generate, contact) for contact in contacts]
+        return [future.result() for future in futures]
+
+
+async def generate_email_async(first_name, company_name, post_text=None, on_text=None):
+    """Async variant of generate_email; the blocking call runs in the loop's default executor."""
+    return await asyncio.to_thread(generate_email, first_name, company_name, post_text, on_text=on_text)
+
+
+async def generate_emails_async(contacts, max_concurrency=GEMINI_MAX_WORKERS, return_exceptions=False):
+    """Async variant of generate_emails, so AI latency can overlap with other awaited I/O."""
+    semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def generate(contact):
+        async with semaphore:
+            return await generate_email_async(contact['first_name'], contact['company_name'], contact.get('post_text'))
+
+    return await asyncio.gather(*(generate(contact) for contact in contacts), return_exceptions=return_exceptions)
+
+
 def extract_subject_and_clean(email_content):
     """Extract the subject line and clean up the email content by removing the subject and converting links."""
     # 1. Extract the "Subject: ..." line
@@ -42,3 +215,64 @@ def extract_subject_and_clean(email_content):
     email_body = re.sub(r"\[.*?\]\((.*?)\)", r"\1", email_body)
 
     return subject, email_body
+
+
+class StreamingEmailCleaner:
+    """Incremental extract_subject_and_clean for a streamed reply.
+
+    feed() takes each chunk and returns the cleaned body so far (None if nothing new can be
+    shown yet); finish() returns the same (subject, body) as extract_subject_and_clean on the
+    whole reply. Both regexes stop at line ends, so complete lines are cleaned once and only
+    the unfinished last line is held back: entirely until the subject line has been removed,
+    and from an unclosed Markdown link onwards after that.
+    """
+
+    def __init__(self):
+        self.subject = None
+        self._removed = False  # the "Subject:" line has been taken out of the body
+        self._carry = ''  # text before "Subject:" on the removed line, joined with the next line
+        self._pending = ''  # unfinished last line
+        self._raw_body = ''
+        self._body = ''  # self._raw_body with its links converted
+        self._shown = None
+
+    def feed(self, chunk):
+        self._pending += chunk
+        *lines, self._pending = self._pending.split('\n')
+        for line in lines:
+            self._add_line(line)
+
+        body = self._body
+        if self._removed:
+            partial = self._carry + self._pending
+            link_start = partial.rfind('[')
+            if link_start != -1 and ')' not in partial[link_start:]:
+                partial = partial[:link_start]
+            body += _convert_links(partial)
+        body = body.lstrip()
+        if body == self._shown:
+            return None
+        self._shown = body
+        return body
+
+    def finish(self):
+        # Without a trailing newline the last line is never the subject line. As in
+        # extract_subject_and_clean, the body is stripped before its links are converted.
+        body = (self._raw_body + self._carry + self._pending).strip()
+        return (self.subject if self.subject is not None else "No Subject"), _convert_links(body)
+
+    def _add_line(self, line):
+        if self.subject is None and 'Subject: ' in line:
+            self.subject = line[line.index('Subject: ') + len('Subject: '):].strip()
+        line, self._carry = self._carry + line, ''
+        if not self._removed and 'Subject:' in line:
+            self._carry = line[:line.index('Subject:')]
+            self._removed = True
+            return
+        self._raw_body += line + '\n'
+        self._body += _convert_links(line) + '\n'
+
+
+def _convert_links(text):
+    # Markdown links [text](url) become just the URL, as in extract_subject_and_clean
+    return re.sub(r"\[.*?\]\((.*?)\)", r"\1", text)
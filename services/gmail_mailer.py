@@ -0,0 +1,383 @@
+# services/gmail_mailer.py
+
+import atexit
+import base64
+import hashlib
+import os
+import random
+import socket
+import sqlite3
+import threading
+import time
+from email.mime.text import MIMEText
+import config
+from services.google_clients import google_service, execute
+from services.sheet_writer import queue_contact_update, process_running
+from utils.contact_store import get_contact_store
+from utils.scheduler import get_scheduler, priority, error_status, is_backend_failure, BATCH
+from utils.tracing import record_retry
+
+GMAIL_QUEUE_PATH = getattr(config, 'GMAIL_QUEUE_PATH', 'cache/gmail_queue.sqlite')
+# Google recommends at most 50 requests per Gmail batch.
+GMAIL_BATCH_SIZE = getattr(config, 'GMAIL_BATCH_SIZE', 50)
+GMAIL_FLUSH_INTERVAL = getattr(config, 'GMAIL_FLUSH_INTERVAL', 2.0)
+# Per-user quota: 250 units per second (messages.send costs 100, drafts.create 10, *.list 5).
+GMAIL_QUOTA_UNITS_PER_SECOND = getattr(config, 'GMAIL_QUOTA_UNITS_PER_SECOND', 250)
+# Messages sent per rolling 24 hours: 500 for consumer accounts, 2000 for Workspace.
+GMAIL_DAILY_SEND_LIMIT = getattr(config, 'GMAIL_DAILY_SEND_LIMIT', 500)
+GMAIL_MAX_ATTEMPTS = getattr(config, 'GMAIL_MAX_ATTEMPTS', 5)
+GMAIL_WAIT_POLL_INTERVAL = getattr(config, 'GMAIL_WAIT_POLL_INTERVAL', 0.25)
+# A batch claimed by another mailer (e.g. batch.py next to app.py on the same queue) is only looked up
+# in Gmail once this lease has run out or that mailer's process has exited; until then it may still be sending.
+GMAIL_CLAIM_LEASE = getattr(config, 'GMAIL_CLAIM_LEASE', 300.0)
+
+QUOTA_UNITS = {'draft': 10, 'send': 100, 'list': 5}
+get_scheduler().register('gmail', {'units': (GMAIL_QUOTA_UNITS_PER_SECOND, 1.0)})
+STATUSES = ('queued', 'sending', 'sent', 'failed')
+_COLUMNS = ('key', 'kind', 'recipient', 'subject', 'body', 'sheet_id', 'row_number', 'status',
+            'gmail_id', 'error', 'attempts', 'next_attempt_at', 'created_at', 'updated_at', 'claimed_by',
+            'lease_expires')
+
+
+def build_raw_message(subject, body, recipient_email, message_id=None):
+    """Return the base64url-encoded MIME message the Gmail API expects."""
+    message = MIMEText(body)
+    message['to'] = recipient_email
+    message['subject'] = subject
+    if message_id:
+        message['Message-ID'] = message_id
+    return base64.urlsafe_b64encode(message.as_bytes()).decode()
+
+
+def message_key(kind, *parts):
+    """Idempotency key for a Gmail job, e.g. message_key('send', sheet_id, row_number, email)."""
+    return kind + '-' + hashlib.sha256('\x1f'.join(str(part) for part in parts).encode()).hexdigest()[:32]
+
+
+def _message_id(key):
+    # Stable Message-ID header, so a job whose outcome was lost can be looked up in Gmail.
+    return f'<{key}@outreach.local>'
+
+
+class GmailMailer:
+    """Persistent, batched queue of Gmail drafts and sends.
+
+    Jobs are stored in SQLite under an idempotency key before anything is sent: submitting
+    the same key again returns the existing job instead of queuing a second message. Due
+    jobs go out as one BatchHttpRequest of up to `batch_size` calls, paced by the per-user
+    quota units (the scheduler's 'gmail' budget) and the daily send limit. Claimed jobs record
+    the mailer that claimed them and a lease. A job caught mid-batch by a crash stays 'sending';
+    once its mailer is gone (or its lease ran out) a flush looks its Message-ID up in Gmail and
+    only requeues it if it never arrived.
+    """
+
+    def __init__(self, path=GMAIL_QUEUE_PATH, batch_size=GMAIL_BATCH_SIZE, interval=GMAIL_FLUSH_INTERVAL,
+                 daily_send_limit=GMAIL_DAILY_SEND_LIMIT,
+                 max_attempts=GMAIL_MAX_ATTEMPTS):
+        self.path = path
+        self.batch_size = batch_size
+        self.interval = interval
+        self.daily_send_limit = daily_send_limit
+        self.max_attempts = max_attempts
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._changed = threading.Condition()
+        self._wake = threading.Event()
+        self._closed = False
+        self._stats = {'batches': 0, 'requests': 0, 'retries': 0, 'recovered': 0}
+        # host:pid:instance, so claims of another mailer in this process are not taken for ours
+        self._owner = f'{socket.gethostname()}:{os.getpid()}:{id(self):x}'
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS jobs ('
+            'key TEXT PRIMARY KEY, kind TEXT NOT NULL, recipient TEXT NOT NULL, subject TEXT, body TEXT NOT NULL, '
+            'sheet_id TEXT, row_number INTEGER, status TEXT NOT NULL, gmail_id TEXT, error TEXT, '
+            'attempts INTEGER NOT NULL DEFAULT 0, next_attempt_at REAL NOT NULL DEFAULT 0, '
+            'created_at REAL NOT NULL, updated_at REAL NOT NULL, claimed_by TEXT, lease_expires REAL)'
+        )
+        columns = {row[1] for row in self._conn.execute('PRAGMA table_info(jobs)')}
+        for column in ('claimed_by TEXT', 'lease_expires REAL'):
+            if column.split()[0] not in columns:
+                self._conn.execute(f'ALTER TABLE jobs ADD COLUMN {column}')  # Queues created before claims had owners
+        self._conn.execute('CREATE INDEX IF NOT EXISTS jobs_due ON jobs (status, next_attempt_at)')
+        self._conn.commit()
+
+        self._thread = threading.Thread(target=self._run, name='gmail-mailer', daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def submit(self, kind, subject, body, recipient_email, key=None, sheet_id=None, row_number=None):
+        """Queue a 'draft' or 'send' and return its job; returns immediately.
+
+        key defaults to a hash of the message, so the same draft is never saved twice. When
+        sheet_id and row_number are given, a sent email is recorded in that row ("Email").
+        A job that already exists is returned unchanged, unless it had failed, in which
+        case it is queued again.
+        """
+        if kind not in ('draft', 'send'):
+            raise ValueError(f"Unknown Gmail job kind: {kind}")
+        key = key or message_key(kind, subject, body, recipient_email)
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                'INSERT OR IGNORE INTO jobs (key, kind, recipient, subject, body, sheet_id, row_number, status, '
+                'created_at, updated_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                (key, kind, recipient_email, subject, body, sheet_id, row_number, 'queued', now, now),
+            )
+            self._conn.execute(
+                "UPDATE jobs SET status = 'queued', attempts = 0, next_attempt_at = 0, error = NULL, updated_at = ? "
+                "WHERE key = ? AND status = 'failed'",
+                (now, key),
+            )
+            self._conn.commit()
+            due = self._conn.execute("SELECT COUNT(*) FROM jobs WHERE status = 'queued'").fetchone()[0]
+            job = self._job(key)
+        if due >= self.batch_size:
+            self._wake.set()
+        return job
+
+    def job(self, key):
+        """Return the job stored under key as a dict, or None."""
+        with self._lock:
+            return self._job(key)
+
+    def wait(self, key, timeout=None):
+        """Ask the background thread to flush now and block until the job is sent or failed (or timeout)."""
+        self._wake.set()
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._changed:
+            # Also look every GMAIL_WAIT_POLL_INTERVAL: another process sharing the queue may send it
+            while self.job(key)['status'] not in ('sent', 'failed'):
+                remaining = GMAIL_WAIT_POLL_INTERVAL if deadline is None else deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._changed.wait(min(remaining, GMAIL_WAIT_POLL_INTERVAL))
+        return self.job(key)
+
+    def flush(self):
+        """Send every due job now, in batches. Returns the number of jobs that reached a final status."""
+        with self._flush_lock:
+            self._recover()
+            finished = 0
+            while True:
+                jobs = self._claim()
+                if not jobs:
+                    return finished
+                finished += self._deliver(jobs)
+
+    def counts(self):
+        """Return {status: jobs} for every status; cheap enough to poll on each Streamlit rerun."""
+        with self._lock:
+            rows = self._conn.execute('SELECT status, COUNT(*) FROM jobs GROUP BY status').fetchall()
+        counts = dict.fromkeys(STATUSES, 0)
+        counts.update(rows)
+        return counts
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats['daily_remaining'] = self._daily_remaining()
+        stats.update(self.counts())
+        return stats
+
+    def close(self):
+        """Stop the background thread. Queued jobs stay on disk and are sent by the next mailer."""
+        if self._closed:
+            return
+        self._closed = True
+        self._wake.set()
+        self._thread.join(timeout=1)
+
+    def _claim(self):
+        # Move the next batch of due jobs to 'sending' (within the daily send limit) and return them.
+        now = time.time()
+        with self._lock, self._conn:
+            # Other processes may claim from the same queue: hold the write lock from the read to the update
+            self._conn.execute('BEGIN IMMEDIATE')
+            jobs = [dict(zip(_COLUMNS, row)) for row in self._conn.execute(
+                f"SELECT {', '.join(_COLUMNS)} FROM jobs WHERE status = 'queued' AND next_attempt_at <= ? "
+                "ORDER BY created_at LIMIT ?",
+                (now, self.batch_size),
+            )]
+            sends_left = self._daily_remaining()
+            claimed = []
+            for job in jobs:
+                if job['kind'] == 'send':
+                    if sends_left <= 0:
+                        continue
+                    sends_left -= 1
+                claimed.append(job)
+            self._conn.executemany(
+                "UPDATE jobs SET status = 'sending', attempts = attempts + 1, claimed_by = ?, lease_expires = ?, "
+                'updated_at = ? WHERE key = ?',
+                [(self._owner, now + GMAIL_CLAIM_LEASE, now, job['key']) for job in claimed],
+            )
+        for job in claimed:
+            job.update(attempts=job['attempts'] + 1, claimed_by=self._owner, lease_expires=now + GMAIL_CLAIM_LEASE)
+        return claimed
+
+    def _deliver(self, jobs):
+        def request(service, job):
+            raw = build_raw_message(job['subject'], job['body'], job['recipient'], _message_id(job['key']))
+            if job['kind'] == 'draft':
+                return service.users().drafts().create(userId='me', body={'message': {'raw': raw}})
+            return service.users().messages().send(userId='me', body={'raw': raw})
+
+        # A failed batch.execute() raises here and leaves the jobs 'sending' for _recover()
+        results = self._execute_batch(jobs, request, lambda job: QUOTA_UNITS[job['kind']])
+
+        finished = 0
+        now = time.time()
+        with self._lock:
+            for job in jobs:
+                response, error = results.get(job['key'], (None, RuntimeError("No response in the batch")))
+                if error is None:
+                    self._finish(job, 'sent', gmail_id=response.get('id'))
+                    finished += 1
+                    continue
+                status = error_status(error)
+                if not is_backend_failure(error) or job['attempts'] >= self.max_attempts:
+                    self._finish(job, 'failed', error=str(error))
+                    finished += 1
+                else:
+                    if job['kind'] == 'draft' or status == 429:
+                        delay = random.uniform(0, min(60, 2 ** job['attempts']))
+                        self._conn.execute(
+                            "UPDATE jobs SET status = 'queued', next_attempt_at = ?, error = ?, updated_at = ? "
+                            "WHERE key = ?",
+                            (now + delay, str(error), now, job['key']),
+                        )
+                    # A send that hit a 5xx may have gone out anyway; it stays 'sending' and is looked up first
+                    self._stats['retries'] += 1
+                    record_retry('gmail.batch')
+            self._conn.commit()
+        with self._changed:
+            self._changed.notify_all()
+        return finished
+
+    def _recover(self):
+        # Resolve jobs left 'sending' by a crash or a failed batch: look their Message-ID up in Gmail.
+        # Our own claims are never in flight here (flush holds _flush_lock); another mailer's only
+        # once its process has exited or its lease has run out.
+        with self._lock:
+            jobs = [dict(zip(_COLUMNS, row)) for row in self._conn.execute(
+                f"SELECT {', '.join(_COLUMNS)} FROM jobs WHERE status = 'sending'"
+            )]
+        now = time.time()
+        jobs = [job for job in jobs if self._abandoned(job, now)]
+        if not jobs:
+            return
+
+        def request(service, job):
+            query = f"rfc822msgid:{_message_id(job['key'])[1:-1]}"
+            if job['kind'] == 'draft':
+                return service.users().drafts().list(userId='me', q=query)
+            return service.users().messages().list(userId='me', q=query, includeSpamTrash=True)
+
+        for start in range(0, len(jobs), self.batch_size):
+            chunk = jobs[start:start + self.batch_size]
+            results = self._execute_batch(chunk, request, lambda job: QUOTA_UNITS['list'])
+            now = time.time()
+            with self._lock:
+                for job in chunk:
+                    response, error = results.get(job['key'], (None, None))
+                    if error is not None or response is None:
+                        continue  # Still unknown; checked again on the next flush
+                    found = response.get('drafts' if job['kind'] == 'draft' else 'messages') or []
+                    if found:
+                        self._finish(job, 'sent', gmail_id=found[0]['id'])
+                    else:
+                        # Unless another mailer has claimed it again meanwhile
+                        self._conn.execute(
+                            "UPDATE jobs SET status = 'queued', claimed_by = NULL, lease_expires = NULL, updated_at = ? "
+                            "WHERE key = ? AND status = 'sending' AND claimed_by IS ?",
+                            (now, job['key'], job['claimed_by']),
+                        )
+                    self._stats['recovered'] += 1
+                self._conn.commit()
+        with self._changed:
+            self._changed.notify_all()
+
+    def _abandoned(self, job, now):
+        # Whether no mailer can still be sending a 'sending' job.
+        owner = job['claimed_by']
+        if owner is None or owner == self._owner or (job['lease_expires'] or 0) <= now:
+            return True
+        host, pid = owner.split(':')[:2]
+        return host == socket.gethostname() and pid.isdigit() and not process_running(int(pid))
+
+    def _execute_batch(self, jobs, request, units):
+        """Run request(service, job) for every job in one BatchHttpRequest; return {key: (response, error)}."""
+        results = {}
+
+        def callback(request_id, response, exception):
+            results[request_id] = (response, exception)
+
+        with google_service('gmail', 'v1') as service:
+            batch = service.new_batch_http_request(callback=callback)
+            for job in jobs:
+                batch.add(request(service, job), request_id=job['key'])
+            # Charged as the sum of its calls' quota units; only a 429 for the whole batch is retried
+            execute('gmail', batch, 'gmail.batch', idempotent=False,
+                    cost={'units': sum(units(job) for job in jobs)})
+        with self._lock:
+            self._stats['batches'] += 1
+            self._stats['requests'] += len(jobs)
+        return results
+
+    def _finish(self, job, status, gmail_id=None, error=None):
+        # Called with self._lock held.
+        self._conn.execute(
+            'UPDATE jobs SET status = ?, gmail_id = ?, error = ?, updated_at = ? WHERE key = ?',
+            (status, gmail_id, error, time.time(), job['key']),
+        )
+        if status == 'sent' and job['kind'] == 'send' and job['row_number'] is not None:
+            # The row is only marked once Gmail has accepted the message
+            queue_contact_update(job['sheet_id'], job['row_number'], "Email", job['body'])
+            get_contact_store(job['sheet_id']).mark_row(job['row_number'], 'sent', "Email")
+
+    def _daily_remaining(self):
+        # Called with self._lock held.
+        used = self._conn.execute(
+            "SELECT COUNT(*) FROM jobs WHERE kind = 'send' AND status IN ('sent', 'sending') AND updated_at > ?",
+            (time.time() - 86400,),
+        ).fetchone()[0]
+        return max(0, self.daily_send_limit - used)
+
+    def _job(self, key):
+        # Called with self._lock held.
+        row = self._conn.execute(f"SELECT {', '.join(_COLUMNS)} FROM jobs WHERE key = ?", (key,)).fetchone()
+        return dict(zip(_COLUMNS, row)) if row else None
+
+    def _run(self):
+        # Background sends queue behind the operator's own calls
+        with priority(BATCH):
+            while not self._closed:
+                self._wake.wait(self.interval)
+                self._wake.clear()
+                if self._closed:
+                    break
+                try:
+                    self.flush()
+                except Exception as error:
+                    print(f"An error occurred while sending queued Gmail messages: {error}")
+                with self._changed:
+                    self._changed.notify_all()
+
+
+_mailer = None
+_mailer_lock = threading.Lock()
+
+
+def get_mailer():
+    """Return the process-wide Gmail mailer."""
+    global _mailer
+    with _mailer_lock:
+        if _mailer is None:
+            _mailer = GmailMailer()
+        return _mailer
@@ -0,0 +1,135 @@
+# services/google_clients.py
+
+import os
+import threading
+import time
+from contextlib import contextmanager
+import config
+from config import SCOPES
+from utils.scheduler import get_scheduler, SCHEDULER_MAX_RETRIES
+from utils.startup import import_sdk
+from utils.tracing import span
+
+# Request budgets in the shared scheduler (Gmail's is registered by services/gmail_mailer.py).
+SHEETS_REQUESTS_PER_MINUTE = getattr(config, 'SHEETS_REQUESTS_PER_MINUTE', 60)
+DRIVE_REQUESTS_PER_MINUTE = getattr(config, 'DRIVE_REQUESTS_PER_MINUTE', 600)
+get_scheduler().register('sheets', {'requests': (SHEETS_REQUESTS_PER_MINUTE, 60)})
+get_scheduler().register('drive', {'requests': (DRIVE_REQUESTS_PER_MINUTE, 60)})
+
+# Process-wide registry: one set of credentials and a pool of built API clients
+# per (api, version). A built client owns its own httplib2 connection, which is
+# not thread-safe, so each client is checked out by one thread at a time and
+# returned to the pool afterwards to keep its connection (and TLS session) alive.
+_lock = threading.Lock()
+_creds = None
+_pools = {}
+_stats = {
+    'credential_loads': 0,
+    'credential_refreshes': 0,
+    'service_hits': 0,
+    'service_misses': 0,
+    'build_seconds': 0.0,
+}
+
+
+def authenticate_google():
+    """Authenticate with Google API for Gmail and Sheets."""
+    # The Google SDKs are imported on first use, so the UI can draw before they load
+    from google.oauth2.credentials import Credentials
+    from google.auth.transport.requests import Request
+    creds = None
+    # Load existing credentials from file
+    if os.path.exists('token.json'):
+        creds = Credentials.from_authorized_user_file('token.json', SCOPES)
+    # If there are no valid credentials available, log in and save them
+    if not creds or not creds.valid:
+        if creds and creds.expired and creds.refresh_token:
+            creds.refresh(Request())
+        else:
+            from google_auth_oauthlib.flow import InstalledAppFlow
+            flow = InstalledAppFlow.from_client_secrets_file('credentials.json', SCOPES)
+            creds = flow.run_local_server(port=0)
+        # Save the credentials for the next run
+        with open('token.json', 'w') as token:
+            token.write(creds.to_json())
+    return creds
+
+
+def get_credentials():
+    """Return the cached Google credentials, refreshing them only once they have expired."""
+    global _creds
+    with _lock:
+        if _creds is None:
+            with span('google.auth'):
+                _creds = authenticate_google()
+            _stats['credential_loads'] += 1
+        elif not _creds.valid and _creds.refresh_token:
+            from google.auth.transport.requests import Request
+            with span('google.refresh'):
+                _creds.refresh(Request())
+            _stats['credential_refreshes'] += 1
+            with open('token.json', 'w') as token:
+                token.write(_creds.to_json())
+        return _creds
+
+
+def _checkout(api, version):
+    """Take an idle client for api/version from the pool, building one if none is free."""
+    creds = get_credentials()
+    with _lock:
+        pool = _pools.setdefault((api, version), [])
+        if pool:
+            _stats['service_hits'] += 1
+            return pool.pop()
+        _stats['service_misses'] += 1
+
+    started = time.perf_counter()
+    build = import_sdk('googleapiclient.discovery').build
+    with span('google.build'):
+        service = build(api, version, credentials=creds, cache_discovery=False)
+    elapsed = time.perf_counter() - started
+    with _lock:
+        _stats['build_seconds'] += elapsed
+    return service
+
+
+@contextmanager
+def google_service(api, version):
+    """Borrow a pooled Google API client, e.g. `with google_service('gmail', 'v1') as service:`."""
+    service = _checkout(api, version)
+    try:
+        yield service
+    finally:
+        with _lock:
+            _pools.setdefault((api, version), []).append(service)
+
+
+def warm_up_clients(apis=(('sheets', 'v4'), ('drive', 'v3'), ('gmail', 'v1'))):
+    """Load the credentials and put one built client per API in the pool ahead of the first request."""
+    for api, version in apis:
+        with google_service(api, version):
+            pass
+
+
+def execute(budget, request, stage, idempotent=True, cost=None, retries=SCHEDULER_MAX_RETRIES):
+    """Execute a googleapiclient request through the scheduler's budget, timing each attempt as stage."""
+    def call():
+        with span(stage):
+            return request.execute()
+    return get_scheduler().run(budget, call, cost=cost, idempotent=idempotent, retries=retries, stage=stage)
+
+
+def client_stats():
+    """Return a snapshot of the registry counters (hits, misses, build time, pooled clients)."""
+    with _lock:
+        stats = dict(_stats)
+        stats['pooled_clients'] = {f'{api}/{version}': len(pool) for (api, version), pool in _pools.items()}
+    return stats
+
+
+def reset_clients():
+    """Drop cached credentials and clients, e.g. after the token has been revoked."""
+    global _creds
+    with _lock:
+        _creds = None
+        _pools.clear()
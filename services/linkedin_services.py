@@ -1,50 +1,202 @@
 # services/linkedin_services.py
 
-from linkedin_api import Linkedin
-from config import LINKEDIN_USERNAME, LINKEDIN_PASSWORD
+import contextvars
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import config
+from services.linkedin_session import SharedLinkedin, get_linkedin_session
+from utils.disk_cache import DiskCache, MISSING
+from utils.prospect_index import get_prospect_index
+from utils.tracing import traced
 
+# Worker threads for concurrent profile fetches; their request rate is the scheduler's
+# 'linkedin' budget (see services/linkedin_session.py).
+LINKEDIN_PROFILE_WORKERS = getattr(config, 'LINKEDIN_PROFILE_WORKERS', 4)
+
+# Lookup cache: search results by query, profiles and posts by urn_id. In cache-only mode
+# nothing is fetched from LinkedIn and a cache miss behaves like an empty result.
+LINKEDIN_CACHE_PATH = getattr(config, 'LINKEDIN_CACHE_PATH', 'cache/linkedin.sqlite')
+LINKEDIN_CACHE_TTLS = {'search': 7 * 86400, 'profile': 30 * 86400, 'posts': 86400}
+LINKEDIN_CACHE_TTLS.update(getattr(config, 'LINKEDIN_CACHE_TTLS', {}))
+LINKEDIN_CACHE_MAX_ENTRIES = getattr(config, 'LINKEDIN_CACHE_MAX_ENTRIES', 20000)
+# Empty results (no search hits, no posts) may be a transient LinkedIn hiccup, so they are kept only this long.
+LINKEDIN_EMPTY_TTL = getattr(config, 'LINKEDIN_EMPTY_TTL', 3600)
+LINKEDIN_CACHE_ONLY = getattr(config, 'LINKEDIN_CACHE_ONLY', False)
+
+_caches = {}
+_caches_lock = threading.Lock()
+
+
+def _cache(kind):
+    """Return the lookup cache for 'search', 'profile' or 'posts', opening it on first use."""
+    with _caches_lock:
+        if kind not in _caches:
+            _caches[kind] = DiskCache(
+                LINKEDIN_CACHE_PATH, f'linkedin_{kind}',
+                ttl=LINKEDIN_CACHE_TTLS[kind], max_entries=LINKEDIN_CACHE_MAX_ENTRIES,
+            )
+        return _caches[kind]
+
+
+def _cached_lookup(kind, key, fetch, empty):
+    """Return the cached value for key, calling fetch() and caching its result on a miss."""
+    cache = _cache(kind)
+    value = cache.get(key, MISSING)
+    if value is not MISSING:
+        return value
+    if LINKEDIN_CACHE_ONLY:
+        return empty
+    value = fetch()
+    cache.set(key, value, ttl=None if value else LINKEDIN_EMPTY_TTL)
+    return value
+
+
+def linkedin_cache_stats():
+    """Return hit/miss counters for each lookup cache that has been used."""
+    with _caches_lock:
+        caches = dict(_caches)
+    return {kind: cache.stats() for kind, cache in caches.items()}
+
+
+@traced('linkedin.authenticate')
 def authenticate_linkedin():
-    """Authenticate with LinkedIn API."""
-    linkedin_api = Linkedin(LINKEDIN_USERNAME, LINKEDIN_PASSWORD)
+    """Return the shared LinkedIn client; the login happens once per process, on first use."""
+    if LINKEDIN_CACHE_ONLY:
+        # Working offline: every lookup is served from the cache
+        return None
+    linkedin_api = SharedLinkedin(get_linkedin_session())
     return linkedin_api
 
+@traced('linkedin.search_person')
 def search_person(linkedin_api, first_name, company_name=None):
-    """Search for a person on LinkedIn."""
+    """Search for a person on LinkedIn, best match first.
+
+    The local prospect index answers first: the same person under another spelling of the
+    name or company, or a search another row is running right now, needs no new query.
+    """
     query = first_name
     if company_name:
         query += f' {company_name}'
-    search_results = linkedin_api.search_people(query)
-    return search_results
+    return get_prospect_index().search(
+        first_name, company_name,
+        lambda: _cached_lookup('search', query.strip().lower(), lambda: linkedin_api.search_people(query), []),
+        # Offline, a cache miss is not a real "no results"
+        remember=not LINKEDIN_CACHE_ONLY,
+    )
+
 
+@traced('linkedin.get_profile')
+def get_profile(linkedin_api, urn_id):
+    """Fetch a profile's details, served from the lookup cache when possible."""
+    return _cached_lookup('profile', urn_id, lambda: linkedin_api.get_profile(urn_id), {})
+
+
+@traced('linkedin.get_profile_posts')
+def get_profile_posts(linkedin_api, urn_id, post_count=1):
+    """Fetch a profile's most recent posts, served from the lookup cache when possible."""
+    return _cached_lookup(
+        'posts', f'{urn_id}:{post_count}',
+        lambda: linkedin_api.get_profile_posts(urn_id=urn_id, post_count=post_count), [],
+    )
+
+@traced('linkedin.find_profiles_in_mining')
 def find_profiles_in_mining(linkedin_api, search_results):
     """Filter profiles that have experience in mining companies."""
+    return _find_profiles_in_mining(linkedin_api, search_results)
+
+
+def _find_profiles_in_mining(linkedin_api, search_results):
     mining_profiles = []
     for profile in search_results:
-        profile_urn = profile.get('urn_id')
-        profile_detail = linkedin_api.get_profile(profile_urn)
-        experiences = profile_detail.get('experience', [])
-        for exp in experiences:
-            company = exp.get('companyName', '').lower()
-            if 'mining' in company:
+        if _is_mining_profile(linkedin_api, profile.get('urn_id')):
+            mining_profiles.append(profile)
+    return mining_profiles
+
+
+@traced('linkedin.find_profiles_in_mining_concurrent')
+def find_profiles_in_mining_concurrent(linkedin_api, search_results, limit=None, max_workers=LINKEDIN_PROFILE_WORKERS):
+    """Like find_profiles_in_mining, but fetch profile details on a bounded thread pool.
+
+    Results keep search order. Profiles already classified in the prospect index are not
+    fetched; with `limit`, nothing is fetched when those already give enough matches.
+    Otherwise stop once that many matches are known and cancel the fetches that have not
+    started yet. Falls back to the sequential version when only one worker is configured.
+    """
+    if max_workers <= 1 or len(search_results) <= 1:
+        # Untraced, so the call is timed once, under this function's stage
+        return _find_profiles_in_mining(linkedin_api, search_results)[:limit]
+
+    index = get_prospect_index()
+    known = [index.mining(profile.get('urn_id')) for profile in search_results]
+    mining_profiles = []
+    for profile, mining in zip(search_results, known):
+        if mining is None:
+            break
+        if mining:
+            mining_profiles.append(profile)
+            if limit is not None and len(mining_profiles) >= limit:
+                return mining_profiles
+    else:
+        return mining_profiles
+
+    mining_profiles = []
+    unknown = sum(1 for mining in known if mining is None)
+    executor = ThreadPoolExecutor(max_workers=min(max_workers, unknown))
+    try:
+        # Each fetch runs in a copy of the caller's context, so it keeps its scheduler lane and tracing
+        futures = [
+            executor.submit(contextvars.copy_context().run, _is_mining_profile, linkedin_api, profile.get('urn_id'))
+            if mining is None else None
+            for profile, mining in zip(search_results, known)
+        ]
+        for profile, mining, future in zip(search_results, known, futures):
+            if future is not None:
+                mining = future.result()
+            if mining:
                 mining_profiles.append(profile)
-                break
+                if limit is not None and len(mining_profiles) >= limit:
+                    break
+    finally:
+        # Don't wait for fetches still in flight once we have what we need
+        executor.shutdown(wait=False, cancel_futures=True)
     return mining_profiles
 
 
+def _is_mining_profile(linkedin_api, urn_id):
+    """Return whether a profile has mining experience, from the prospect index or by fetching it."""
+    index = get_prospect_index()
+    mining = index.mining(urn_id)
+    if mining is None:
+        profile_detail = get_profile(linkedin_api, urn_id)
+        mining = _has_mining_experience(profile_detail)
+        if profile_detail:
+            index.add_profile(urn_id, mining)
+    return mining
+
+
+def _has_mining_experience(profile_detail):
+    """Return True if any position in the profile is at a company with 'mining' in its name."""
+    for exp in profile_detail.get('experience', []):
+        company = exp.get('companyName', '').lower()
+        if 'mining' in company:
+            return True
+    return False
+
+
+@traced('linkedin.send_message')
 def send_linkedin_message(linkedin_api, urn_id, message):
-    """Send a LinkedIn message to a specific user and print the response for debugging."""
+    """Send a LinkedIn message to a specific user. Returns True if it was sent."""
     try:
-        # Send the message using LinkedIn's API
-        response = linkedin_api.send_message(message_body=message, recipients=[urn_id])
-        
-        if response:
+        # Send the message using LinkedIn's API (paced by the scheduler's 'linkedin_messages' budget);
+        # linkedin-api returns True when sending *failed*
+        failed = linkedin_api.send_message(message_body=message, recipients=[urn_id])
+
+        if not failed:
             print(f"Message sent successfully to URN ID: {urn_id}")
         else:
             print(f"Failed to send message to URN ID: {urn_id}")
-        
-        # Print the actual response for debugging purposes
-        print(f"LinkedIn API Response: {response}")
-        return response
+        return not failed
     except Exception as error:
         print(f"An error occurred while sending the LinkedIn message: {error}")
         return False  # Return False if there is an error
+
@@ -0,0 +1,152 @@
+# services/linkedin_session.py
+
+import threading
+import time
+import config
+from config import LINKEDIN_USERNAME, LINKEDIN_PASSWORD
+from utils.scheduler import get_scheduler
+from utils.startup import import_sdk
+from utils.tracing import span, record_retry
+
+# Where linkedin-api persists session cookies between runs, and how many calls may use
+# the shared session at once.
+LINKEDIN_COOKIES_DIR = getattr(config, 'LINKEDIN_COOKIES_DIR', 'cache/linkedin_cookies/')
+LINKEDIN_MAX_CONCURRENCY = getattr(config, 'LINKEDIN_MAX_CONCURRENCY', 4)
+# Request budget for lookups; outgoing messages are paced separately and much more conservatively.
+LINKEDIN_REQUESTS_PER_SECOND = getattr(config, 'LINKEDIN_REQUESTS_PER_SECOND', 2)
+LINKEDIN_MESSAGES_PER_MINUTE = getattr(config, 'LINKEDIN_MESSAGES_PER_MINUTE', 5)
+
+get_scheduler().register(
+    'linkedin', {'requests': (LINKEDIN_REQUESTS_PER_SECOND, 1.0)}, max_concurrency=LINKEDIN_MAX_CONCURRENCY,
+)
+get_scheduler().register('linkedin_messages', {'messages': (LINKEDIN_MESSAGES_PER_MINUTE, 60)}, max_concurrency=1)
+
+
+class LinkedinSession:
+    """One logged-in linkedin_api client per process, shared by every session and worker.
+
+    The first login reuses cookies saved by a previous run when they are still valid. A call
+    that fails authentication triggers a single fresh login and is retried once. Calls go
+    through the scheduler's 'linkedin' budget ('linkedin_messages' for send_message). Login
+    and lookup time are measured separately; lookup time covers only successful lookup
+    calls to LinkedIn, not sends or time spent queued in the scheduler.
+    """
+
+    def __init__(self, username=LINKEDIN_USERNAME, password=LINKEDIN_PASSWORD, cookies_dir=LINKEDIN_COOKIES_DIR):
+        self.username = username
+        self.password = password
+        self.cookies_dir = cookies_dir
+        self._client = None
+        self._generation = 0
+        self._login_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._stats = {
+            'logins': 0, 'login_seconds': 0.0, 'reauths': 0,
+            'lookups': 0, 'lookup_seconds': 0.0, 'lookup_errors': 0,
+        }
+
+    def client(self):
+        """Return the shared client, logging in on first use."""
+        with self._login_lock:
+            if self._client is None:
+                self._login(refresh_cookies=False)
+            return self._client
+
+    def call(self, method, *args, **kwargs):
+        """Call a linkedin_api method on the shared client, re-authenticating once on auth failure."""
+        for attempt in range(2):
+            client = self.client()
+            generation = self._generation
+            try:
+                return get_scheduler().run(
+                    'linkedin_messages' if method == 'send_message' else 'linkedin',
+                    lambda: self._request(client, method, args, kwargs),
+                    # A message that may have been delivered is never sent again
+                    idempotent=method != 'send_message', stage=f'linkedin.api.{method}',
+                )
+            except Exception as error:
+                if attempt or not _is_auth_failure(error):
+                    raise
+                record_retry(f'linkedin.api.{method}')
+                self._reauthenticate(generation)
+
+    def _request(self, client, method, args, kwargs):
+        # Runs once the scheduler has admitted the call, so only LinkedIn's own time is measured
+        lookup = method != 'send_message'
+        started = time.perf_counter()
+        try:
+            with span(f'linkedin.api.{method}'):
+                result = getattr(client, method)(*args, **kwargs)
+        except Exception:
+            if lookup:
+                with self._stats_lock:
+                    self._stats['lookup_errors'] += 1
+            raise
+        if lookup:
+            with self._stats_lock:
+                self._stats['lookups'] += 1
+                self._stats['lookup_seconds'] += time.perf_counter() - started
+        return result
+
+    def stats(self):
+        """Return login and lookup counts and timings."""
+        with self._stats_lock:
+            return dict(self._stats)
+
+    def _reauthenticate(self, generation):
+        with self._login_lock:
+            # Another thread may already have logged in again while we waited
+            if self._generation == generation:
+                self._login(refresh_cookies=True)
+                with self._stats_lock:
+                    self._stats['reauths'] += 1
+
+    def _login(self, refresh_cookies):
+        # Called with self._login_lock held.
+        started = time.perf_counter()
+        Linkedin = import_sdk('linkedin_api').Linkedin
+        with span('linkedin.login'):
+            self._client = Linkedin(
+                self.username, self.password,
+                refresh_cookies=refresh_cookies, cookies_dir=self.cookies_dir,
+            )
+        self._generation += 1
+        with self._stats_lock:
+            self._stats['logins'] += 1
+            self._stats['login_seconds'] += time.perf_counter() - started
+
+
+class SharedLinkedin:
+    """Drop-in stand-in for a linkedin_api.Linkedin object that routes calls through a LinkedinSession."""
+
+    def __init__(self, session):
+        self._session = session
+
+    def __getattr__(self, method):
+        def call(*args, **kwargs):
+            return self._session.call(method, *args, **kwargs)
+        return call
+
+
+def _is_auth_failure(error):
+    try:
+        from linkedin_api.client import UnauthorizedException
+    except ImportError:  # older linkedin-api releases
+        UnauthorizedException = None
+    if UnauthorizedException is not None and isinstance(error, UnauthorizedException):
+        return True
+    response = getattr(error, 'response', None)
+    return getattr(response, 'status_code', None) in (401, 403)
+
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def get_linkedin_session():
+    """Return the process-wide LinkedIn session."""
+    global _session
+    with _session_lock:
+        if _session is None:
+            _session = LinkedinSession()
+        return _session
@@ -0,0 +1,202 @@
+# services/sheet_writer.py
+
+import atexit
+import glob
+import json
+import os
+import threading
+import config
+from services.google_clients import google_service, execute
+from utils.scheduler import priority, BATCH
+
+# Flush once this many rows are pending or this many seconds have passed, whichever is first.
+SHEET_WRITE_BATCH_SIZE = getattr(config, 'SHEET_WRITE_BATCH_SIZE', 50)
+SHEET_WRITE_INTERVAL = getattr(config, 'SHEET_WRITE_INTERVAL', 5.0)
+SHEET_WRITE_JOURNAL = getattr(config, 'SHEET_WRITE_JOURNAL', 'cache/sheet_writes.json')
+SHEET_WRITE_MAX_RETRIES = getattr(config, 'SHEET_WRITE_MAX_RETRIES', 6)
+
+
+class SheetWriteBuffer:
+    """Write-behind queue for the "Contacted via" / message columns (H:I) of one sheet.
+
+    Updates are coalesced per row (the last write wins) and sent as a single
+    spreadsheets.values.batchUpdate within the scheduler's 'sheets' budget. Pending updates
+    are journaled to disk, so they survive a crash and are sent on the next start; they are
+    also flushed at interpreter exit. Every process (app.py, batch.py, workers) has its own
+    journal, SHEET_WRITE_JOURNAL.<pid>; a new buffer takes over the journals of processes
+    that are no longer running.
+    """
+
+    def __init__(self, sheet_id, batch_size=SHEET_WRITE_BATCH_SIZE, interval=SHEET_WRITE_INTERVAL,
+                 journal_path=SHEET_WRITE_JOURNAL, max_retries=SHEET_WRITE_MAX_RETRIES):
+        self.sheet_id = sheet_id
+        self.batch_size = batch_size
+        self.interval = interval
+        self.journal_path = f'{journal_path}.{os.getpid()}'
+        self.max_retries = max_retries
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._closed = False
+        self._pending = self._load_journal(self.journal_path) or {}  # row_number -> [contact_method, message]
+        self._adopt_journals(journal_path)
+        self._stats = {'queued': 0, 'coalesced': 0, 'flushes': 0, 'rows_written': 0, 'failures': 0}
+        self._thread = threading.Thread(target=self._run, name='sheet-writer', daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def queue(self, row_number, contact_method, message):
+        """Queue an update for a row; returns immediately."""
+        with self._lock:
+            if row_number in self._pending:
+                self._stats['coalesced'] += 1
+            self._pending[row_number] = [contact_method, message]
+            self._stats['queued'] += 1
+            self._save_journal()
+            full = len(self._pending) >= self.batch_size
+        if full:
+            self._wake.set()
+
+    def flush(self):
+        """Send every pending update now. Returns the number of rows written."""
+        with self._flush_lock:
+            with self._lock:
+                batch = dict(self._pending)
+            if not batch:
+                return 0
+
+            self._batch_update(batch)
+
+            with self._lock:
+                # Keep rows that were queued again while the request was in flight
+                for row_number, values in batch.items():
+                    if self._pending.get(row_number) == values:
+                        del self._pending[row_number]
+                self._stats['flushes'] += 1
+                self._stats['rows_written'] += len(batch)
+                self._save_journal()
+            return len(batch)
+
+    def close(self):
+        """Stop the background thread and flush whatever is still pending."""
+        if self._closed:
+            return
+        self._closed = True
+        self._wake.set()
+        self._thread.join(timeout=self.interval + 1)
+        try:
+            self.flush()
+        except Exception as error:
+            print(f"Pending sheet updates kept in {self.journal_path}: {error}")
+            return
+        if os.path.exists(self.journal_path):
+            os.remove(self.journal_path)
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats['pending'] = len(self._pending)
+        return stats
+
+    def _batch_update(self, batch):
+        body = {
+            'valueInputOption': 'RAW',
+            'data': [
+                {'range': f'Sheet1!H{row_number}:I{row_number}', 'values': [values]}
+                for row_number, values in sorted(batch.items())
+            ],
+        }
+        try:
+            with google_service('sheets', 'v4') as service:
+                # values.batchUpdate is idempotent, so 5xx errors are retried as well as 429s
+                return execute(
+                    'sheets', service.spreadsheets().values().batchUpdate(spreadsheetId=self.sheet_id, body=body),
+                    'sheets.batch_update', retries=self.max_retries,
+                )
+        except Exception:
+            with self._lock:
+                self._stats['failures'] += 1
+            raise
+
+    def _run(self):
+        # Background writes queue behind the operator's own calls
+        with priority(BATCH):
+            while not self._closed:
+                self._wake.wait(self.interval)
+                self._wake.clear()
+                if self._closed:
+                    break
+                try:
+                    self.flush()
+                except Exception as error:
+                    print(f"An error occurred while writing to the sheet: {error}")
+
+    def _load_journal(self, path):
+        if not os.path.exists(path):
+            return {}
+        with open(path) as f:
+            journal = json.load(f)
+        if journal.get('sheet_id') != self.sheet_id:
+            return None
+        return {int(row_number): values for row_number, values in journal['pending'].items()}
+
+    def _adopt_journals(self, base_path):
+        # Called from __init__; queues the updates a stopped process never wrote, then drops its journal.
+        # base_path itself is the single journal older versions shared between processes.
+        adopted = []
+        for path in [base_path] + glob.glob(glob.escape(base_path) + '.*'):
+            pid = path[len(base_path) + 1:]
+            if path == self.journal_path or (path != base_path and (not pid.isdigit() or process_running(int(pid)))):
+                continue
+            pending = self._load_journal(path)
+            if pending is None:
+                continue  # Missing, or another sheet's updates
+            for row_number, values in pending.items():
+                self._pending.setdefault(row_number, values)
+            adopted.append(path)
+        if adopted:
+            with self._lock:
+                self._save_journal()
+            for path in adopted:
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass  # Adopted by another process starting at the same time
+
+    def _save_journal(self):
+        # Called with self._lock held; write-then-rename so a crash never leaves half a file.
+        directory = os.path.dirname(self.journal_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = self.journal_path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump({'sheet_id': self.sheet_id, 'pending': self._pending}, f)
+        os.replace(tmp_path, self.journal_path)
+
+
+def process_running(pid):
+    """Whether a process with this pid is running on this host."""
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass  # Running, under another user
+    return True
+
+
+_writers = {}
+_writers_lock = threading.Lock()
+
+
+def get_sheet_writer(sheet_id):
+    """Return the process-wide write buffer for a sheet."""
+    with _writers_lock:
+        if sheet_id not in _writers:
+            _writers[sheet_id] = SheetWriteBuffer(sheet_id)
+        return _writers[sheet_id]
+
+
+def queue_contact_update(sheet_id, row_number, contact_method, message):
+    """Queue the contact method and message for a row; they are written in the next batch."""
+    get_sheet_writer(sheet_id).queue(row_number, contact_method, message)
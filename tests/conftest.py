@@ -0,0 +1,19 @@
+# tests/conftest.py
+#
+# The app modules read config at import time, so the benchmark fakes (stand-in LinkedIn,
+# Gemini, Sheets and Gmail backends plus a config module) are installed before any test
+# module imports them. Everything the app writes goes to a scratch directory.
+
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks import fakes  # noqa: E402
+
+ROWS = fakes.make_rows(20, duplicate_rate=0)
+
+_workdir = tempfile.mkdtemp(prefix='outreach-tests-')
+os.chdir(_workdir)
+backends = fakes.install(ROWS, _workdir, config_overrides={'DEPLOYMENT_MODE': 'workers'}, latency_scale=0)
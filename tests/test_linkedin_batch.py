@@ -0,0 +1,73 @@
+# tests/test_linkedin_batch.py
+
+import threading
+import time
+
+import pytest
+
+from benchmarks import fakes
+from conftest import ROWS
+from services import linkedin_session  # noqa: F401  (registers the 'linkedin_messages' budget)
+from utils.action_queue import get_action_queue, send_linkedin_messages, SharedActionQueue
+from utils.rate_limit import SharedRateLimiter
+from utils.scheduler import get_scheduler
+from utils.sheet_data import make_contact
+
+MESSAGES_PER_SECOND = 4
+
+
+@pytest.fixture
+def sends(monkeypatch, tmp_path):
+    """Pace 'linkedin_messages' at MESSAGES_PER_SECOND and record when each message reaches LinkedIn."""
+    budget = get_scheduler()._budgets['linkedin_messages']
+    monkeypatch.setattr(budget, 'shared', SharedRateLimiter(
+        str(tmp_path / 'budgets.sqlite'), 'linkedin_messages', {'messages': (MESSAGES_PER_SECOND, 1.0)},
+    ))
+    times, in_flight, overlaps = [], [0], []
+    lock = threading.Lock()
+    send_message = fakes.Linkedin.send_message
+
+    def timed_send(self, *args, **kwargs):
+        with lock:
+            in_flight[0] += 1
+            overlaps.append(in_flight[0] > 1)
+            times.append(time.monotonic())
+        try:
+            return send_message(self, *args, **kwargs)
+        finally:
+            with lock:
+                in_flight[0] -= 1
+
+    monkeypatch.setattr(fakes.Linkedin, 'send_message', timed_send)
+    return times, overlaps
+
+
+def test_batch_sends_one_paced_action_per_item(sends):
+    times, overlaps = sends
+    count = MESSAGES_PER_SECOND * 2
+    rows = [make_contact(row_number, ROWS[row_number]) for row_number in range(2, 2 + count)]
+    before = fakes.backends.calls.get('linkedin.send_message', 0)
+
+    jobs = send_linkedin_messages('batch-test', [(row, f'urn-{row.row_number}', 'Hello') for row in rows])
+    assert [job['label'] for job in jobs] == [f"LinkedIn message to {row.first_name}" for row in rows]
+    queue = get_action_queue()
+    assert isinstance(queue, SharedActionQueue)  # the tests run in 'workers' mode: one job per item
+    queue.wait('batch-test', timeout=30)
+    finished = queue.notifications('batch-test')
+
+    # One job per item, each with the calls of its own send
+    assert len(finished) == count
+    assert all(job['level'] == 'success' for job in finished)
+    assert all(job['calls'] == {'linkedin.api.send_message': 1} for job in finished)
+    assert fakes.backends.calls['linkedin.send_message'] - before == count
+
+    # One at a time, and after the bucket's burst, no faster than the budget allows
+    assert not any(overlaps)
+    times.sort()
+    paced = times[MESSAGES_PER_SECOND - 1:]
+    assert paced[-1] - paced[0] >= (len(paced) - 1) / MESSAGES_PER_SECOND * 0.9
+
+    # Sent again, the same rows are refused instead of messaged twice
+    send_linkedin_messages('batch-test', [(row, f'urn-{row.row_number}', 'Hello') for row in rows[:2]])
+    queue.wait('batch-test', timeout=30)
+    assert fakes.backends.calls['linkedin.send_message'] - before == count
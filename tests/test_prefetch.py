@@ -0,0 +1,90 @@
+# tests/test_prefetch.py
+
+import pytest
+
+from conftest import ROWS
+from utils import prefetch
+from utils.sheet_data import make_contact
+
+ROW = [make_contact(2, ROWS[0])]
+RESULT = {'profile': None, 'email_content': 'Hello'}
+
+
+class ScriptedQueue:
+    """Job queue whose wait() returns the given jobs in turn, with a worker always running."""
+
+    def __init__(self, *jobs):
+        self.jobs = list(jobs)
+        self.enqueued = 0
+
+    def enqueue(self, kind, key, payload, lane=None, **kwargs):
+        self.enqueued += 1
+
+    def workers(self):
+        return ['worker']
+
+    def wait(self, key, timeout=None, on_progress=None):
+        return self.jobs.pop(0) if self.jobs else {'status': 'running', 'error': None}
+
+
+class ScriptedStore:
+    """Contact store whose result() returns the given results in turn, then the last one."""
+
+    def __init__(self, *results):
+        self.results = list(results)
+
+    def result(self, contact):
+        return self.results.pop(0) if len(self.results) > 1 else self.results[0]
+
+
+@pytest.fixture
+def shared(monkeypatch):
+    def make(queue, store):
+        monkeypatch.setattr(prefetch, 'get_job_queue', lambda: queue)
+        monkeypatch.setattr(prefetch, 'get_contact_store', lambda: store)
+        return prefetch.SharedPrefetcher()
+    return make
+
+
+def test_get_returns_the_stored_result_once_the_job_is_done(shared):
+    queue = ScriptedQueue({'status': 'done', 'error': None})
+    prefetcher = shared(queue, ScriptedStore(None, RESULT))
+    assert prefetcher.get(ROW, 0) == RESULT
+    assert queue.enqueued == 1
+
+
+def test_get_queues_the_job_again_when_it_left_the_queue(shared):
+    queue = ScriptedQueue(None, {'status': 'done', 'error': None})
+    prefetcher = shared(queue, ScriptedStore(None, RESULT))
+    assert prefetcher.get(ROW, 0) == RESULT
+    assert queue.enqueued == 2
+
+
+def test_get_raises_when_the_job_failed(shared):
+    prefetcher = shared(ScriptedQueue({'status': 'failed', 'error': 'LinkedIn is down'}), ScriptedStore(None))
+    with pytest.raises(RuntimeError, match='LinkedIn is down'):
+        prefetcher.get(ROW, 0)
+    assert prefetcher._stats['errors'] == 1
+
+
+def test_get_raises_when_the_job_was_cancelled(shared):
+    prefetcher = shared(ScriptedQueue({'status': 'cancelled', 'error': None}), ScriptedStore(None))
+    with pytest.raises(RuntimeError, match='cancelled'):
+        prefetcher.get(ROW, 0)
+    assert prefetcher._stats['errors'] == 1
+
+
+def test_get_raises_when_the_job_finished_without_a_result(shared):
+    prefetcher = shared(ScriptedQueue({'status': 'done', 'error': None}), ScriptedStore(None))
+    with pytest.raises(RuntimeError, match='without a result'):
+        prefetcher.get(ROW, 0)
+    assert prefetcher._stats['errors'] == 1
+
+
+@pytest.mark.parametrize('job', [None, {'status': 'running', 'error': None}])
+def test_get_gives_up_after_max_waits(shared, job):
+    queue = ScriptedQueue(*[job] * (prefetch.PREFETCH_MAX_WAITS + 1))
+    prefetcher = shared(queue, ScriptedStore(None))
+    with pytest.raises(RuntimeError, match='not prepared'):
+        prefetcher.get(ROW, 0)
+    assert queue.enqueued == prefetch.PREFETCH_MAX_WAITS
@@ -0,0 +1,209 @@
+# utils/action_queue.py
+
+import contextvars
+import itertools
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+import config
+from utils.job_queue import get_job_queue, run_inline, DEPLOYMENT_MODE, JOB_POLL_INTERVAL, ACTIVE_STATUSES
+from utils.scheduler import INTERACTIVE
+from utils.send_actions import ACTIONS
+from utils.sheet_data import make_contact
+from utils.tracing import capture, call_counts
+
+# Send actions run on this many threads, shared by every session.
+ACTION_WORKERS = getattr(config, 'ACTION_WORKERS', 4)
+# Finished actions nobody has been notified about are forgotten after this long.
+ACTION_RETENTION_SECONDS = getattr(config, 'ACTION_RETENTION_SECONDS', 3600)
+# How often the UI checks for finished actions, where Streamlit supports self-refreshing fragments.
+ACTION_POLL_INTERVAL = getattr(config, 'ACTION_POLL_INTERVAL', 1.0)
+
+
+class ActionQueue:
+    """Run the operator's send actions in the background and track their status.
+
+    An action is one of utils.send_actions.ACTIONS, called with the sheet row and its
+    arguments; it returns (level, message), where level is 'success', 'info' or 'error', and
+    an exception counts as an error. Each action belongs to an owner (the operator) and has
+    a key, so pressing a button twice while the first action is still running does not
+    start a second one. The owner collects finished actions with notifications() on a later
+    rerun.
+    """
+
+    def __init__(self, max_workers=ACTION_WORKERS):
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='action')
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+        self._jobs = {}  # id -> job dict
+        self._futures = {}  # id -> Future, while running
+        self._stats = {'submitted': 0, 'deduplicated': 0, 'succeeded': 0, 'failed': 0}
+
+    def submit(self, owner, key, label, action, row, args):
+        """Start ACTIONS[action](row, **args) in the background and return the job.
+
+        A running job with the same key is returned instead.
+        """
+        with self._lock:
+            self._prune()
+            for job in self._jobs.values():
+                if job['owner'] == owner and job['key'] == key and job['status'] == 'running':
+                    self._stats['deduplicated'] += 1
+                    return dict(job)
+            job = {
+                'id': next(self._ids), 'owner': owner, 'key': key, 'label': label, 'status': 'running',
+                'level': None, 'message': None, 'calls': {}, 'started_at': time.time(), 'finished_at': None,
+            }
+            self._jobs[job['id']] = job
+            self._stats['submitted'] += 1
+            # Keep the session's tracing recorder and the interactive scheduler lane
+            self._futures[job['id']] = self._executor.submit(
+                contextvars.copy_context().run, self._run, job['id'], action, row, args,
+            )
+            return dict(job)
+
+    def pending(self, owner):
+        """Return the owner's running jobs, oldest first."""
+        with self._lock:
+            return [dict(job) for job in self._jobs.values() if job['owner'] == owner and job['status'] == 'running']
+
+    def notifications(self, owner):
+        """Return the owner's finished jobs not returned before, and forget them."""
+        with self._lock:
+            finished = [job for job in self._jobs.values() if job['owner'] == owner and job['status'] != 'running']
+            for job in finished:
+                del self._jobs[job['id']]
+            return finished
+
+    def wait(self, owner=None, timeout=None):
+        """Block until the owner's (or everyone's) running jobs have finished."""
+        with self._lock:
+            futures = [
+                future for job_id, future in self._futures.items()
+                if owner is None or self._jobs[job_id]['owner'] == owner
+            ]
+        wait(futures, timeout=timeout)
+
+    def stats(self):
+        with self._lock:
+            running = sum(1 for job in self._jobs.values() if job['status'] == 'running')
+            return dict(self._stats, running=running)
+
+    def _run(self, job_id, action, row, args):
+        level, message, calls = run_action(action, row, args)
+        with self._lock:
+            job = self._jobs[job_id]
+            job.update(
+                status='failed' if level == 'error' else 'done', level=level, message=message,
+                calls=calls, finished_at=time.time(),
+            )
+            self._stats['failed' if level == 'error' else 'succeeded'] += 1
+            del self._futures[job_id]
+
+    def _prune(self):
+        # Called with self._lock held; drops results for sessions that went away.
+        cutoff = time.time() - ACTION_RETENTION_SECONDS
+        for job_id in [job_id for job_id, job in self._jobs.items() if (job['finished_at'] or time.time()) < cutoff]:
+            del self._jobs[job_id]
+
+
+class SharedActionQueue:
+    """ActionQueue for the multi-process deployment: actions go to the shared job queue.
+
+    Worker processes run them, so an action outlives the app process that started it and
+    its outcome reaches the operator through whichever process serves the next rerun.
+    While no worker is running, an action runs on a thread of the submitting process.
+    """
+
+    def submit(self, owner, key, label, action, row, args):
+        """Queue ACTIONS[action](row, **args) and return the job; an unfinished job with the same key is returned."""
+        queue = get_job_queue()
+        job_key = 'action:' + ':'.join(str(part) for part in (owner,) + tuple(key))
+        payload = {'action': action, 'row': [row.row_number, row.cells], 'args': args}
+        job = queue.enqueue('action', job_key, payload, lane=INTERACTIVE, owner=owner, label=label)
+        if not queue.workers():
+            threading.Thread(
+                target=contextvars.copy_context().run, args=(run_inline, queue, job_key, action_job),
+                name='action-inline', daemon=True,
+            ).start()
+        return _action(job)
+
+    def pending(self, owner):
+        """Return the owner's queued and running jobs, oldest first."""
+        return [_action(job) for job in get_job_queue().active(owner, kind='action')]
+
+    def notifications(self, owner):
+        """Return the owner's finished jobs not returned before."""
+        return [_action(job) for job in get_job_queue().collect(owner, kind='action')]
+
+    def wait(self, owner=None, timeout=None):
+        """Block until the owner's (or everyone's) queued and running jobs have finished."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while get_job_queue().active(owner, kind='action'):
+            if deadline is not None and time.monotonic() >= deadline:
+                return
+            time.sleep(JOB_POLL_INTERVAL)
+
+    def stats(self):
+        counts = get_job_queue().stats()['kinds'].get('action', {})
+        return {
+            'running': counts.get('queued', 0) + counts.get('running', 0),
+            'succeeded': counts.get('done', 0),
+            'failed': counts.get('failed', 0),
+        }
+
+
+def send_linkedin_messages(owner, items):
+    """Queue one 'linkedin' action per (row, urn_id, message) item; returns the jobs in item order.
+
+    Each is the same action as the LinkedIn button's: it goes through the scheduler's
+    'linkedin_messages' budget, which paces the batch, and each row is sent at most once.
+    Each finished job reports the external calls of its own send (see notifications()).
+    """
+    queue = get_action_queue()
+    return [
+        queue.submit(owner, ('linkedin', row.row_number), f"LinkedIn message to {row.first_name}", 'linkedin', row,
+                     {'urn_id': urn_id, 'message': message})
+        for row, urn_id, message in items
+    ]
+
+
+def run_action(action, row, args):
+    """Run ACTIONS[action](row, **args) and return (level, message, {stage: external calls})."""
+    with capture() as calls:
+        try:
+            level, message = ACTIONS[action](row, **args)
+        except Exception as error:
+            level, message = 'error', str(error)
+    return level, message, call_counts(calls)
+
+
+def action_job(payload, progress):
+    """Job handler for 'action' jobs, run by the worker processes."""
+    level, message, calls = run_action(payload['action'], make_contact(*payload['row']), payload['args'])
+    return {'level': level, 'message': message, 'calls': calls}
+
+
+def _action(job):
+    # A shared job in the shape ActionQueue returns; a job that crashed its worker is an error
+    result = job['result'] or {}
+    level = result.get('level') or ('error' if job['status'] == 'failed' else None)
+    return {
+        'id': job['id'], 'owner': job['owner'], 'key': job['key'], 'label': job['label'],
+        'status': 'running' if job['status'] in ACTIVE_STATUSES else ('failed' if level == 'error' else 'done'),
+        'level': level, 'message': result.get('message') or job['error'], 'calls': result.get('calls') or {},
+        'started_at': job['created_at'], 'finished_at': job['finished_at'],
+    }
+
+
+_action_queue = None
+_action_queue_lock = threading.Lock()
+
+
+def get_action_queue():
+    """Return the process-wide action queue (the shared one when DEPLOYMENT_MODE is 'workers')."""
+    global _action_queue
+    with _action_queue_lock:
+        if _action_queue is None:
+            _action_queue = SharedActionQueue() if DEPLOYMENT_MODE == 'workers' else ActionQueue()
+        return _action_queue
@@ -0,0 +1,282 @@
+# utils/batch_runner.py
+
+import asyncio
+import contextvars
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+import config
+from config import SHEET_ID
+from services.gmail_mailer import get_mailer, message_key
+from services.sheet_writer import get_sheet_writer
+from utils.contact_pipeline import lookup_contact, draft_contacts_async
+from utils.contact_store import get_contact_store
+from utils.prospect_index import get_prospect_index
+from utils.scheduler import priority, BATCH
+from utils.stats import summarize
+
+# Default concurrency per external service for batch runs.
+BATCH_LINKEDIN_WORKERS = getattr(config, 'BATCH_LINKEDIN_WORKERS', 2)
+BATCH_GEMINI_WORKERS = getattr(config, 'BATCH_GEMINI_WORKERS', 4)
+BATCH_GMAIL_WORKERS = getattr(config, 'BATCH_GMAIL_WORKERS', 2)
+
+# Rows with one of these statuses in the checkpoint are not processed again on resume.
+DONE_STATUSES = ('drafted', 'sent', 'skipped')
+
+
+class Checkpoint:
+    """Append-only JSON-lines log of finished rows, so an interrupted run can resume."""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._records = {}
+        if os.path.exists(path):
+            with open(path) as f:
+                for line in f:
+                    line = line.strip()
+                    if not line:
+                        continue
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        # A crash can leave a torn last line; that row is simply redone
+                        continue
+                    self._records[record['row_number']] = record
+
+    def is_done(self, row_number):
+        record = self._records.get(row_number)
+        return record is not None and record['status'] in DONE_STATUSES
+
+    def record(self, row_number, status, **fields):
+        """Durably append the outcome for a row."""
+        record = dict(fields, row_number=row_number, status=status, at=time.time())
+        with self._lock:
+            self._records[row_number] = record
+            with open(self.path, 'a') as f:
+                f.write(json.dumps(record) + '\n')
+                f.flush()
+                os.fsync(f.fileno())
+
+
+class BatchRunner:
+    """Run lookup, AI drafting and Gmail for many sheet rows with per-service concurrency.
+
+    Rows are looked up on the LinkedIn threads without pause. Whenever lookups finish, the
+    rows looked up so far get their emails together from generate_emails_async while the
+    lookups go on, so LinkedIn and Gemini work on different rows at the same time; the
+    gemini stage is timed per such batch. The Gmail stage only queues the message with the
+    mailer (keyed by sheet row, so a rerun never sends twice); the queue goes out in
+    batched requests at the end of the run.
+    mode is 'draft' (save Gmail drafts) or 'send' (send and mark the row in the sheet).
+    """
+
+    def __init__(self, mode='draft', linkedin_workers=BATCH_LINKEDIN_WORKERS,
+                 gemini_workers=BATCH_GEMINI_WORKERS, gmail_workers=BATCH_GMAIL_WORKERS,
+                 checkpoint=None, sheet_id=SHEET_ID):
+        if mode not in ('draft', 'send'):
+            raise ValueError(f"Unknown batch mode: {mode}")
+        self.mode = mode
+        self.checkpoint = checkpoint
+        self.sheet_id = sheet_id
+        self.linkedin_workers = linkedin_workers
+        self.gemini_workers = gemini_workers
+        self.gmail_workers = gmail_workers
+        self._lock = threading.Lock()
+        self._timings = {stage: [] for stage in ('linkedin', 'gemini', 'gmail')}
+        self._counts = {}
+        self._queued = {}  # row_number -> Gmail job key
+        self._duplicates = {}  # row_number -> earlier row with the same person
+
+    def run(self, rows, start=0, end=None):
+        """Process rows[start:end] and return the throughput summary."""
+        end = len(rows) if end is None else min(end, len(rows))
+        # Rows repeating an earlier person are merged before any LinkedIn, Gemini or Gmail call
+        self._duplicates = get_prospect_index().index_sheet(rows[start:end])
+        pending = [
+            contact for contact in rows[start:end]
+            if not (self.checkpoint and self.checkpoint.is_done(contact.row_number))
+        ]
+        self._count('resumed', (end - start) - len(pending))
+
+        started = time.perf_counter()
+        with priority(BATCH):
+            asyncio.run(self._run_rows(pending))
+        self._deliver_queued()
+        if self.mode == 'send':
+            get_sheet_writer(self.sheet_id).flush()
+        elapsed = time.perf_counter() - started
+        return self.summary(elapsed)
+
+    def summary(self, elapsed):
+        with self._lock:
+            counts = dict(self._counts)
+            stages = {stage: summarize(values) for stage, values in self._timings.items()}
+        processed = sum(counts.get(status, 0) for status in ('drafted', 'sent', 'skipped', 'failed', 'queued'))
+        return {
+            'elapsed_seconds': elapsed,
+            'processed': processed,
+            'contacts_per_minute': processed / elapsed * 60 if elapsed else 0.0,
+            'counts': counts,
+            'stages': stages,
+            'prospect_index': get_prospect_index().stats(),
+        }
+
+    async def _run_rows(self, pending):
+        loop = asyncio.get_running_loop()
+        # generate_emails_async runs the Gemini calls on the loop's default executor
+        loop.set_default_executor(ThreadPoolExecutor(max_workers=self.gemini_workers, thread_name_prefix='batch-gemini'))
+        with ThreadPoolExecutor(max_workers=self.linkedin_workers, thread_name_prefix='batch-linkedin') as linkedin, \
+                ThreadPoolExecutor(max_workers=self.gmail_workers, thread_name_prefix='batch-gmail') as gmail:
+            # Each lookup runs in a copy of this context, so it keeps the batch lane and tracing
+            lookups = {
+                loop.run_in_executor(linkedin, contextvars.copy_context().run, self._lookup, contact)
+                for contact in pending
+            }
+            while lookups:
+                looked_up, lookups = await asyncio.wait(lookups, return_when=asyncio.FIRST_COMPLETED)
+                await self._draft_and_queue([future.result() for future in looked_up], gmail)
+
+    def _lookup(self, contact):
+        # LinkedIn stage for one row; returns (contact, result), or None once the row is finished.
+        row_number = contact.row_number
+        try:
+            if row_number in self._duplicates:
+                self._finish(row_number, 'skipped', reason=f'duplicate of row {self._duplicates[row_number]}')
+                return None
+            if not contact.first_name or not contact.recipient_email:
+                self._finish(row_number, 'skipped', reason='missing name or email')
+                return None
+            with self._stage('linkedin'):
+                result = lookup_contact(contact)
+        except Exception as error:
+            self._fail(row_number, error)
+            return None
+        if not result['needs_email']:
+            self._finish(row_number, 'skipped', reason=result['notes'][-1] if result['notes'] else 'no email generated')
+            return None
+        return contact, result
+
+    async def _draft_and_queue(self, looked_up, gmail):
+        # Gemini stage for the rows looked up so far, then the Gmail stage for each one drafted.
+        rows = sorted((item for item in looked_up if item is not None), key=lambda item: item[0].row_number)
+        if not rows:
+            return
+        loop = asyncio.get_running_loop()
+        started = time.perf_counter()
+        errors = await draft_contacts_async([result for _, result in rows], max_concurrency=self.gemini_workers)
+        with self._lock:
+            self._timings['gemini'].append(time.perf_counter() - started)
+        queueing = []
+        for (contact, result), error in zip(rows, errors):
+            if error is not None:
+                self._fail(contact.row_number, error)
+            else:
+                queueing.append(loop.run_in_executor(gmail, contextvars.copy_context().run, self._queue, contact, result))
+        await asyncio.gather(*queueing)
+
+    def _queue(self, contact, result):
+        try:
+            # The UI shows this draft instead of redoing the lookup when the row is opened
+            get_contact_store(self.sheet_id).save_result(contact, result)
+
+            subject, body, recipient = result['subject'], result['email_content'], contact.recipient_email
+            kind = 'draft' if self.mode == 'draft' else 'send'
+            key = message_key(kind, self.sheet_id, contact.row_number, recipient)
+            with self._stage('gmail'):
+                # In send mode the mailer marks the row in the sheet once Gmail accepts the message
+                get_mailer().submit(
+                    kind, subject, body, recipient, key=key,
+                    sheet_id=self.sheet_id if kind == 'send' else None, row_number=contact.row_number,
+                )
+        except Exception as error:
+            self._fail(contact.row_number, error)
+            return
+        with self._lock:
+            self._queued[contact.row_number] = key
+
+    def _fail(self, row_number, error):
+        print(f"Row {row_number} failed: {error}")
+        self._finish(row_number, 'failed', error=str(error))
+
+    def _deliver_queued(self):
+        """Send the queued Gmail jobs in batches and record each row's final outcome."""
+        if not self._queued:
+            return
+        mailer = get_mailer()
+        started = time.perf_counter()
+        try:
+            mailer.flush()
+        except Exception as error:
+            print(f"Gmail batch failed; queued messages are kept and retried: {error}")
+        with self._lock:
+            self._timings['gmail'].append(time.perf_counter() - started)
+            queued, self._queued = self._queued, {}
+        for row_number, key in sorted(queued.items()):
+            job = mailer.job(key)
+            if job['status'] == 'sent':
+                if self.mode == 'draft':
+                    get_contact_store(self.sheet_id).mark_row(row_number, 'drafted')
+                self._finish(row_number, 'drafted' if self.mode == 'draft' else 'sent', gmail_id=job['gmail_id'])
+            elif job['status'] == 'failed':
+                self._finish(row_number, 'failed', error=job['error'] or f'Gmail {self.mode} failed')
+            else:
+                # Held back by the Gmail quota; the mailer sends it later and a rerun will not resend it
+                self._finish(row_number, 'queued', gmail_key=key)
+
+    def _finish(self, row_number, status, **fields):
+        self._count(status)
+        if self.checkpoint:
+            self.checkpoint.record(row_number, status, **fields)
+
+    def _stage(self, stage):
+        return _StageTimer(self, stage)
+
+    def _count(self, status, amount=1):
+        with self._lock:
+            self._counts[status] = self._counts.get(status, 0) + amount
+
+
+class _StageTimer:
+    """Record how long a row's stage took."""
+
+    def __init__(self, runner, stage):
+        self.runner = runner
+        self.stage = stage
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+
+    def __exit__(self, *exc):
+        elapsed = time.perf_counter() - self.started
+        with self.runner._lock:
+            self.runner._timings[self.stage].append(elapsed)
+        return False
+
+
+def format_summary(summary):
+    """Render a run summary as the text printed at the end of a batch."""
+    lines = [
+        f"Processed {summary['processed']} contacts in {summary['elapsed_seconds']:.1f}s "
+        f"({summary['contacts_per_minute']:.1f} contacts/min)",
+        "Outcomes: " + ", ".join(f"{status}={count}" for status, count in sorted(summary['counts'].items())),
+    ]
+    for stage, stats in summary['stages'].items():
+        lines.append(
+            f"  {stage:<9} n={stats['count']:<6} p50={stats['p50'] * 1000:.0f}ms "
+            f"p95={stats['p95'] * 1000:.0f}ms max={stats['max'] * 1000:.0f}ms"
+        )
+    lines.append(format_index_stats(summary['prospect_index']))
+    return "\n".join(lines)
+
+
+def format_index_stats(stats):
+    """One line on what the prospect index saved: merged rows and LinkedIn searches answered locally."""
+    return (
+        f"Prospect index: {stats['duplicate_rows']} duplicate rows merged, {stats['saved']} LinkedIn searches saved "
+        f"({stats['normalized']} respelled, {stats['aliases']} company aliases, {stats['fuzzy']} fuzzy, "
+        f"{stats['shared']} shared in flight), {stats['fetched']} searched, "
+        f"{stats['profile_hits']} profile checks answered locally"
+    )
@@ -1,26 +1,40 @@
-from services.linkedin_services import authenticate_linkedin, search_person, find_profiles_in_mining, send_linkedin_message
+import time
 from services.ai_services import generate_email
-from services.google_services import create_draft, send_email, update_sheet_with_contact_info
+from services.gmail_mailer import get_mailer, message_key
+from utils.action_queue import get_action_queue, ACTION_POLL_INTERVAL
+from utils.contact_store import get_contact_store
+from utils.prefetch import get_prefetcher
+from utils.tracing import traced
 from config import SHEET_ID
 
+# Streamlit widget keys holding the operator's edits to the current draft.
+EDITOR_KEYS = ('subject_editor', 'email_editor', 'fallback_email_editor')
+
+
+@traced('ui.process_contact')
 def process_contact(index, rows, st):
-    """Process the contact information from the Google Sheets."""
+    """Process the contact information from the Google Sheets.
+
+    Returns False when there is no contact to act on here (past the last row, no name in
+    the sheet, or another operator holds the row), so the caller does not offer the send actions.
+    """
     if index >= len(rows):
         st.write("No more contacts to process.")
-        return
+        return False
 
-    first_row = rows[index]
-    first_name = first_row[0] if len(first_row) > 0 else None
-    recipient_email = first_row[4] if len(first_row) > 4 else None
-    company_name = first_row[2] if len(first_row) > 2 else None
+    row = rows[index]
+    first_name, company_name, recipient_email = row.first_name, row.company_name, row.recipient_email
 
     # Ensure we have a valid name
     if not first_name:
         st.write("Name is missing from the Google Sheet.")
-        return
+        return False
 
-    # Store recipient email in session state
-    st.session_state.recipient_email = recipient_email
+    # Claim the row so other operators skip it while it is open here
+    store = get_contact_store()
+    if not store.claim(row.row_number, st.session_state.operator_id):
+        st.warning("Another operator is working on this contact right now.")
+        return False
 
     st.write(f"**Name:** {first_name}")
     if company_name:
@@ -29,200 +43,239 @@ def process_contact(index, rows, st):
         st.write("Company name is missing from the Google Sheet.")
     if recipient_email:
         st.write(f"**Recipient Email:** {recipient_email}")
+        for other in store.find_by_email(recipient_email):
+            if other['row_number'] != row.row_number and other['status'] == 'sent':
+                st.write(f"Already contacted via {other['contacted_via']} from sheet row {other['row_number']}.")
     else:
         st.write("Recipient email is missing from the Google Sheet.")
 
-    # Authenticate with LinkedIn
-    linkedin_api = authenticate_linkedin()
-
-    # Perform LinkedIn search with name and company
-    search_results = search_person(linkedin_api, first_name, company_name)
-
-    profile = None  # Initialize profile
-
-    if not search_results:
-        st.write("Person not found in LinkedIn search results with the specified company.")
-
-        # Perform a broader search by name only
-        search_results = search_person(linkedin_api, first_name)
-
-        if not search_results:
-            st.write("Person not found in LinkedIn search results by name. Generating fallback email.")
+    # Queue the upcoming contacts, then take this one from the prefetcher (instant when ready
+    # or when the row was prepared before, since results are kept in the contact store)
+    prefetcher = get_prefetcher()
+    prefetcher.schedule(rows, index, session=st.session_state.operator_id)
+    # An email still being generated is shown as it streams in, then replaced by the editors
+    placeholder = st.empty()
+    contact = prefetcher.get(rows, index, on_text=placeholder.text)
+    placeholder.empty()
+    state = store.get(row) or {}
 
-            # Generate fallback email without LinkedIn post
-            subject, email_content = generate_email(first_name, company_name, None)
+    if state.get('status') == 'sent':
+        st.info(f"Contacted via {state['contacted_via']} on {time.strftime('%Y-%m-%d %H:%M', time.localtime(state['contacted_at']))}.")
 
-            # Store generated email content in session state
-            st.session_state.email_content = email_content
-            st.session_state.subject = subject
+    for note in contact['notes']:
+        st.write(note)
 
-            # Display fallback email content (no "Send Email" button here)
-            st.text_area("Generated Email:", value=email_content, height=300, key='fallback_email_editor')
+    # The operator's saved edits take precedence over the generated draft
+    subject = state.get('subject') or contact['subject']
+    body = state.get('body') or contact['email_content']
 
-            return  # Return after displaying the fallback email
-        else:
-            # Filter results by mining companies
-            mining_profiles = find_profiles_in_mining(linkedin_api, search_results)
-
-            if not mining_profiles:
-                st.write("No profiles found with past companies in the mining industry. Generating fallback email.")
+    if contact['fallback']:
+        # Display fallback email content (no "Send Email" button here)
+        st.text_area("Generated Email:", value=body, height=300, key='fallback_email_editor',
+                     on_change=lambda: save_edits(st, rows))
+        return True
 
-                # Generate fallback email without LinkedIn post
-                subject, email_content = generate_email(first_name, company_name, None)
+    if contact['post_text'] is not None:
+        st.write(f"**Most Recent Post Text:**\n{contact['post_text']}")
 
-                # Store generated email content in session state
-                st.session_state.email_content = email_content
-                st.session_state.subject = subject
+    if contact['email_content'] is not None:
+        # Display the subject and email content, allowing users to edit
+        st.text_input("Edit Subject Line:", value=subject, key='subject_editor', on_change=lambda: save_edits(st, rows))
+        st.text_area("Edit the email below:", value=body, height=300, key='email_editor',
+                     on_change=lambda: save_edits(st, rows))
+    return True
 
-                st.text_area("Generated Email:", value=email_content, height=300, key='fallback_email_editor')
 
-                return  # Return after displaying the fallback email
-            else:
-                profile = mining_profiles[0]
-    else:
-        # If initial search with name and company found the person
-        profile = search_results[0]
+def save_edits(st, rows):
+    """Keep the operator's edits to the current draft in the contact store."""
+    get_contact_store().save_draft(rows[st.session_state.current_index], *current_draft(st, rows))
 
-    st.session_state.profile = profile  # Store profile in session state
 
-    urn_id = profile.get('urn_id')
-    if urn_id:
-        posts = linkedin_api.get_profile_posts(urn_id=urn_id, post_count=1)
-
-        if posts:
-            most_recent_post = posts[0]
-            post_text = most_recent_post.get('commentary', {}).get('text', {}).get('text', 'No post content available.')
-            st.session_state.post_text = post_text
-            st.write(f"**Most Recent Post Text:**\n{post_text}")
+def current_contact(st, rows):
+    """Return the prepared result (profile, post, draft) for the current row, or None."""
+    index = st.session_state.current_index
+    if index >= len(rows):
+        return None
+    return get_contact_store().result(rows[index])
 
-            # Generate a personalized email using Gemini AI
-            subject, email_content = generate_email(first_name, company_name, post_text)
-            st.session_state.email_content = email_content  # Store generated email content
-            st.session_state.subject = subject  # Store subject in session state
 
-            # Display the subject and email content, allowing users to edit
-            st.text_input("Edit Subject Line:", value=st.session_state.subject, key='subject_editor', on_change=lambda: update_subject(st))
-            st.text_area("Edit the email below:", value=email_content, height=300, key='email_editor')
+@traced('ui.regenerate_email')
+def regenerate_email(st, rows):
+    """Regenerate the email using AI and updated information."""
+    index = st.session_state.current_index
+    row = rows[index]
+    contact = current_contact(st, rows) or {}
+    post_text = contact.get('post_text')
+
+    if row.first_name and post_text:
+        # Generate a personalized email using Gemini AI, showing it as it streams in
+        # "Try Again" bypasses the email cache and stores the new variant
+        placeholder = st.empty()
+        subject, email_content = generate_email(
+            row.first_name, row.company_name, post_text, refresh=True, on_text=placeholder.text,
+        )
+
+        # Store the new draft (dropping edits to the old one) and keep the prefetched copy in step
+        contact = dict(contact, subject=subject, email_content=email_content)
+        get_contact_store().save_result(row, contact)
+        get_prefetcher().store(rows, index, contact)
+
+        # The editors were already drawn this run; rerun so process_contact draws them with the new draft
+        clear_contact_state(st)
+        st.rerun()
+
+
+def current_draft(st, rows):
+    """Return (subject, body) as currently shown in the editors, including the operator's edits."""
+    state = get_contact_store().get(rows[st.session_state.current_index]) or {}
+    result = state.get('result') or {}
+    subject = st.session_state.get('subject_editor') or state.get('subject') or result.get('subject')
+    body = (
+        st.session_state.get('email_editor')
+        or st.session_state.get('fallback_email_editor')
+        or state.get('body')
+        or result.get('email_content')
+    )
+    return subject, body
+
+
+def clear_contact_state(st):
+    """Forget the editor widgets' values; the draft itself stays in the contact store."""
+    for key in EDITOR_KEYS:
+        st.session_state.pop(key, None)
+
+
+def save_cursor(st):
+    """Keep the cursor and operator in the URL, so a browser refresh resumes at the same row."""
+    st.query_params['jump'] = str(st.session_state.current_index)
+    st.query_params['operator'] = st.session_state.operator_id
+
+
+def move_to(st, rows, index):
+    """Move the cursor to index, releasing the current row's lease."""
+    current = st.session_state.current_index
+    if current < len(rows):
+        get_contact_store().release(rows[current].row_number, st.session_state.operator_id)
+    st.session_state.current_index = index
+    clear_contact_state(st)
+    save_cursor(st)
+
+
+def next_contact(st, rows):
+    """Move to the next contact that is neither contacted already nor open for another operator."""
+    store = get_contact_store()
+    index = st.session_state.current_index + 1
+    while index < len(rows) and store.is_taken(rows[index].row_number, st.session_state.operator_id):
+        index += 1
+    move_to(st, rows, index)
+
+
+def _submit_action(st, key, label, action, row, args):
+    """Run a send action (see utils.send_actions) in the background; the result shows up in render_action_status."""
+    queue = get_action_queue()
+    job = queue.submit(st.session_state.operator_id, key, label, action, row, args)
+    st.session_state.action_failures = [
+        failure for failure in st.session_state.get('action_failures', []) if failure['key'] != job['key']
+    ]
+    return job
+
+
+def _action_status(st):
+    queue = get_action_queue()
+    failures = st.session_state.get('action_failures', [])
+    for job in queue.notifications(st.session_state.operator_id):
+        if job['calls']:
+            st.session_state.last_send_calls = job['calls']
+        if job['level'] == 'error':
+            failures.append(job)
+            st.toast(f"{job['label']} failed: {job['message']}", icon="⚠️")
         else:
-            st.write("No posts found for this profile.")
+            st.toast(job['message'], icon="✅" if job['level'] == 'success' else "ℹ️")
+    # Failures stay on screen until the operator retries that action
+    st.session_state.action_failures = failures
+    for job in failures:
+        st.error(f"{job['label']} failed: {job['message']}")
+    running = queue.pending(st.session_state.operator_id)
+    if running:
+        st.caption("In progress: " + ", ".join(job['label'] for job in running))
+
+
+def render_action_status(st):
+    """Show notifications for finished send actions and list the ones still running.
+
+    Where Streamlit supports fragments this part reruns on its own every
+    ACTION_POLL_INTERVAL seconds, so notifications arrive without the operator clicking.
+    """
+    fragment = getattr(st, 'fragment', None)
+    if fragment is None:
+        _action_status(st)
     else:
-        st.write("No urn_id found for the profile.")
-
+        fragment(run_every=ACTION_POLL_INTERVAL)(_action_status)(st)
 
-def update_subject(st):
-    """Update the subject line in session state."""
-    st.session_state.subject = st.session_state.subject_editor
 
+@traced('ui.save_to_drafts')
+def save_to_drafts(st, rows):
+    """Save the generated email to Gmail drafts in the background."""
+    row = rows[st.session_state.current_index]
+    recipient_email = row.recipient_email
+    subject, body = current_draft(st, rows)  # Includes the operator's edits
 
-def regenerate_email(st, rows):
-    """Regenerate the email using AI and updated information."""
-    first_row = rows[st.session_state.current_index]
-    first_name = first_row[0] if len(first_row) > 0 else None
-    company_name = first_row[2] if len(first_row) > 2 else None
-    post_text = st.session_state.post_text
-
-    if first_name and post_text:
-        # Generate a personalized email using Gemini AI
-        subject, email_content = generate_email(first_name, company_name, post_text)
-        st.session_state.email_content = email_content
-        st.session_state.subject = subject
-        st.text_input("Edit Subject Line:", value=st.session_state.subject, key='subject_editor', on_change=lambda: update_subject(st))
-        st.text_area("Edit the email below:", value=st.session_state.email_content, height=300, key='email_editor')
+    if not (recipient_email and body):
+        st.error("Recipient email or email content is missing.")
+        return
 
+    _submit_action(st, ('draft', row.row_number), f"Draft to {recipient_email}", 'draft', row,
+                   {'subject': subject, 'body': body})
+    st.info("Saving draft in the background.")
 
-def next_contact(st):
-    """Move to the next contact in the list."""
-    st.session_state.current_index += 1
-    st.session_state.email_content = ''
-    st.session_state.post_text = ''
-    st.session_state.profile = None
-    st.session_state.subject = ''
 
+@traced('ui.send_email')
+def send_email_action(st, rows):
+    """Send the edited email via Gmail in the background; the sheet is updated once Gmail accepts it."""
+    row = rows[st.session_state.current_index]
+    recipient_email = row.recipient_email
+    subject, body = current_draft(st, rows)  # Includes the operator's edits
 
-def save_to_drafts(st, rows):
-    """Save the generated email to Gmail drafts."""
-    recipient_email = st.session_state.get('recipient_email')  # Get from session state
-    subject = st.session_state.get('subject')  # Get from session state
-    body = st.session_state.get('email_content')  # Get from session state
-
-    if recipient_email and body:
-        draft_response = create_draft(subject, body, recipient_email)
-        if draft_response:
-            st.success("Email saved to drafts successfully.")
-        else:
-            st.error("Failed to save email to drafts.")
-    else:
+    if not (recipient_email and body):
         st.error("Recipient email or email content is missing.")
+        return
 
+    # One send per sheet row and address: a double click or a retry after a crash is a no-op
+    mailer = get_mailer()
+    key = message_key('send', SHEET_ID, row.row_number, recipient_email)
+    if (mailer.job(key) or {}).get('status') == 'sent':
+        st.info(f"An email was already sent to {recipient_email} for this row.")
+        return
 
-def send_email_action(st, rows):
-    """Send the generated email via Gmail and update Google Sheets."""
-    recipient_email = st.session_state.get('recipient_email')  # Get from session state
-    subject = st.session_state.get('subject')  # Get from session state
-    body = st.session_state.get('email_content')  # Get from session state
-    row_number = st.session_state.current_index + 2  # Adjust for header row
-
-    if recipient_email and body:
-        # Implement the logic to send the email here
-        email_response = send_email(subject, body, recipient_email)
-        if email_response:
-            st.success("Email sent successfully.")
-            
-            # Update the sheet to indicate the contact method and message
-            update_sheet_with_contact_info(SHEET_ID, row_number, "Email", body)
-        else:
-            st.error("Failed to send email.")
-    else:
-        st.error("Recipient email or email content is missing.")
+    _submit_action(st, ('send', row.row_number), f"Email to {recipient_email}", 'send', row,
+                   {'subject': subject, 'body': body, 'key': key})
+    st.info("Sending email in the background; you can move on.")
 
 
+@traced('ui.send_linkedin_message')
 def send_linkedin_message_action(st, rows):
-    """Send the generated message via LinkedIn and update Google Sheets."""
-    first_row = rows[st.session_state.current_index]
-    first_name = first_row[0] if len(first_row) > 0 else None
-    company_name = first_row[2] if len(first_row) > 2 else None
-    row_number = st.session_state.current_index + 2  # Adjust for header row
-
-    linkedin_api = authenticate_linkedin()
-
-    # Perform LinkedIn search with name and company
-    search_results = search_person(linkedin_api, first_name, company_name)
-    
-    if search_results:
-        st.write(f"Found LinkedIn profile for {first_name} at {company_name}.")
-        profile = search_results[0]
-        urn_id = profile.get('urn_id')
-
-        # Generate an email with LinkedIn post if available
-        post_text = st.session_state.post_text if st.session_state.post_text else None
-        subject, email_content = generate_email(first_name, company_name, post_text)
-
-        st.text_area("Generated Email:", value=email_content, height=300, key='email_editor')
-
-        if st.button("Send Email"):
-            send_email_action(st, rows)
-        if urn_id and st.button("Send via LinkedIn"):
-            response = send_linkedin_message(linkedin_api, urn_id, email_content)
-            if response:
-                st.success("Message sent via LinkedIn successfully.")
-            else:
-                st.error("Failed to send message via LinkedIn.")
-    else:
-        # Log and confirm no person was found by company
-        st.write(f"Person not found in LinkedIn search results for {first_name} at {company_name}.")
-
-        # Generate fallback email without LinkedIn post
-        subject, email_content = generate_email(first_name, company_name, None)
-
-        # Store fallback email content in session state
-        st.session_state.email_content = email_content
-        st.session_state.subject = subject
+    """Send the edited message via LinkedIn, in the background, to the profile already resolved for this contact."""
+    row = rows[st.session_state.current_index]
+    profile = (current_contact(st, rows) or {}).get('profile')
+    urn_id = profile.get('urn_id') if profile else None
+    _, message = current_draft(st, rows)
+
+    if not urn_id or not message:
+        st.error("LinkedIn profile or message is missing.")
+        return
 
-        # Display fallback email
-        st.text_area("Generated Email:", value=email_content, height=300, key='email_editor')
+    # One message per sheet row: send_linkedin checks again, for jobs already queued or re-run after a crash
+    state = get_contact_store().get(row) or {}
+    if state.get('status') == 'sent' and state.get('contacted_via') == "LinkedIn":
+        st.info(f"A LinkedIn message was already sent to {row.first_name} for this row.")
+        return
+    if state.get('status') == 'sending':
+        st.warning(f"A message to {row.first_name} is being sent, or may already have been sent.")
+        return
 
-        if st.button("Send Email"):
-            send_email_action(st, rows)
+    _submit_action(st, ('linkedin', row.row_number), f"LinkedIn message to {row.first_name}", 'linkedin', row,
+                   {'urn_id': urn_id, 'message': message})
+    st.info("Sending LinkedIn message in the background; you can move on.")
 
 
 def jump_to_line(st, rows):
@@ -237,7 +290,7 @@ def jump_to_line(st, rows):
         if target_index < 0 or target_index >= len(rows):
             st.error("Invalid line number. Please enter a valid number.")
         else:
-            st.session_state.current_index = target_index
-            st.experimental_set_query_params(jump=str(target_index))  
+            move_to(st, rows, target_index)
+            get_prefetcher().schedule(rows, target_index, session=st.session_state.operator_id)
     except ValueError:
         st.error("Please enter a valid number.")
@@ -0,0 +1,159 @@
+# utils/contact_pipeline.py
+
+from services.linkedin_services import (
+    authenticate_linkedin, search_person, find_profiles_in_mining_concurrent, get_profile_posts
+)
+from services.ai_services import generate_email, generate_email_async, generate_emails_async, GEMINI_MAX_WORKERS
+from utils.contact_store import get_contact_store
+from utils.prospect_index import get_prospect_index
+
+
+class ContactCancelled(Exception):
+    """Raised when a contact is abandoned before its (expensive) AI step runs."""
+
+
+def prepare_contact(contact, cancel_event=None, on_text=None):
+    """Run the LinkedIn lookup and AI draft for one sheet Contact without touching the UI.
+
+    Returns a dict with the resolved profile, post text, generated subject/email and the
+    status notes that process_contact shows to the operator, in the order they occurred.
+    on_text is passed on to draft_contact.
+    """
+    result = lookup_contact(contact)
+    _check_cancelled(cancel_event)
+    return draft_contact(result, on_text)
+
+
+def load_contact(contact, cancel_event=None, on_text=None):
+    """prepare_contact backed by the contact store: a row prepared before is one indexed read."""
+    store = get_contact_store()
+    result = store.result(contact)
+    if result is None:
+        result = prepare_contact(contact, cancel_event, on_text)
+        store.save_result(contact, result)
+    return result
+
+
+def lookup_contact(contact):
+    """LinkedIn stage: resolve the contact's profile and most recent post.
+
+    The returned dict has 'needs_email' set when draft_contact should generate an email,
+    either from the post or, for the fallback, without one.
+    """
+    first_name, company_name = contact.first_name, contact.company_name
+    result = {
+        'row_number': contact.row_number,
+        'first_name': first_name,
+        'company_name': company_name,
+        'recipient_email': contact.recipient_email,
+        'profile': None,
+        'post_text': None,
+        'subject': None,
+        'email_content': None,
+        'fallback': False,
+        'needs_email': False,
+        'notes': [],
+    }
+    if not first_name:
+        return result
+
+    # Teach the prospect index this row's company spelling and email domain
+    get_prospect_index().add_contact(contact)
+
+    # Authenticate with LinkedIn
+    linkedin_api = authenticate_linkedin()
+
+    # Perform LinkedIn search with name and company
+    search_results = search_person(linkedin_api, first_name, company_name)
+
+    profile = None
+    if not search_results:
+        result['notes'].append("Person not found in LinkedIn search results with the specified company.")
+
+        # Perform a broader search by name only
+        search_results = search_person(linkedin_api, first_name)
+
+        if not search_results:
+            result['notes'].append("Person not found in LinkedIn search results by name. Generating fallback email.")
+        else:
+            # Filter results by mining companies; only the first match is used
+            mining_profiles = find_profiles_in_mining_concurrent(linkedin_api, search_results, limit=1)
+
+            if not mining_profiles:
+                result['notes'].append("No profiles found with past companies in the mining industry. Generating fallback email.")
+            else:
+                profile = mining_profiles[0]
+
+        if profile is None:
+            # Fallback email without LinkedIn post
+            result['fallback'] = True
+            result['needs_email'] = True
+            return result
+    else:
+        # If initial search with name and company found the person
+        profile = search_results[0]
+
+    result['profile'] = profile
+
+    urn_id = profile.get('urn_id')
+    if not urn_id:
+        result['notes'].append("No urn_id found for the profile.")
+        return result
+
+    posts = get_profile_posts(linkedin_api, urn_id, post_count=1)
+    if not posts:
+        result['notes'].append("No posts found for this profile.")
+        return result
+
+    most_recent_post = posts[0]
+    post_text = most_recent_post.get('commentary', {}).get('text', {}).get('text', 'No post content available.')
+    result['post_text'] = post_text
+    result['needs_email'] = True
+    return result
+
+
+def draft_contact(result, on_text=None):
+    """AI stage: generate the email for a looked-up contact, if it needs one.
+
+    on_text, if given, receives the email body as it streams in (see generate_email).
+    """
+    if result['needs_email']:
+        # Generate a personalized email using Gemini AI (no post text for the fallback)
+        result['subject'], result['email_content'] = generate_email(
+            result['first_name'], result['company_name'], result['post_text'], on_text=on_text,
+        )
+        result['needs_email'] = False
+    return result
+
+
+async def draft_contact_async(result, on_text=None):
+    """draft_contact for an event loop, so other rows' LinkedIn lookups go on while Gemini writes."""
+    if result['needs_email']:
+        result['subject'], result['email_content'] = await generate_email_async(
+            result['first_name'], result['company_name'], result['post_text'], on_text=on_text,
+        )
+        result['needs_email'] = False
+    return result
+
+
+async def draft_contacts_async(results, max_concurrency=GEMINI_MAX_WORKERS):
+    """AI stage for many looked-up contacts at once (see generate_emails_async).
+
+    Returns, in input order, None for each result drafted (or not needing an email) and
+    the exception for each one whose generation failed.
+    """
+    drafting = [result for result in results if result['needs_email']]
+    emails = await generate_emails_async(drafting, max_concurrency=max_concurrency, return_exceptions=True)
+    errors = {}
+    for result, email in zip(drafting, emails):
+        if isinstance(email, Exception):
+            errors[id(result)] = email
+        else:
+            result['subject'], result['email_content'] = email
+            result['needs_email'] = False
+    return [errors.get(id(result)) for result in results]
+
+
+def _check_cancelled(cancel_event):
+    if cancel_event is not None and cancel_event.is_set():
+        raise ContactCancelled()
@@ -0,0 +1,249 @@
+# utils/contact_store.py
+
+import json
+import os
+import sqlite3
+import threading
+import time
+import config
+from config import SHEET_ID
+
+CONTACT_STORE_PATH = getattr(config, 'CONTACT_STORE_PATH', 'cache/contacts.sqlite')
+# How long a row stays claimed by the operator viewing it; renewed on every render.
+CONTACT_LEASE_SECONDS = getattr(config, 'CONTACT_LEASE_SECONDS', 600)
+
+# Rows in one of these statuses have been contacted (or a send is under way) and are skipped by "Next".
+CONTACTED_STATUSES = ('sent', 'sending')
+
+
+def contact_fingerprint(contact):
+    """Identify the person in a sheet row, so state is dropped when the row is edited."""
+    return '\x1f'.join(str(value or '') for value in (contact.first_name, contact.company_name, contact.recipient_email))
+
+
+class ContactStore:
+    """Durable per-row contact state for one sheet, in SQLite (WAL) indexed by row and by email.
+
+    Holds the prepared lookup/draft result, the operator's edited draft and the send
+    status with timestamps, so revisiting a row (or reloading the page) is one indexed read
+    instead of a new LinkedIn lookup and AI generation. Rows are claimed with short leases
+    so several operators can work the same sheet without doing the same row twice.
+    """
+
+    def __init__(self, sheet_id, path=CONTACT_STORE_PATH, lease_seconds=CONTACT_LEASE_SECONDS):
+        self.sheet_id = sheet_id
+        self.path = path
+        self.lease_seconds = lease_seconds
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS contacts ('
+            'sheet_id TEXT NOT NULL, row_number INTEGER NOT NULL, email TEXT, fingerprint TEXT NOT NULL, '
+            'result TEXT, subject TEXT, body TEXT, status TEXT NOT NULL, contacted_via TEXT, '
+            'prepared_at REAL, contacted_at REAL, updated_at REAL NOT NULL, PRIMARY KEY (sheet_id, row_number))'
+        )
+        self._conn.execute('CREATE INDEX IF NOT EXISTS contacts_email ON contacts (sheet_id, email)')
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS leases ('
+            'sheet_id TEXT NOT NULL, row_number INTEGER NOT NULL, owner TEXT NOT NULL, expires_at REAL NOT NULL, '
+            'PRIMARY KEY (sheet_id, row_number))'
+        )
+        self._conn.commit()
+
+    def get(self, contact):
+        """Return the stored state for a Contact (result, subject, body, status, ...) or None."""
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT fingerprint, result, subject, body, status, contacted_via, prepared_at, contacted_at '
+                'FROM contacts WHERE sheet_id = ? AND row_number = ?',
+                (self.sheet_id, contact.row_number),
+            ).fetchone()
+        if row is None or row[0] != contact_fingerprint(contact):
+            return None
+        return {
+            'result': json.loads(row[1]) if row[1] else None,
+            'subject': row[2],
+            'body': row[3],
+            'status': row[4],
+            'contacted_via': row[5],
+            'prepared_at': row[6],
+            'contacted_at': row[7],
+        }
+
+    def result(self, contact):
+        """Return the stored lookup/draft result for a Contact, or None if it was never prepared."""
+        state = self.get(contact)
+        return state['result'] if state else None
+
+    def save_result(self, contact, result):
+        """Store the prepared result; the operator's edits are dropped if the draft changed."""
+        now = time.time()
+        with self._lock:
+            self._upsert(contact, now)
+            self._conn.execute(
+                "UPDATE contacts SET result = ?, prepared_at = ?, updated_at = ?, "
+                "status = CASE WHEN status = 'new' THEN 'prepared' ELSE status END, "
+                "subject = CASE WHEN json_extract(result, '$.email_content') IS ? THEN subject END, "
+                "body = CASE WHEN json_extract(result, '$.email_content') IS ? THEN body END "
+                "WHERE sheet_id = ? AND row_number = ?",
+                (json.dumps(result), now, now, result.get('email_content'), result.get('email_content'),
+                 self.sheet_id, contact.row_number),
+            )
+            self._conn.commit()
+
+    def save_draft(self, contact, subject, body):
+        """Keep the operator's edited subject and body for a row."""
+        now = time.time()
+        with self._lock:
+            self._upsert(contact, now)
+            self._conn.execute(
+                'UPDATE contacts SET subject = ?, body = ?, updated_at = ? WHERE sheet_id = ? AND row_number = ?',
+                (subject, body, now, self.sheet_id, contact.row_number),
+            )
+            self._conn.commit()
+
+    def mark(self, contact, status, contacted_via=None):
+        """Record a row's outcome, e.g. mark(contact, 'sent', 'Email') or mark(contact, 'drafted')."""
+        with self._lock:
+            self._upsert(contact, time.time())
+            self._set_status(contact.row_number, status, contacted_via)
+
+    def begin_send(self, contact, contacted_via):
+        """Mark a row 'sending' via contacted_via, before a send that cannot be looked up afterwards.
+
+        Returns the row's previous (status, contacted_via), or None when it was already sent
+        that way or another send is under way (or was cut short by a crash): the caller must
+        not send again.
+        """
+        now = time.time()
+        with self._lock, self._transaction():
+            self._upsert(contact, now)
+            status, via = self._conn.execute(
+                'SELECT status, contacted_via FROM contacts WHERE sheet_id = ? AND row_number = ?',
+                (self.sheet_id, contact.row_number),
+            ).fetchone()
+            if status == 'sending' or (status == 'sent' and via == contacted_via):
+                return None
+            self._conn.execute(
+                "UPDATE contacts SET status = 'sending', contacted_via = ?, updated_at = ? "
+                'WHERE sheet_id = ? AND row_number = ?',
+                (contacted_via, now, self.sheet_id, contact.row_number),
+            )
+        return status, via
+
+    def abort_send(self, contact, previous):
+        """Undo begin_send() for a send known not to have gone out, restoring the previous state."""
+        status, via = previous
+        with self._lock:
+            self._conn.execute(
+                "UPDATE contacts SET status = ?, contacted_via = ?, updated_at = ? "
+                "WHERE sheet_id = ? AND row_number = ? AND status = 'sending'",
+                (status, via, time.time(), self.sheet_id, contact.row_number),
+            )
+            self._conn.commit()
+
+    def mark_row(self, row_number, status, contacted_via=None):
+        """mark() for a row known only by number (e.g. from the Gmail queue); no-op if it was never seen."""
+        with self._lock:
+            self._set_status(row_number, status, contacted_via)
+
+    def find_by_email(self, email):
+        """Return [{row_number, status, contacted_via, contacted_at}] for every row with this address."""
+        with self._lock:
+            rows = self._conn.execute(
+                'SELECT row_number, status, contacted_via, contacted_at FROM contacts '
+                'WHERE sheet_id = ? AND email = ? ORDER BY row_number',
+                (self.sheet_id, (email or '').strip().lower()),
+            ).fetchall()
+        return [
+            {'row_number': row[0], 'status': row[1], 'contacted_via': row[2], 'contacted_at': row[3]}
+            for row in rows
+        ]
+
+    def claim(self, row_number, owner):
+        """Take or renew the lease on a row; returns False while another operator holds it."""
+        now = time.time()
+        with self._lock:
+            # One statement, so two processes claiming the same row cannot both win
+            cursor = self._conn.execute(
+                'INSERT INTO leases (sheet_id, row_number, owner, expires_at) VALUES (?, ?, ?, ?) '
+                'ON CONFLICT (sheet_id, row_number) DO UPDATE SET owner = excluded.owner, expires_at = excluded.expires_at '
+                'WHERE leases.owner = excluded.owner OR leases.expires_at <= ?',
+                (self.sheet_id, row_number, owner, now + self.lease_seconds, now),
+            )
+            self._conn.commit()
+        return cursor.rowcount == 1
+
+    def release(self, row_number, owner):
+        """Give up a lease held by owner."""
+        with self._lock:
+            self._conn.execute(
+                'DELETE FROM leases WHERE sheet_id = ? AND row_number = ? AND owner = ?',
+                (self.sheet_id, row_number, owner),
+            )
+            self._conn.commit()
+
+    def is_taken(self, row_number, owner):
+        """True if the row has been contacted or is leased by someone other than owner."""
+        with self._lock:
+            status = self._conn.execute(
+                'SELECT status FROM contacts WHERE sheet_id = ? AND row_number = ?', (self.sheet_id, row_number),
+            ).fetchone()
+            lease = self._conn.execute(
+                'SELECT owner FROM leases WHERE sheet_id = ? AND row_number = ? AND expires_at > ?',
+                (self.sheet_id, row_number, time.time()),
+            ).fetchone()
+        return (status is not None and status[0] in CONTACTED_STATUSES) or (lease is not None and lease[0] != owner)
+
+    def counts(self):
+        """Return {status: rows} for this sheet."""
+        with self._lock:
+            return dict(self._conn.execute(
+                'SELECT status, COUNT(*) FROM contacts WHERE sheet_id = ? GROUP BY status', (self.sheet_id,),
+            ).fetchall())
+
+    def _transaction(self):
+        # BEGIN IMMEDIATE takes the write lock up front, so a read-then-write is atomic across processes
+        self._conn.execute('BEGIN IMMEDIATE')
+        return self._conn
+
+    def _set_status(self, row_number, status, contacted_via):
+        # Called with self._lock held.
+        now = time.time()
+        self._conn.execute(
+            'UPDATE contacts SET status = ?, contacted_via = COALESCE(?, contacted_via), '
+            'contacted_at = CASE WHEN ? IS NOT NULL THEN ? ELSE contacted_at END, updated_at = ? '
+            'WHERE sheet_id = ? AND row_number = ?',
+            (status, contacted_via, contacted_via, now, now, self.sheet_id, row_number),
+        )
+        self._conn.commit()
+
+    def _upsert(self, contact, now):
+        # Called with self._lock held; (re)creates the row, resetting it if the sheet row changed.
+        fingerprint = contact_fingerprint(contact)
+        self._conn.execute(
+            'INSERT INTO contacts (sheet_id, row_number, email, fingerprint, status, updated_at) '
+            "VALUES (?, ?, ?, ?, 'new', ?) "
+            'ON CONFLICT (sheet_id, row_number) DO UPDATE SET email = excluded.email, '
+            "fingerprint = excluded.fingerprint, result = NULL, subject = NULL, body = NULL, status = 'new', "
+            'contacted_via = NULL, prepared_at = NULL, contacted_at = NULL, updated_at = excluded.updated_at '
+            'WHERE contacts.fingerprint != excluded.fingerprint',
+            (self.sheet_id, contact.row_number, (contact.recipient_email or '').strip().lower(), fingerprint, now),
+        )
+
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+def get_contact_store(sheet_id=SHEET_ID):
+    """Return the process-wide contact store for a sheet."""
+    with _stores_lock:
+        if sheet_id not in _stores:
+            _stores[sheet_id] = ContactStore(sheet_id)
+        return _stores[sheet_id]
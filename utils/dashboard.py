@@ -0,0 +1,114 @@
+# utils/dashboard.py
+
+from services.ai_services import email_cache_stats
+from services.gmail_mailer import get_mailer
+from services.google_clients import client_stats
+from services.linkedin_services import linkedin_cache_stats
+from services.linkedin_session import get_linkedin_session
+from utils.action_queue import get_action_queue
+from utils.contact_store import get_contact_store
+from utils.job_queue import get_job_queue, DEPLOYMENT_MODE
+from utils.prefetch import get_prefetcher
+from utils.prospect_index import get_prospect_index
+from utils.scheduler import get_scheduler, LANES
+from utils.tracing import process_recorder, prometheus_text
+
+
+def _stage_rows(snapshot):
+    return [
+        {
+            'stage': stage,
+            'calls': stats['calls'],
+            'errors': stats['errors'],
+            'retries': stats['retries'],
+            'p50 ms': round(stats['p50'] * 1000),
+            'p95 ms': round(stats['p95'] * 1000),
+        }
+        for stage, stats in snapshot.items()
+    ]
+
+
+def _budget_rows(snapshot):
+    return [
+        {
+            'service': name,
+            **{f'queued {lane}': budget['queued'][lane] for lane in LANES},
+            'in flight': budget['in_flight'],
+            'tokens left': ", ".join(f"{bucket} {tokens:.0f}" for bucket, tokens in budget['tokens'].items()),
+            'breaker': budget['breaker'],
+            'calls': budget['calls'],
+            'retries': budget['retries'],
+            'rejected': budget['rejected'],
+        }
+        for name, budget in snapshot.items()
+    ]
+
+
+def render_performance_sidebar(st):
+    """Show prefetch/cache status and per-stage latency (this session and the whole process)."""
+    prefetch_stats = get_prefetcher().stats()
+    st.sidebar.caption(
+        f"Prefetch queue: {prefetch_stats['queue_depth']} pending, {prefetch_stats['ready']} ready "
+        f"| hit rate: {prefetch_stats['hit_rate']:.0%}"
+    )
+    st.sidebar.caption(f"Email cache hit rate: {email_cache_stats()['hit_rate']:.0%}")
+    gmail_counts = get_mailer().counts()
+    st.sidebar.caption(
+        f"Gmail queue: {gmail_counts['queued'] + gmail_counts['sending']} queued, "
+        f"{gmail_counts['sent']} sent, {gmail_counts['failed']} failed"
+    )
+    action_stats = get_action_queue().stats()
+    st.sidebar.caption(
+        f"Send actions: {action_stats['running']} running, {action_stats['succeeded']} done, "
+        f"{action_stats['failed']} failed"
+    )
+    if DEPLOYMENT_MODE == 'workers':
+        job_stats = get_job_queue().stats()
+        queued = sum(counts['queued'] for counts in job_stats['kinds'].values())
+        running = sum(counts['running'] for counts in job_stats['kinds'].values())
+        st.sidebar.caption(
+            f"Workers: {len(job_stats['workers'])} running | jobs: {queued} queued, {running} running, "
+            f"{job_stats['done_last_minute']} done in the last minute"
+        )
+        if not job_stats['workers']:
+            st.sidebar.warning("No worker is running; start one with `python worker.py`.")
+    contact_counts = get_contact_store().counts()
+    st.sidebar.caption(
+        f"Contacts: {sum(contact_counts.values()) - contact_counts.get('new', 0)} prepared, "
+        f"{contact_counts.get('drafted', 0)} drafted, {contact_counts.get('sent', 0)} contacted"
+    )
+    last_send_calls = st.session_state.get('last_send_calls')
+    if last_send_calls is not None:
+        st.sidebar.caption(
+            "Last send API calls: "
+            + (", ".join(f"{stage} x{count}" for stage, count in last_send_calls.items()) or "none")
+        )
+
+    with st.sidebar.expander("Performance"):
+        st.write("**This session**")
+        st.dataframe(_stage_rows(st.session_state.trace.snapshot()), hide_index=True)
+        st.write("**All sessions**")
+        st.dataframe(_stage_rows(process_recorder.snapshot()), hide_index=True)
+        st.write("**Service budgets**")
+        st.dataframe(_budget_rows(get_scheduler().snapshot()), hide_index=True)
+
+        linkedin_stats = get_linkedin_session().stats()
+        google_stats = client_stats()
+        st.caption(
+            f"LinkedIn: {linkedin_stats['logins']} logins ({linkedin_stats['login_seconds']:.1f}s), "
+            f"{linkedin_stats['lookups']} lookups ({linkedin_stats['lookup_seconds']:.1f}s)"
+        )
+        st.caption(
+            "LinkedIn cache hit rate: "
+            + ", ".join(f"{kind} {stats['hit_rate']:.0%}" for kind, stats in linkedin_cache_stats().items())
+        )
+        index_stats = get_prospect_index().stats()
+        st.caption(
+            f"Prospect index: {index_stats['people']} people, {index_stats['saved']} LinkedIn searches saved, "
+            f"{index_stats['profile_hits']} profile checks answered locally"
+        )
+        st.caption(
+            f"Google clients: {google_stats['service_hits']} reused, {google_stats['service_misses']} built "
+            f"({google_stats['build_seconds']:.2f}s)"
+        )
+        st.download_button("Export metrics", prometheus_text(), file_name='outreach_metrics.prom')
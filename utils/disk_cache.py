@@ -0,0 +1,162 @@
+# utils/disk_cache.py
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+MISSING = object()
+
+
+class DiskCache:
+    """SQLite-backed key/value cache with a per-entry TTL and an in-memory LRU in front.
+
+    Values must be JSON-serialisable. Several caches can share one database file by using
+    different namespaces; each namespace is bounded to `max_entries` rows on disk (least
+    recently used rows are evicted first) and `memory_entries` items in memory. Memory hits
+    are written back to the rows' access times at most every `touch_interval` seconds, and
+    always before an eviction, so hot keys are not evicted as stale.
+    """
+
+    def __init__(self, path, namespace, ttl=None, max_entries=10000, memory_entries=512, touch_interval=60):
+        self.path = path
+        self.namespace = namespace
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.memory_entries = memory_entries
+        self.touch_interval = touch_interval
+        self._memory = OrderedDict()  # key -> (expires_at, value)
+        self._touched = {}  # key -> time of its last memory hit, not yet written to disk
+        self._flushed_at = time.monotonic()
+        self._lock = threading.Lock()
+        self._stats = {'memory_hits': 0, 'disk_hits': 0, 'misses': 0, 'expired': 0, 'writes': 0, 'evictions': 0}
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS cache ('
+            'namespace TEXT NOT NULL, key TEXT NOT NULL, value TEXT NOT NULL, '
+            'expires_at REAL, accessed_at REAL NOT NULL, PRIMARY KEY (namespace, key))'
+        )
+        self._conn.execute('CREATE INDEX IF NOT EXISTS cache_lru ON cache (namespace, accessed_at)')
+        self._conn.commit()
+
+    def get(self, key, default=None):
+        """Return the cached value for key, or default if it is missing or expired."""
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                if entry[0] is None or entry[0] > now:
+                    self._memory.move_to_end(key)
+                    self._stats['memory_hits'] += 1
+                    self._touched[key] = now
+                    if time.monotonic() - self._flushed_at >= self.touch_interval:
+                        self._flush_touched()
+                        self._conn.commit()
+                    return entry[1]
+                del self._memory[key]
+
+            row = self._conn.execute(
+                'SELECT value, expires_at FROM cache WHERE namespace = ? AND key = ?',
+                (self.namespace, key),
+            ).fetchone()
+            if row is None:
+                self._stats['misses'] += 1
+                return default
+            if row[1] is not None and row[1] <= now:
+                self._conn.execute('DELETE FROM cache WHERE namespace = ? AND key = ?', (self.namespace, key))
+                self._conn.commit()
+                self._stats['expired'] += 1
+                self._stats['misses'] += 1
+                return default
+
+            self._conn.execute(
+                'UPDATE cache SET accessed_at = ? WHERE namespace = ? AND key = ?',
+                (now, self.namespace, key),
+            )
+            self._conn.commit()
+            value = json.loads(row[0])
+            self._remember(key, row[1], value)
+            self._stats['disk_hits'] += 1
+            return value
+
+    def set(self, key, value, ttl=None):
+        """Store value under key, expiring after ttl seconds (default: the cache's ttl)."""
+        ttl = self.ttl if ttl is None else ttl
+        now = time.time()
+        expires_at = now + ttl if ttl is not None else None
+        with self._lock:
+            self._conn.execute(
+                'INSERT OR REPLACE INTO cache (namespace, key, value, expires_at, accessed_at) VALUES (?, ?, ?, ?, ?)',
+                (self.namespace, key, json.dumps(value), expires_at, now),
+            )
+            self._stats['writes'] += 1
+            self._evict()
+            self._conn.commit()
+            self._remember(key, expires_at, value)
+
+    def delete(self, key):
+        """Remove key from memory and disk."""
+        with self._lock:
+            self._memory.pop(key, None)
+            self._touched.pop(key, None)
+            self._conn.execute('DELETE FROM cache WHERE namespace = ? AND key = ?', (self.namespace, key))
+            self._conn.commit()
+
+    def clear(self):
+        """Remove every entry in this namespace."""
+        with self._lock:
+            self._memory.clear()
+            self._touched.clear()
+            self._conn.execute('DELETE FROM cache WHERE namespace = ?', (self.namespace,))
+            self._conn.commit()
+
+    def stats(self):
+        """Return hit/miss counters and the hit rate for this namespace."""
+        with self._lock:
+            stats = dict(self._stats)
+            stats['memory_size'] = len(self._memory)
+        lookups = stats['memory_hits'] + stats['disk_hits'] + stats['misses']
+        stats['hit_rate'] = (stats['memory_hits'] + stats['disk_hits']) / lookups if lookups else 0.0
+        return stats
+
+    def _remember(self, key, expires_at, value):
+        # Called with self._lock held.
+        self._memory[key] = (expires_at, value)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+
+    def _flush_touched(self):
+        # Called with self._lock held; the caller commits.
+        if self._touched:
+            self._conn.executemany(
+                'UPDATE cache SET accessed_at = MAX(accessed_at, ?) WHERE namespace = ? AND key = ?',
+                [(accessed_at, self.namespace, key) for key, accessed_at in self._touched.items()],
+            )
+            self._touched.clear()
+        self._flushed_at = time.monotonic()
+
+    def _evict(self):
+        # Called with self._lock held; drops the least recently used rows over the limit.
+        count = self._conn.execute('SELECT COUNT(*) FROM cache WHERE namespace = ?', (self.namespace,)).fetchone()[0]
+        excess = count - self.max_entries
+        if excess > 0:
+            self._flush_touched()
+            keys = [row[0] for row in self._conn.execute(
+                'SELECT key FROM cache WHERE namespace = ? ORDER BY accessed_at LIMIT ?',
+                (self.namespace, excess),
+            )]
+            self._conn.executemany(
+                'DELETE FROM cache WHERE namespace = ? AND key = ?',
+                [(self.namespace, key) for key in keys],
+            )
+            for key in keys:
+                self._memory.pop(key, None)
+            self._stats['evictions'] += len(keys)
@@ -0,0 +1,423 @@
+# utils/job_queue.py
+
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+import config
+from utils.scheduler import priority, INTERACTIVE
+
+# 'single': each app.py process prepares contacts and runs send actions on its own threads.
+# 'workers': several app.py processes share this host's caches, contact store and a job queue
+# in SQLite, and `python worker.py` processes run the prefetch and send jobs.
+DEPLOYMENT_MODE = getattr(config, 'DEPLOYMENT_MODE', 'single')
+JOB_QUEUE_PATH = getattr(config, 'JOB_QUEUE_PATH', 'cache/jobs.sqlite')
+# A running job whose worker stops renewing its lease for this long is handed to another worker.
+JOB_LEASE_SECONDS = getattr(config, 'JOB_LEASE_SECONDS', 60)
+JOB_MAX_ATTEMPTS = getattr(config, 'JOB_MAX_ATTEMPTS', 3)
+# How often idle workers and waiting app processes look at the queue.
+JOB_POLL_INTERVAL = getattr(config, 'JOB_POLL_INTERVAL', 0.2)
+# Partial results (e.g. a streaming email) are written at most this often.
+JOB_PROGRESS_INTERVAL = getattr(config, 'JOB_PROGRESS_INTERVAL', 0.25)
+# Finished jobs are kept this long for notifications and the dashboard.
+JOB_RETENTION_SECONDS = getattr(config, 'JOB_RETENTION_SECONDS', 3600)
+# Threads per worker process; jobs mostly wait on LinkedIn, Gemini and Gmail.
+WORKER_THREADS = getattr(config, 'WORKER_THREADS', 4)
+# A worker without a heartbeat for this long is considered gone (heartbeats come every few seconds).
+WORKER_TIMEOUT = getattr(config, 'WORKER_TIMEOUT', 15.0)
+
+ACTIVE_STATUSES = ('queued', 'running')
+FINAL_STATUSES = ('done', 'failed', 'cancelled')
+_COLUMNS = (
+    'id', 'kind', 'key', 'lane', 'owner', 'label', 'payload', 'status', 'worker', 'attempts', 'progress',
+    'result', 'error', 'created_at', 'started_at', 'finished_at',
+)
+
+
+class JobQueue:
+    """Durable job queue in SQLite (WAL), shared by every process on the host.
+
+    A job has a kind (which handler runs it), a key and a JSON payload. Enqueuing a key
+    that is already queued or running returns that job, raising its priority if needed.
+    Workers claim the next job (lowest scheduler lane first, then oldest) in one
+    transaction, so two processes never take the same job, and hold it with a lease they
+    keep renewing; a job whose worker died is queued again, up to JOB_MAX_ATTEMPTS.
+    """
+
+    def __init__(self, path=JOB_QUEUE_PATH, lease_seconds=JOB_LEASE_SECONDS, max_attempts=JOB_MAX_ATTEMPTS):
+        self.path = path
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS jobs ('
+            'id INTEGER PRIMARY KEY AUTOINCREMENT, kind TEXT NOT NULL, key TEXT NOT NULL, lane INTEGER NOT NULL, '
+            'owner TEXT, label TEXT, payload TEXT NOT NULL, status TEXT NOT NULL, worker TEXT, '
+            'attempts INTEGER NOT NULL DEFAULT 0, lease_expires REAL, progress TEXT, result TEXT, error TEXT, '
+            'notified INTEGER NOT NULL DEFAULT 0, created_at REAL NOT NULL, started_at REAL, finished_at REAL)'
+        )
+        self._conn.execute('CREATE INDEX IF NOT EXISTS jobs_next ON jobs (status, lane, id)')
+        self._conn.execute('CREATE INDEX IF NOT EXISTS jobs_key ON jobs (key, status)')
+        self._conn.execute('CREATE INDEX IF NOT EXISTS jobs_owner ON jobs (owner, status)')
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS workers ('
+            'name TEXT PRIMARY KEY, host TEXT, pid INTEGER, started_at REAL NOT NULL, seen_at REAL NOT NULL, '
+            'done INTEGER NOT NULL DEFAULT 0, failed INTEGER NOT NULL DEFAULT 0)'
+        )
+        self._conn.commit()
+
+    def enqueue(self, kind, key, payload, lane=INTERACTIVE, owner=None, label=None):
+        """Queue a job and return it; a queued or running job with the same key is returned instead."""
+        with self._lock, self._transaction():
+            job = self._active(key)
+            if job is None:
+                cursor = self._conn.execute(
+                    'INSERT INTO jobs (kind, key, lane, owner, label, payload, status, created_at) '
+                    "VALUES (?, ?, ?, ?, ?, ?, 'queued', ?)",
+                    (kind, key, lane, owner, label, json.dumps(payload), time.time()),
+                )
+                return self._job_by_id(cursor.lastrowid)
+            if lane < job['lane']:
+                # The operator now waits for a job queued ahead of time; a running one picks it up in run_job
+                self._conn.execute('UPDATE jobs SET lane = ? WHERE id = ?', (lane, job['id']))
+                job['lane'] = lane
+            return job
+
+    def claim(self, worker, kinds=None, key=None):
+        """Take the next queued job (of the given kinds, or the job with this key) and return it, or None."""
+        now = time.time()
+        with self._lock, self._transaction():
+            self._requeue_expired(now)
+            query = f"SELECT {', '.join(_COLUMNS)} FROM jobs WHERE status = 'queued'"
+            params = []
+            if key is not None:
+                query += ' AND key = ?'
+                params.append(key)
+            if kinds is not None:
+                query += f" AND kind IN ({', '.join('?' * len(kinds))})"
+                params.extend(kinds)
+            row = self._conn.execute(query + ' ORDER BY lane, id LIMIT 1', params).fetchone()
+            if row is None:
+                return None
+            job = _decode(row)
+            self._conn.execute(
+                "UPDATE jobs SET status = 'running', worker = ?, attempts = attempts + 1, lease_expires = ?, "
+                'started_at = ? WHERE id = ?',
+                (worker, now + self.lease_seconds, now, job['id']),
+            )
+        job.update(status='running', worker=worker, attempts=job['attempts'] + 1, started_at=now)
+        return job
+
+    def renew(self, worker):
+        """Extend the leases of every job the worker is running."""
+        with self._lock:
+            self._conn.execute(
+                "UPDATE jobs SET lease_expires = ? WHERE worker = ? AND status = 'running'",
+                (time.time() + self.lease_seconds, worker),
+            )
+            self._conn.commit()
+
+    def progress(self, job_id, value):
+        """Publish a partial result (any JSON value) for the processes waiting on the job."""
+        with self._lock:
+            self._conn.execute(
+                "UPDATE jobs SET progress = ? WHERE id = ? AND status = 'running'", (json.dumps(value), job_id),
+            )
+            self._conn.commit()
+
+    def complete(self, job_id, result=None, worker=None):
+        self._finish(job_id, 'done', worker, result=json.dumps(result))
+
+    def fail(self, job_id, error, worker=None):
+        self._finish(job_id, 'failed', worker, error=str(error))
+
+    def cancel(self, key):
+        """Drop a job that no worker has started yet; returns whether one was cancelled."""
+        with self._lock:
+            cursor = self._conn.execute(
+                "UPDATE jobs SET status = 'cancelled', finished_at = ? WHERE key = ? AND status = 'queued'",
+                (time.time(), key),
+            )
+            self._conn.commit()
+        return cursor.rowcount > 0
+
+    def lane(self, job_id):
+        """Return the job's current scheduler lane."""
+        with self._lock:
+            return self._conn.execute('SELECT lane FROM jobs WHERE id = ?', (job_id,)).fetchone()[0]
+
+    def job(self, key):
+        """Return the most recent job with this key, or None."""
+        with self._lock:
+            row = self._conn.execute(
+                f"SELECT {', '.join(_COLUMNS)} FROM jobs WHERE key = ? ORDER BY id DESC LIMIT 1", (key,),
+            ).fetchone()
+        return _decode(row) if row else None
+
+    def wait(self, key, timeout=None, on_progress=None, poll_interval=JOB_POLL_INTERVAL):
+        """Poll until the job with this key has finished (or timeout) and return it.
+
+        on_progress(value) is called whenever the job publishes a new partial result.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        shown = None
+        while True:
+            job = self.job(key)
+            if job is None or job['status'] in FINAL_STATUSES:
+                return job
+            if on_progress is not None and job['progress'] is not None and job['progress'] != shown:
+                on_progress(job['progress'])
+                shown = job['progress']
+            if deadline is not None and time.monotonic() >= deadline:
+                return job
+            time.sleep(poll_interval)
+
+    def active(self, owner=None, kind=None):
+        """Return the queued and running jobs (of one owner, of one kind), oldest first."""
+        query, params = self._filter("status IN ('queued', 'running')", owner, kind)
+        with self._lock:
+            rows = self._conn.execute(query + ' ORDER BY id', params).fetchall()
+        return [_decode(row) for row in rows]
+
+    def collect(self, owner, kind=None):
+        """Return the owner's finished jobs not returned before, and mark them as seen."""
+        query, params = self._filter("status IN ('done', 'failed') AND notified = 0", owner, kind)
+        with self._lock, self._transaction():
+            rows = self._conn.execute(query + ' ORDER BY id', params).fetchall()
+            self._conn.executemany('UPDATE jobs SET notified = 1 WHERE id = ?', [(row[0],) for row in rows])
+        return [_decode(row) for row in rows]
+
+    def heartbeat(self, worker, done=0, failed=0):
+        """Record that a worker is alive, with the jobs it finished since the last heartbeat."""
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                'INSERT INTO workers (name, host, pid, started_at, seen_at, done, failed) VALUES (?, ?, ?, ?, ?, ?, ?) '
+                'ON CONFLICT (name) DO UPDATE SET seen_at = excluded.seen_at, done = done + excluded.done, '
+                'failed = failed + excluded.failed',
+                (worker, socket.gethostname(), os.getpid(), now, now, done, failed),
+            )
+            self._conn.commit()
+
+    def prune(self):
+        """Forget finished jobs older than JOB_RETENTION_SECONDS."""
+        with self._lock:
+            self._conn.execute(
+                "DELETE FROM jobs WHERE status IN ('done', 'failed', 'cancelled') AND finished_at < ?",
+                (time.time() - JOB_RETENTION_SECONDS,),
+            )
+            self._conn.commit()
+
+    def workers(self):
+        """Return the worker processes that sent a heartbeat recently: [{name, host, pid, done, failed}]."""
+        with self._lock:
+            rows = self._conn.execute(
+                'SELECT name, host, pid, done, failed FROM workers WHERE seen_at > ? ORDER BY name',
+                (time.time() - WORKER_TIMEOUT,),
+            ).fetchall()
+        return [dict(zip(('name', 'host', 'pid', 'done', 'failed'), row)) for row in rows]
+
+    def stats(self):
+        """Return {status: jobs} per kind, jobs finished in the last minute and the live workers."""
+        with self._lock:
+            counts = self._conn.execute('SELECT kind, status, COUNT(*) FROM jobs GROUP BY kind, status').fetchall()
+            recent = self._conn.execute(
+                "SELECT COUNT(*) FROM jobs WHERE status = 'done' AND finished_at > ?", (time.time() - 60,),
+            ).fetchone()[0]
+        kinds = {}
+        for kind, status, count in counts:
+            kinds.setdefault(kind, dict.fromkeys(ACTIVE_STATUSES + FINAL_STATUSES, 0))[status] = count
+        return {'kinds': kinds, 'done_last_minute': recent, 'workers': self.workers()}
+
+    def _filter(self, condition, owner, kind):
+        query = f"SELECT {', '.join(_COLUMNS)} FROM jobs WHERE {condition}"
+        params = []
+        if owner is not None:
+            query += ' AND owner = ?'
+            params.append(owner)
+        if kind is not None:
+            query += ' AND kind = ?'
+            params.append(kind)
+        return query, params
+
+    def _finish(self, job_id, status, worker=None, result=None, error=None):
+        # With a worker, only while it still holds the job (its lease may have run out and been taken over)
+        with self._lock:
+            self._conn.execute(
+                'UPDATE jobs SET status = ?, result = ?, error = ?, progress = NULL, finished_at = ? '
+                "WHERE id = ? AND status = 'running' AND (? IS NULL OR worker = ?)",
+                (status, result, error, time.time(), job_id, worker, worker),
+            )
+            self._conn.commit()
+
+    def _requeue_expired(self, now):
+        # Called inside a write transaction; jobs of workers that stopped renewing their lease.
+        self._conn.execute(
+            "UPDATE jobs SET status = 'failed', error = 'worker stopped', finished_at = ? "
+            "WHERE status = 'running' AND lease_expires < ? AND attempts >= ?",
+            (now, now, self.max_attempts),
+        )
+        self._conn.execute(
+            "UPDATE jobs SET status = 'queued', worker = NULL WHERE status = 'running' AND lease_expires < ?", (now,),
+        )
+
+    def _active(self, key):
+        # Called inside a write transaction.
+        row = self._conn.execute(
+            f"SELECT {', '.join(_COLUMNS)} FROM jobs WHERE key = ? AND status IN ('queued', 'running') "
+            'ORDER BY id DESC LIMIT 1',
+            (key,),
+        ).fetchone()
+        return _decode(row) if row else None
+
+    def _job_by_id(self, job_id):
+        row = self._conn.execute(f"SELECT {', '.join(_COLUMNS)} FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return _decode(row)
+
+    def _transaction(self):
+        # BEGIN IMMEDIATE takes the write lock up front, so a read-then-write is atomic across processes
+        self._conn.execute('BEGIN IMMEDIATE')
+        return self._conn
+
+
+def _decode(row):
+    job = dict(zip(_COLUMNS, row))
+    for field in ('payload', 'progress', 'result'):
+        if job[field] is not None:
+            job[field] = json.loads(job[field])
+    return job
+
+
+def run_worker(handlers, name=None, threads=WORKER_THREADS, stop_event=None, exit_when_idle=False):
+    """Run queued jobs until stop_event is set (or, with exit_when_idle, until the queue is empty).
+
+    handlers maps a job kind to handler(payload, progress), whose return value (JSON) is
+    stored as the job's result; progress(value) publishes a partial result. Each job runs
+    in its scheduler lane, so a worker's external calls are still ordered by priority.
+    """
+    queue = get_job_queue()
+    name = name or f'{socket.gethostname()}:{os.getpid()}'
+    stop_event = stop_event or threading.Event()
+    counts = {'done': 0, 'failed': 0}
+    counts_lock = threading.Lock()
+
+    def loop(thread_name):
+        while not stop_event.is_set():
+            job = queue.claim(thread_name, kinds=list(handlers))
+            if job is None:
+                if exit_when_idle:
+                    return
+                stop_event.wait(JOB_POLL_INTERVAL)
+                continue
+            outcome = 'done' if run_job(queue, job, handlers[job['kind']]) else 'failed'
+            with counts_lock:
+                counts[outcome] += 1
+
+    def renew():
+        # Keep the leases of long jobs (and the worker's heartbeat) fresh
+        while not stop_event.wait(min(queue.lease_seconds / 3, 5.0)):
+            heartbeat()
+
+    def heartbeat():
+        with counts_lock:
+            done, failed = counts['done'], counts['failed']
+            counts.update(done=0, failed=0)
+        for index in range(threads):
+            queue.renew(f'{name}/{index}')
+        queue.heartbeat(name, done, failed)
+
+    queue.heartbeat(name)
+    queue.prune()
+    renewer = threading.Thread(target=renew, name='job-lease', daemon=True)
+    renewer.start()
+    workers = [
+        threading.Thread(target=loop, args=(f'{name}/{index}',), name=f'job-worker-{index}', daemon=True)
+        for index in range(threads)
+    ]
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    stop_event.set()
+    heartbeat()
+
+
+def run_job(queue, job, handler):
+    """Run one claimed job and record its outcome; returns whether it succeeded."""
+    last_update = [0.0]
+
+    def progress(value):
+        now = time.monotonic()
+        if now - last_update[0] >= JOB_PROGRESS_INTERVAL:
+            last_update[0] = now
+            queue.progress(job['id'], value)
+
+    try:
+        with priority(_live_lane(queue, job)):
+            result = handler(job['payload'], progress)
+    except Exception as error:
+        print(f"Job {job['kind']} {job['key']} failed: {error}")
+        queue.fail(job['id'], error, worker=job['worker'])
+        return False
+    queue.complete(job['id'], result, worker=job['worker'])
+    return True
+
+
+def _live_lane(queue, job):
+    # The job's lane, read again at most every JOB_POLL_INTERVAL: an app process raises it once
+    # the operator waits for the job.
+    state = {'lane': job['lane'], 'read_at': time.monotonic()}
+
+    def lane():
+        now = time.monotonic()
+        if now - state['read_at'] >= JOB_POLL_INTERVAL:
+            state.update(lane=queue.lane(job['id']), read_at=now)
+        return state['lane']
+
+    return lane
+
+
+def run_inline(queue, key, handler):
+    """Run a queued job in this process if no worker has taken it yet; returns whether it ran here.
+
+    Lets the app keep working while no worker process is running. The lease is renewed
+    for the whole run, as run_worker does, so a job waiting on a slow budget is not handed
+    to a worker and run twice.
+    """
+    worker = f'{socket.gethostname()}:{os.getpid()}/inline-{threading.get_ident()}'
+    job = queue.claim(worker, key=key)
+    if job is None:
+        return False
+    finished = threading.Event()
+
+    def renew():
+        while not finished.wait(min(queue.lease_seconds / 3, 5.0)):
+            queue.renew(worker)
+
+    threading.Thread(target=renew, name='job-lease', daemon=True).start()
+    try:
+        run_job(queue, job, handler)
+    finally:
+        finished.set()
+    return True
+
+
+_job_queue = None
+_job_queue_lock = threading.Lock()
+
+
+def get_job_queue():
+    """Return this process's connection to the shared job queue."""
+    global _job_queue
+    with _job_queue_lock:
+        if _job_queue is None:
+            _job_queue = JobQueue()
+        return _job_queue
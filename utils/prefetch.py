@@ -0,0 +1,319 @@
+# utils/prefetch.py
+
+import asyncio
+import hashlib
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+import config
+from config import SHEET_ID
+from services.ai_services import GEMINI_MAX_WORKERS
+from utils.contact_pipeline import load_contact, lookup_contact, draft_contact_async
+from utils.contact_store import get_contact_store, contact_fingerprint
+from utils.job_queue import get_job_queue, run_inline, DEPLOYMENT_MODE, JOB_LEASE_SECONDS, ACTIVE_STATUSES
+from utils.scheduler import priority, INTERACTIVE, PREFETCH
+from utils.sheet_data import make_contact
+
+# How many contacts ahead of the current one to prepare, and on how many threads.
+PREFETCH_DEPTH = getattr(config, 'PREFETCH_DEPTH', 3)
+PREFETCH_WORKERS = getattr(config, 'PREFETCH_WORKERS', 2)
+# How often get() re-renders the partial email while waiting for a streaming job.
+PREFETCH_POLL_INTERVAL = getattr(config, 'PREFETCH_POLL_INTERVAL', 0.1)
+# How many job leases SharedPrefetcher.get() waits for the row on screen before giving up.
+PREFETCH_MAX_WAITS = getattr(config, 'PREFETCH_MAX_WAITS', 3)
+# A session's window is kept for this many seconds after its last schedule(), then its jobs may be cancelled.
+PREFETCH_SESSION_TTL = getattr(config, 'PREFETCH_SESSION_TTL', 600.0)
+
+
+class ContactPrefetcher:
+    """Prepare upcoming contacts on a bounded worker pool while the operator reviews the current one.
+
+    Work is keyed by sheet index plus the Contact record, so an edited row is never served a
+    stale result. Every Streamlit session shares the pool and keeps its own window
+    [index - depth, index + depth]; jobs no session's window covers are cancelled when the
+    operators jump away, and finished results outside them are dropped. Jobs stream their
+    email as it is generated, so a caller waiting on one can show the partial text.
+    The pool only does the LinkedIn lookups; emails are written with draft_contact_async on
+    the prefetcher's event loop, so the pool moves on to the next rows meanwhile.
+    """
+
+    def __init__(self, depth=PREFETCH_DEPTH, max_workers=PREFETCH_WORKERS):
+        self.depth = depth
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='prefetch')
+        self._loop = asyncio.new_event_loop()
+        self._loop.set_default_executor(ThreadPoolExecutor(max_workers=GEMINI_MAX_WORKERS, thread_name_prefix='prefetch-gemini'))
+        threading.Thread(target=self._loop.run_forever, name='prefetch-loop', daemon=True).start()
+        self._lock = threading.Lock()
+        self._jobs = {}  # index -> (contact, future, cancel_event, progress)
+        self._windows = _Windows(depth)
+        self._stats = {'hits': 0, 'waits': 0, 'misses': 0, 'cancelled': 0, 'errors': 0}
+
+    def schedule(self, rows, index, session=None):
+        """Queue the contacts from index to index + depth and cancel work no session's window covers."""
+        with self._lock:
+            self._windows.move(session, index)
+            for job_index in list(self._jobs):
+                if not self._windows.covers(job_index):
+                    self._drop(job_index)
+
+            for job_index in range(index, min(index + self.depth + 1, len(rows))):
+                contact = rows[job_index]
+                # The row on screen runs in the interactive lane, the rows after it in the prefetch lane
+                lane = INTERACTIVE if job_index == index else PREFETCH
+                job = self._jobs.get(job_index)
+                if job and job[0] == contact:
+                    job[3]['lane'] = min(job[3]['lane'], lane)
+                    continue
+                if job:
+                    self._drop(job_index)
+                cancel_event = threading.Event()
+                progress = {'text': None, 'lane': lane}  # latest partial email body, written by the worker
+                future = Future()
+                self._executor.submit(self._run, contact, future, cancel_event, progress)
+                self._jobs[job_index] = (contact, future, cancel_event, progress)
+
+    def get(self, rows, index, on_text=None):
+        """Return the prepared contact for rows[index], waiting for it or computing it if needed.
+
+        While waiting, on_text(body) is called with the partial email as it is generated.
+        """
+        contact = rows[index]
+        with self._lock:
+            job = self._jobs.get(index)
+            if job and job[0] == contact and not job[2].is_set():
+                future, progress = job[1], job[3]
+                self._stats['hits' if future.done() else 'waits'] += 1
+                # The operator now waits for it: its remaining calls go ahead of other prefetches
+                progress['lane'] = INTERACTIVE
+            else:
+                future = None
+                self._stats['misses'] += 1
+
+        if future is not None:
+            shown = None
+            while on_text is not None and not future.done():
+                text = progress['text']
+                if text is not None and text != shown:
+                    on_text(text)
+                    shown = text
+                wait([future], timeout=PREFETCH_POLL_INTERVAL)
+            try:
+                result = future.result()
+                if result is not None:
+                    return result
+            except Exception:
+                with self._lock:
+                    self._stats['errors'] += 1
+                    self._jobs.pop(index, None)
+                raise
+
+        result = load_contact(contact, on_text=on_text)
+        self.store(rows, index, result)
+        return result
+
+    def store(self, rows, index, result):
+        """Record a result computed (or edited) outside the pool, e.g. after "Try Again"."""
+        future = _completed(result)
+        with self._lock:
+            self._jobs[index] = (rows[index], future, threading.Event(), {'text': None, 'lane': INTERACTIVE})
+
+    def stats(self):
+        """Return queue depth and hit-rate counters."""
+        with self._lock:
+            stats = dict(self._stats)
+            stats['queue_depth'] = sum(1 for job in self._jobs.values() if not job[1].done())
+            stats['ready'] = sum(1 for job in self._jobs.values() if job[1].done())
+        lookups = stats['hits'] + stats['waits'] + stats['misses']
+        stats['hit_rate'] = stats['hits'] / lookups if lookups else 0.0
+        return stats
+
+    def _run(self, contact, future, cancel_event, progress):
+        # LinkedIn stage, on the pool; a row that needs an email moves on to _draft.
+        if not future.set_running_or_notify_cancel():
+            return
+        try:
+            store = get_contact_store()
+            result = store.result(contact)
+            if result is None and not cancel_event.is_set():
+                # Prefetched rows yield to the contact on screen for every backend budget, until
+                # schedule() or get() promotes the job because it is now the contact on screen
+                with priority(lambda: progress['lane']):
+                    result = lookup_contact(contact)
+                if result['needs_email']:
+                    asyncio.run_coroutine_threadsafe(self._draft(contact, result, future, cancel_event, progress), self._loop)
+                    return
+                store.save_result(contact, result)
+            future.set_result(result)
+        except Exception as error:
+            future.set_exception(error)
+
+    async def _draft(self, contact, result, future, cancel_event, progress):
+        # AI stage, on the event loop; a row abandoned before it gets no email (its result is None).
+        try:
+            if cancel_event.is_set():
+                future.set_result(None)
+                return
+            with priority(lambda: progress['lane']):
+                await draft_contact_async(result, on_text=lambda text: progress.update(text=text))
+            get_contact_store().save_result(contact, result)
+            future.set_result(result)
+        except Exception as error:
+            future.set_exception(error)
+
+    def _drop(self, index):
+        # Called with self._lock held.
+        _, future, cancel_event, _ = self._jobs.pop(index)
+        if not future.done():
+            cancel_event.set()
+            future.cancel()
+            self._stats['cancelled'] += 1
+
+
+class SharedPrefetcher:
+    """ContactPrefetcher for the multi-process deployment: worker processes prepare the contacts.
+
+    Each upcoming row becomes a 'prepare' job in the shared job queue, keyed by row and
+    Contact record, and the result lands in the shared contact store, so a contact prepared
+    for one app process is ready in all of them. get() raises the job of the row on screen
+    to the interactive lane and shows its email as the worker streams it. Queued jobs no
+    session's window covers are cancelled; one a worker has started runs to completion.
+    While no worker is running, get() prepares the contact in this process.
+    """
+
+    def __init__(self, depth=PREFETCH_DEPTH):
+        self.depth = depth
+        self._lock = threading.Lock()
+        self._keys = {}  # index -> job key
+        self._windows = _Windows(depth)
+        self._stats = {'hits': 0, 'waits': 0, 'misses': 0, 'cancelled': 0, 'errors': 0}
+
+    def schedule(self, rows, index, session=None):
+        """Queue the contacts from index to index + depth and cancel queued work no session's window covers."""
+        queue = get_job_queue()
+        store = get_contact_store()
+        with self._lock:
+            self._windows.move(session, index)
+            for job_index in list(self._keys):
+                if not self._windows.covers(job_index):
+                    if queue.cancel(self._keys.pop(job_index)):
+                        self._stats['cancelled'] += 1
+
+            for job_index in range(index, min(index + self.depth + 1, len(rows))):
+                contact = rows[job_index]
+                key = _prepare_key(contact)
+                if self._keys.get(job_index) == key:
+                    continue
+                if job_index in self._keys and queue.cancel(self._keys[job_index]):
+                    self._stats['cancelled'] += 1
+                if store.result(contact) is None:
+                    lane = INTERACTIVE if job_index == index else PREFETCH
+                    queue.enqueue('prepare', key, _prepare_payload(contact), lane=lane)
+                self._keys[job_index] = key
+
+    def get(self, rows, index, on_text=None):
+        """Return the prepared contact for rows[index], waiting for its job or running it here if needed.
+
+        While waiting, on_text(body) is called with the partial email as it is generated.
+        Raises RuntimeError if the job fails, is cancelled or finishes without a result, or
+        is still unfinished after PREFETCH_MAX_WAITS job leases.
+        """
+        contact = rows[index]
+        store = get_contact_store()
+        result = store.result(contact)
+        queue = get_job_queue()
+        key = _prepare_key(contact)
+        with self._lock:
+            self._stats['hits' if result is not None else 'waits' if self._keys.get(index) == key else 'misses'] += 1
+
+        waits = 0
+        while result is None:
+            if waits == PREFETCH_MAX_WAITS:
+                raise self._error(f"Row {contact.row_number} was not prepared after {waits} job leases.")
+            waits += 1
+            # Raises a prefetched job (queued or running) to the interactive lane, or queues it again if it was cancelled
+            queue.enqueue('prepare', key, _prepare_payload(contact), lane=INTERACTIVE)
+            if not queue.workers():
+                run_inline(queue, key, lambda payload, progress: prepare_job(payload, on_text or progress))
+            job = queue.wait(key, timeout=JOB_LEASE_SECONDS, on_progress=on_text)
+            if job is None or job['status'] in ACTIVE_STATUSES:
+                # Pruned from the queue, or still running after a full lease: queue it again and keep waiting
+                continue
+            if job['status'] == 'failed':
+                raise self._error(job['error'])
+            if job['status'] == 'cancelled':
+                raise self._error(f"Preparing row {contact.row_number} was cancelled.")
+            result = store.result(contact)
+            if result is None:
+                raise self._error(f"Preparing row {contact.row_number} finished without a result.")
+        return result
+
+    def store(self, rows, index, result):
+        """Nothing to do: results computed outside the workers are already in the shared contact store."""
+
+    def stats(self):
+        """Return queue depth and hit-rate counters; depth and ready count every process's 'prepare' jobs."""
+        counts = get_job_queue().stats()['kinds'].get('prepare', {})
+        with self._lock:
+            stats = dict(self._stats)
+        stats['queue_depth'] = counts.get('queued', 0) + counts.get('running', 0)
+        stats['ready'] = counts.get('done', 0)
+        lookups = stats['hits'] + stats['waits'] + stats['misses']
+        stats['hit_rate'] = stats['hits'] / lookups if lookups else 0.0
+        return stats
+
+    def _error(self, message):
+        with self._lock:
+            self._stats['errors'] += 1
+        return RuntimeError(message)
+
+
+class _Windows:
+    """The cursor of every session using a prefetcher; a session unseen for PREFETCH_SESSION_TTL is forgotten."""
+
+    def __init__(self, depth, ttl=PREFETCH_SESSION_TTL):
+        self.depth = depth
+        self.ttl = ttl
+        self._cursors = {}  # session -> (index, last schedule)
+
+    def move(self, session, index):
+        now = time.monotonic()
+        self._cursors[session] = (index, now)
+        for other, (_, seen) in list(self._cursors.items()):
+            if now - seen > self.ttl:
+                del self._cursors[other]
+
+    def covers(self, index):
+        return any(abs(index - cursor) <= self.depth for cursor, _ in self._cursors.values())
+
+
+def prepare_job(payload, progress):
+    """Job handler for 'prepare' jobs: load the contact into the contact store, streaming the email to progress."""
+    load_contact(make_contact(*payload['row']), on_text=progress)
+
+
+def _prepare_key(contact):
+    fingerprint = hashlib.sha256(contact_fingerprint(contact).encode()).hexdigest()[:16]
+    return f'prepare:{SHEET_ID}:{contact.row_number}:{fingerprint}'
+
+
+def _prepare_payload(contact):
+    return {'row': [contact.row_number, contact.cells]}
+
+
+def _completed(result):
+    future = Future()
+    future.set_result(result)
+    return future
+
+
+_prefetcher = None
+_prefetcher_lock = threading.Lock()
+
+
+def get_prefetcher():
+    """Return the process-wide prefetcher shared by all Streamlit sessions (SharedPrefetcher in 'workers' mode)."""
+    global _prefetcher
+    with _prefetcher_lock:
+        if _prefetcher is None:
+            _prefetcher = SharedPrefetcher() if DEPLOYMENT_MODE == 'workers' else ContactPrefetcher()
+        return _prefetcher
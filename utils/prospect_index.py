@@ -0,0 +1,383 @@
+# utils/prospect_index.py
+
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from collections import Counter
+import config
+
+PROSPECT_INDEX_PATH = getattr(config, 'PROSPECT_INDEX_PATH', 'cache/prospects.sqlite')
+# Stored searches and profile facts are trusted for this long, like the LinkedIn search cache.
+PROSPECT_INDEX_TTL = getattr(config, 'PROSPECT_INDEX_TTL', 7 * 86400)
+# Trigram similarity two first names need before one's earlier search is reused for the other.
+PROSPECT_NAME_THRESHOLD = getattr(config, 'PROSPECT_NAME_THRESHOLD', 0.7)
+# Extra company spellings, e.g. {'bhp billiton': 'bhp'}; keys and values are compared normalized.
+COMPANY_ALIASES = getattr(config, 'COMPANY_ALIASES', {})
+# With several processes (DEPLOYMENT_MODE = 'workers') a miss first reads what the others stored since.
+PROSPECT_INDEX_SHARED = getattr(config, 'DEPLOYMENT_MODE', 'single') == 'workers'
+
+# Legal-form words dropped from the end of company names ("Newmont Corp" == "Newmont").
+_COMPANY_SUFFIXES = {
+    'ag', 'co', 'company', 'corp', 'corporation', 'group', 'gmbh', 'holdings', 'inc', 'incorporated',
+    'limited', 'llc', 'ltd', 'nv', 'plc', 'pty', 'sa', 'spa',
+}
+# Addresses on these domains say nothing about the company.
+_FREE_MAIL_DOMAINS = {
+    'aol', 'gmail', 'googlemail', 'gmx', 'hotmail', 'icloud', 'live', 'mail', 'me', 'msn', 'outlook',
+    'proton', 'protonmail', 'yahoo', 'yandex',
+}
+_SECOND_LEVEL = {'ac', 'co', 'com', 'gov', 'net', 'org'}
+
+
+def normalize_text(value):
+    """Lowercase, strip accents and punctuation, collapse spaces: 'Zoë  O'Neil' -> 'zoe o neil'."""
+    value = unicodedata.normalize('NFKD', value or '')
+    value = ''.join(ch for ch in value if not unicodedata.combining(ch)).lower()
+    return ' '.join(re.sub(r'[^a-z0-9]+', ' ', value).split())
+
+
+_ALIASES = {normalize_text(alias): normalize_text(target) for alias, target in COMPANY_ALIASES.items()}
+
+
+def company_key(company_name):
+    """Normalized company name without legal suffixes, after the configured aliases."""
+    words = []
+    for word in normalize_text(company_name).split():
+        # Rejoin dotted abbreviations: "S.A." -> "sa"
+        if len(word) == 1 and words and len(words[-1]) < 3 and words[-1].isalpha() and word.isalpha():
+            words[-1] += word
+        else:
+            words.append(word)
+    if words and words[0] == 'the':
+        words = words[1:]
+    while len(words) > 1 and words[-1] in _COMPANY_SUFFIXES:
+        words.pop()
+    key = ' '.join(words)
+    return _ALIASES.get(key, key) or None
+
+
+def email_domain(email):
+    """Return the organisation part of an address ('riotinto' for j@mail.riotinto.com), None for free mail."""
+    domain = (email or '').strip().lower().rpartition('@')[2]
+    labels = [label for label in domain.split('.') if label]
+    if len(labels) < 2:
+        return None
+    label = labels[-3] if len(labels) >= 3 and labels[-2] in _SECOND_LEVEL else labels[-2]
+    return None if label in _FREE_MAIL_DOMAINS else label
+
+
+def trigrams(text):
+    padded = f' {text} '
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def similarity(a, b):
+    """Jaccard similarity of the two strings' trigrams (1.0 for equal strings)."""
+    if a == b:
+        return 1.0
+    grams_a, grams_b = trigrams(a), trigrams(b)
+    return len(grams_a & grams_b) / len(grams_a | grams_b) if grams_a and grams_b else 0.0
+
+
+def _digits(text):
+    return ''.join(ch for ch in text if ch.isdigit())
+
+
+def rank_results(results, first_name, company_name=None):
+    """Order search results by how well their name (and headline) match the row; ties keep LinkedIn's order."""
+    name = normalize_text(first_name)
+    company = company_key(company_name) if company_name else None
+
+    def score(result):
+        words = normalize_text(result.get('name')).split()
+        name_score = max((similarity(name, word) for word in words), default=0.0)
+        headline = normalize_text(result.get('jobtitle') or result.get('headline'))
+        return name_score + (0.5 if company and company in headline else 0.0)
+
+    if not any(result.get('name') for result in results):
+        return results
+    return sorted(results, key=score, reverse=True)
+
+
+class ProspectIndex:
+    """Local index of people and companies, consulted before any LinkedIn search.
+
+    Searches are stored under a normalized (first name, company) key, so "Rio Tinto Ltd"
+    and "RIO TINTO" share one search. Company spellings seen with the same email domain
+    are merged as aliases. A first name within PROSPECT_NAME_THRESHOLD trigram similarity
+    of a stored one reuses that search's candidates. Concurrent searches for the same key
+    share one request. Resolved profiles keep only whether they have mining experience.
+    Everything is kept in memory and persisted in SQLite (WAL); processes sharing the file
+    pick up each other's searches and profiles on a miss.
+    """
+
+    def __init__(self, path=PROSPECT_INDEX_PATH, ttl=PROSPECT_INDEX_TTL, name_threshold=PROSPECT_NAME_THRESHOLD):
+        self.path = path
+        self.ttl = ttl
+        self.name_threshold = name_threshold
+        self._lock = threading.Lock()
+        self._searches = {}  # (name, company) -> (query, results, updated_at)
+        self._companies_by_name = {}  # name -> {company}
+        self._grams = {}  # trigram -> {name}
+        self._profiles = {}  # urn_id -> (mining, updated_at)
+        self._emails = {}  # email -> (domain, company)
+        self._domain_companies = {}  # domain -> {company: emails}
+        self._company_domains = {}  # company -> {domain: emails}
+        self._inflight = {}  # key -> Event
+        self._stats = {
+            'searches': 0, 'repeats': 0, 'normalized': 0, 'aliases': 0, 'fuzzy': 0, 'shared': 0, 'fetched': 0,
+            'profile_hits': 0, 'profiles_fetched': 0, 'duplicate_rows': 0,
+        }
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS searches (name TEXT NOT NULL, company TEXT NOT NULL, query TEXT NOT NULL, '
+            'results TEXT NOT NULL, updated_at REAL NOT NULL, PRIMARY KEY (name, company))'
+        )
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS profiles (urn_id TEXT PRIMARY KEY, mining INTEGER NOT NULL, updated_at REAL NOT NULL)'
+        )
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS emails (email TEXT PRIMARY KEY, domain TEXT NOT NULL, company TEXT NOT NULL)'
+        )
+        self._conn.execute('CREATE INDEX IF NOT EXISTS searches_updated ON searches (updated_at)')
+        self._conn.execute('CREATE INDEX IF NOT EXISTS profiles_updated ON profiles (updated_at)')
+        self._conn.commit()
+        self._synced_at = time.time()
+        self._load(time.time() - self.ttl)
+        for email, domain, company in self._conn.execute('SELECT email, domain, company FROM emails'):
+            self._learn(email, domain, company)
+
+    def add_contact(self, contact):
+        """Learn the row's email domain for the company alias table."""
+        email = (contact.recipient_email or '').strip().lower()
+        domain = email_domain(email)
+        company = company_key(contact.company_name)
+        if not domain or not company:
+            return
+        with self._lock:
+            if self._emails.get(email) == (domain, company):
+                return
+            self._learn(email, domain, company)
+            self._conn.execute('INSERT OR REPLACE INTO emails VALUES (?, ?, ?)', (email, domain, company))
+            self._conn.commit()
+
+    def index_sheet(self, rows):
+        """Index every row and return {row_number: earlier row_number} for rows repeating an earlier person.
+
+        Rows are the same person when they share an email address, or when neither has one
+        and their normalized name and company match.
+        """
+        seen = {}
+        duplicates = {}
+        for contact in rows:
+            self.add_contact(contact)
+            email = (contact.recipient_email or '').strip().lower()
+            key = email or (normalize_text(contact.first_name), self.company(contact.company_name))
+            if not email and not key[0]:
+                continue
+            if key in seen:
+                duplicates[contact.row_number] = seen[key]
+            else:
+                seen[key] = contact.row_number
+        with self._lock:
+            self._stats['duplicate_rows'] += len(duplicates)
+        return duplicates
+
+    def company(self, company_name):
+        """Return the company's key after aliases, e.g. 'bhp' for "BHP Billiton" when both share bhp.com."""
+        key = company_key(company_name)
+        if key is None:
+            return None
+        with self._lock:
+            return self._resolve(key)
+
+    def search(self, first_name, company_name, fetch, remember=True):
+        """Return the search results for a row, from the index when possible, else from fetch().
+
+        Results are ranked by how well they match the row (see rank_results). With
+        remember=False a fetched result is returned but not stored (cache-only mode); an
+        empty result is never stored.
+        """
+        query = (f"{first_name} {company_name}" if company_name else first_name).strip().lower()
+        name = normalize_text(first_name)
+        company = (company_key(company_name) if company_name else None) or ''
+        with self._lock:
+            self._stats['searches'] += 1
+        shared = False
+        while True:
+            with self._lock:
+                hit = self._find(name, company, query, 'shared' if shared else None)
+                if hit is None and self._sync():
+                    hit = self._find(name, company, query)
+                if hit is not None:
+                    return rank_results(hit, first_name, company_name)
+                flight = (name, self._resolve(company) if company else '')
+                waiting = self._inflight.get(flight)
+                if waiting is None:
+                    self._inflight[flight] = threading.Event()
+                    break
+            # Another row is searching for the same person; use its answer (or search if it failed)
+            waiting.wait()
+            shared = True
+
+        try:
+            results = fetch()
+            with self._lock:
+                self._stats['fetched'] += 1
+                # An empty answer may be transient; the lookup cache keeps it briefly (LINKEDIN_EMPTY_TTL)
+                if remember and results:
+                    self._store_search(name, company, query, results)
+        finally:
+            with self._lock:
+                self._inflight.pop(flight).set()
+        return rank_results(results, first_name, company_name)
+
+    def mining(self, urn_id):
+        """Return whether a resolved profile has mining experience, or None if it is not known."""
+        with self._lock:
+            entry = self._profiles.get(urn_id)
+            if entry is None and self._sync():
+                entry = self._profiles.get(urn_id)
+            if entry is None or entry[1] + self.ttl <= time.time():
+                return None
+            self._stats['profile_hits'] += 1
+            return entry[0]
+
+    def add_profile(self, urn_id, mining):
+        """Remember a fetched profile's mining flag."""
+        now = time.time()
+        with self._lock:
+            self._profiles[urn_id] = (bool(mining), now)
+            self._stats['profiles_fetched'] += 1
+            self._conn.execute('INSERT OR REPLACE INTO profiles VALUES (?, ?, ?)', (urn_id, int(bool(mining)), now))
+            self._conn.commit()
+
+    def stats(self):
+        """Return counters; 'saved' is the LinkedIn searches the index answered that no cache would have."""
+        with self._lock:
+            stats = dict(self._stats, people=len(self._searches), profiles=len(self._profiles))
+        stats['saved'] = stats['normalized'] + stats['aliases'] + stats['fuzzy'] + stats['shared']
+        return stats
+
+    def _find(self, name, company, query, kind=None):
+        # Called with self._lock held; counts the hit as kind, or as the kind of match found.
+        now = time.time()
+        entry = self._searches.get((name, company))
+        if entry is not None and entry[2] + self.ttl > now:
+            # The same raw query would also have been answered by the LinkedIn search cache
+            self._stats[kind or ('repeats' if entry[0] == query else 'normalized')] += 1
+            return entry[1]
+        resolved = self._resolve(company) if company else ''
+        if resolved:
+            for other in self._companies_by_name.get(name, ()):
+                entry = self._searches[(name, other)]
+                if other and self._resolve(other) == resolved and entry[2] + self.ttl > now:
+                    self._stats[kind or 'aliases'] += 1
+                    return entry[1]
+        # Only names sharing enough trigrams can reach the threshold, so most are never scored
+        grams = trigrams(name)
+        shared = Counter(candidate for gram in grams for candidate in self._grams.get(gram, ()))
+        best, best_score = None, self.name_threshold
+        for candidate, count in shared.items():
+            # Numbers in names identify different people ("Sam 2"), so they must agree exactly
+            if count < self.name_threshold * len(grams) or _digits(candidate) != _digits(name):
+                continue
+            score = similarity(name, candidate)
+            if candidate == name or score < best_score:
+                continue
+            for other in self._companies_by_name[candidate]:
+                entry = self._searches[(candidate, other)]
+                if (self._resolve(other) if other else '') == resolved and entry[2] + self.ttl > now:
+                    best, best_score = entry, score
+        if best is not None:
+            self._stats[kind or 'fuzzy'] += 1
+            return best[1]
+        return None
+
+    def _store_search(self, name, company, query, results):
+        # Called with self._lock held.
+        now = time.time()
+        self._remember_search(name, company, query, results, now)
+        self._conn.execute(
+            'INSERT OR REPLACE INTO searches VALUES (?, ?, ?, ?, ?)', (name, company, query, json.dumps(results), now),
+        )
+        self._conn.commit()
+
+    def _remember_search(self, name, company, query, results, updated_at):
+        self._searches[(name, company)] = (query, results, updated_at)
+        self._companies_by_name.setdefault(name, set()).add(company)
+        for gram in trigrams(name):
+            self._grams.setdefault(gram, set()).add(name)
+
+    def _learn(self, email, domain, company):
+        # Called with self._lock held; moves the address's vote to its current company.
+        previous = self._emails.get(email)
+        if previous is not None:
+            for counts, key in ((self._domain_companies[previous[0]], previous[1]),
+                                (self._company_domains[previous[1]], previous[0])):
+                counts[key] -= 1
+                if not counts[key]:
+                    del counts[key]
+        self._emails[email] = (domain, company)
+        companies = self._domain_companies.setdefault(domain, {})
+        companies[company] = companies.get(company, 0) + 1
+        domains = self._company_domains.setdefault(company, {})
+        domains[domain] = domains.get(domain, 0) + 1
+
+    def _resolve(self, company):
+        # Called with self._lock held. A spelling maps to the most common spelling of the
+        # email domain that most of its addresses use; one stray address cannot alias it.
+        domains = self._company_domains.get(company)
+        if not domains:
+            return company
+        domain, votes = max(domains.items(), key=lambda item: item[1])
+        if votes * 2 <= sum(domains.values()):
+            return company
+        companies = self._domain_companies[domain]
+        return max(companies, key=lambda name: (companies[name], name == company))
+
+    def _load(self, since):
+        # Returns whether anything was stored after since.
+        loaded = False
+        for name, company, query, results, updated_at in self._conn.execute(
+            'SELECT name, company, query, results, updated_at FROM searches WHERE updated_at > ?', (since,),
+        ):
+            self._remember_search(name, company, query, json.loads(results), updated_at)
+            loaded = True
+        for urn_id, mining, updated_at in self._conn.execute(
+            'SELECT urn_id, mining, updated_at FROM profiles WHERE updated_at > ?', (since,),
+        ):
+            self._profiles[urn_id] = (bool(mining), updated_at)
+            loaded = True
+        return loaded
+
+    def _sync(self):
+        # Called with self._lock held; reads what other processes stored since the last look.
+        if not PROSPECT_INDEX_SHARED:
+            return False
+        # Overlap a little: a row stamped just before the last look may have been committed after it
+        since = self._synced_at - 5.0
+        self._synced_at = time.time()
+        return self._load(since)
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_prospect_index():
+    """Return the process-wide prospect index."""
+    global _index
+    with _index_lock:
+        if _index is None:
+            _index = ProspectIndex()
+        return _index
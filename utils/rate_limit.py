@@ -0,0 +1,130 @@
+# utils/rate_limit.py
+
+import os
+import sqlite3
+import threading
+import time
+
+
+class RateLimiter:
+    """Thread-safe token bucket allowing `rate` acquisitions per `per` seconds.
+
+    Up to `burst` tokens (default: `rate`) can be spent at once after an idle period;
+    acquire() blocks until enough tokens have refilled. A request larger than the bucket
+    waits for a full bucket and leaves it in debt, so the average rate still holds.
+    """
+
+    def __init__(self, rate, per=1.0, burst=None):
+        self.rate = float(rate)
+        self.per = float(per)
+        self.capacity = float(burst if burst is not None else rate)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate / self.per)
+        self._updated = now
+
+    def try_acquire(self, tokens=1):
+        """Take tokens if they are available right now; return whether that succeeded."""
+        with self._lock:
+            self._refill()
+            if self._tokens >= min(tokens, self.capacity):
+                self._tokens -= tokens
+                return True
+            return False
+
+    def acquire(self, tokens=1):
+        """Block until tokens are available and take them. Returns the seconds spent waiting."""
+        needed = min(tokens, self.capacity)
+        waited = 0.0
+        while True:
+            with self._lock:
+                self._refill()
+                if self._tokens >= needed:
+                    self._tokens -= tokens
+                    return waited
+                delay = (needed - self._tokens) * self.per / self.rate
+            time.sleep(delay)
+            waited += delay
+
+    def time_until(self, tokens=1):
+        """Return the seconds until tokens could be taken (0.0 if they are available now)."""
+        tokens = min(tokens, self.capacity)
+        with self._lock:
+            self._refill()
+            return max(0.0, (tokens - self._tokens) * self.per / self.rate)
+
+    def available(self):
+        """Return the number of tokens that could be taken right now."""
+        with self._lock:
+            self._refill()
+            return self._tokens
+
+
+class SharedRateLimiter:
+    """Token buckets kept in SQLite, so every process on the host draws from the same budget.
+
+    buckets maps a bucket name to (rate, per) as for RateLimiter; the buckets of one
+    limiter are checked and charged together in a single transaction.
+    """
+
+    def __init__(self, path, name, buckets):
+        self.name = name
+        self.buckets = {bucket: (float(rate), float(per)) for bucket, (rate, per) in buckets.items()}
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS buckets ('
+            'name TEXT NOT NULL, bucket TEXT NOT NULL, tokens REAL NOT NULL, updated_at REAL NOT NULL, '
+            'PRIMARY KEY (name, bucket))'
+        )
+        self._conn.commit()
+
+    def reserve(self, cost):
+        """Take cost.get(bucket, 1) from every bucket if all hold it and return 0.0; otherwise
+        take nothing and return the seconds until they could."""
+        with self._lock, self._conn:
+            # BEGIN IMMEDIATE: no other process can spend between the check and the update
+            self._conn.execute('BEGIN IMMEDIATE')
+            tokens, now = self._refill()
+            delay = 0.0
+            for bucket, (rate, per) in self.buckets.items():
+                needed = min(cost.get(bucket, 1), rate)
+                delay = max(delay, (needed - tokens[bucket]) * per / rate)
+            if delay <= 0:
+                for bucket in self.buckets:
+                    tokens[bucket] -= cost.get(bucket, 1)
+            self._conn.executemany(
+                'INSERT OR REPLACE INTO buckets (name, bucket, tokens, updated_at) VALUES (?, ?, ?, ?)',
+                [(self.name, bucket, value, now) for bucket, value in tokens.items()],
+            )
+        return max(0.0, delay)
+
+    def available(self):
+        """Return {bucket: tokens that could be taken right now}."""
+        with self._lock:
+            tokens, _ = self._refill()
+            self._conn.commit()
+        return tokens
+
+    def _refill(self):
+        # Called with self._lock held; wall-clock time, since the buckets are shared between processes.
+        now = time.time()
+        stored = dict(
+            (bucket, (tokens, updated_at)) for bucket, tokens, updated_at in self._conn.execute(
+                'SELECT bucket, tokens, updated_at FROM buckets WHERE name = ?', (self.name,),
+            )
+        )
+        tokens = {}
+        for bucket, (rate, per) in self.buckets.items():
+            value, updated_at = stored.get(bucket, (rate, now))
+            tokens[bucket] = min(rate, value + max(0.0, now - updated_at) * rate / per)
+        return tokens, now
@@ -0,0 +1,285 @@
+# utils/scheduler.py
+
+import contextvars
+import heapq
+import itertools
+import random
+import socket
+import threading
+import time
+from contextlib import contextmanager
+import config
+from utils.rate_limit import RateLimiter, SharedRateLimiter
+from utils.tracing import record_retry
+
+# Retries of a failed call, with exponential backoff and full jitter capped at SCHEDULER_MAX_BACKOFF.
+SCHEDULER_MAX_RETRIES = getattr(config, 'SCHEDULER_MAX_RETRIES', 5)
+SCHEDULER_MAX_BACKOFF = getattr(config, 'SCHEDULER_MAX_BACKOFF', 60.0)
+# A backend's circuit opens after this many consecutive failures and stays open for the cooldown.
+SCHEDULER_BREAKER_FAILURES = getattr(config, 'SCHEDULER_BREAKER_FAILURES', 5)
+SCHEDULER_BREAKER_COOLDOWN = getattr(config, 'SCHEDULER_BREAKER_COOLDOWN', 30.0)
+# With several processes (DEPLOYMENT_MODE = 'workers') the token buckets live in this SQLite file, so the
+# per-minute budgets hold for the whole host; concurrency limits and breakers stay per process.
+SCHEDULER_SHARED_BUDGETS = getattr(config, 'DEPLOYMENT_MODE', 'single') == 'workers'
+SCHEDULER_BUDGETS_PATH = getattr(config, 'SCHEDULER_BUDGETS_PATH', 'cache/budgets.sqlite')
+
+# Priority lanes, highest first: the contact on screen, prefetched contacts, batch runs.
+INTERACTIVE, PREFETCH, BATCH = 0, 1, 2
+LANES = ('interactive', 'prefetch', 'batch')
+
+_lane = contextvars.ContextVar('scheduler_lane', default=INTERACTIVE)
+# How often a call whose lane can change while it waits looks at it again, in seconds.
+_PROMOTION_CHECK = 0.25
+
+
+class CircuitOpenError(Exception):
+    """Raised for interactive calls to a backend whose circuit breaker is open."""
+
+
+@contextmanager
+def priority(lane):
+    """Run the block's external calls in a lane, e.g. `with priority(PREFETCH):`.
+
+    lane may also be a function returning the lane, for work that can be promoted while it
+    runs (a prefetched contact the operator is now waiting for); a waiting call re-reads it.
+    """
+    token = _lane.set(lane)
+    try:
+        yield
+    finally:
+        _lane.reset(token)
+
+
+def _resolve(lane):
+    return lane() if callable(lane) else lane
+
+
+def error_status(error):
+    """Return the HTTP status carried by a googleapiclient, api_core or requests error, if any."""
+    status = getattr(getattr(error, 'resp', None), 'status', None)
+    if status is None:
+        status = getattr(getattr(error, 'response', None), 'status_code', None)
+    if status is None:
+        code = getattr(error, 'code', None)
+        status = code if isinstance(code, int) else None
+    try:
+        return int(status) if status is not None else None
+    except (TypeError, ValueError):
+        return None
+
+
+def is_backend_failure(error):
+    """True for errors that say the backend is throttling or unhealthy (429, 5xx, network)."""
+    if isinstance(error, (ConnectionError, TimeoutError, socket.timeout)):
+        return True
+    status = error_status(error)
+    return status is not None and (status == 429 or status >= 500)
+
+
+class CircuitBreaker:
+    """Closed -> open after `failures` consecutive 5xx/network failures -> one probe after `cooldown`."""
+
+    def __init__(self, failures=SCHEDULER_BREAKER_FAILURES, cooldown=SCHEDULER_BREAKER_COOLDOWN):
+        self.failures = failures
+        self.cooldown = cooldown
+        self.consecutive = 0
+        self.opened_at = None
+        self.probing = False
+        self.opened = 0
+
+    def state(self):
+        """Return ('closed' | 'half_open' | 'open', seconds until a probe is allowed or None)."""
+        if self.opened_at is None:
+            return 'closed', 0.0
+        if self.probing:
+            return 'open', None
+        remaining = self.opened_at + self.cooldown - time.monotonic()
+        return ('half_open', 0.0) if remaining <= 0 else ('open', remaining)
+
+    def success(self):
+        self.consecutive = 0
+        self.opened_at = None
+        self.probing = False
+
+    def failure(self):
+        self.consecutive += 1
+        if self.probing or self.consecutive >= self.failures:
+            if self.opened_at is None or self.probing:
+                self.opened += 1
+            self.opened_at = time.monotonic()
+        self.probing = False
+
+
+class _Budget:
+    """Token buckets, concurrency limit, breaker and priority queue of one backend."""
+
+    def __init__(self, name, buckets, max_concurrency):
+        self.name = name
+        self.buckets = {bucket: RateLimiter(rate, per) for bucket, (rate, per) in buckets.items()}
+        self.shared = SharedRateLimiter(SCHEDULER_BUDGETS_PATH, name, buckets) if SCHEDULER_SHARED_BUDGETS else None
+        self.max_concurrency = max_concurrency
+        self.breaker = CircuitBreaker()
+        self.cond = threading.Condition()
+        self.waiting = []  # heap of (lane, sequence)
+        self.in_flight = 0
+        self.stats = {'calls': 0, 'errors': 0, 'retries': 0, 'rejected': 0, 'wait_seconds': 0.0}
+
+
+class Scheduler:
+    """Admission control for every call to an external service.
+
+    Each backend registers a budget: token buckets (e.g. requests and tokens per minute) and
+    an optional concurrency limit. A call waits in its backend's queue until it is at the
+    head (lower lane first, then arrival order), a concurrency slot is free and every bucket
+    holds its cost; it then runs on the caller's thread, so tracing context is kept. Backend
+    failures (429, 5xx, network) are retried with exponential backoff and jitter, 5xx and
+    network errors only for idempotent calls, and 5xx and network errors feed the backend's
+    circuit breaker. While a circuit is open, interactive calls fail fast and background
+    lanes wait for the probe. In the multi-process deployment the token buckets are shared
+    by every process on the host (SCHEDULER_SHARED_BUDGETS).
+    """
+
+    def __init__(self):
+        self._budgets = {}
+        self._lock = threading.Lock()
+        self._sequence = itertools.count()
+
+    def register(self, name, buckets, max_concurrency=None):
+        """Declare a backend's budget, e.g. register('gemini', {'requests': (15, 60)}). Re-registering is a no-op."""
+        with self._lock:
+            if name not in self._budgets:
+                self._budgets[name] = _Budget(name, buckets, max_concurrency)
+            return self._budgets[name]
+
+    def run(self, name, func, cost=None, idempotent=True, retries=SCHEDULER_MAX_RETRIES, should_retry=None,
+            stage=None):
+        """Call func() within the named budget and return its result.
+
+        cost maps bucket names to amounts (default 1 from every bucket). should_retry(error)
+        can veto a retry, e.g. once a streamed reply has been partly shown. Retries are
+        counted against stage (default: the budget name) in the tracing recorders.
+        """
+        budget = self._budgets[name]
+        for attempt in range(retries + 1):
+            self._admit(budget, _lane.get(), cost or {})
+            try:
+                result = func()
+            except Exception as error:
+                failed = is_backend_failure(error)
+                throttled = error_status(error) == 429
+                # Only backend failures count for the breaker. A 429 is backed off but does not open
+                # the circuit (the backend is up, just busy), and a caller's own error such as a
+                # ValueError says nothing either way, so neither closes it.
+                self._release(budget, None if throttled or not failed else True)
+                retry = failed and (idempotent or throttled)
+                if not retry or attempt == retries or (should_retry is not None and not should_retry(error)):
+                    with budget.cond:
+                        budget.stats['errors'] += 1
+                    raise
+                with budget.cond:
+                    budget.stats['retries'] += 1
+                record_retry(stage or name)
+                time.sleep(random.uniform(0, min(SCHEDULER_MAX_BACKOFF, 2 ** attempt)))
+            else:
+                self._release(budget, False)
+                return result
+
+    def snapshot(self):
+        """Return live budgets per backend: queue depth per lane, in-flight calls, tokens left, breaker state."""
+        with self._lock:
+            budgets = list(self._budgets.values())
+        snapshot = {}
+        for budget in budgets:
+            with budget.cond:
+                depths = dict.fromkeys(LANES, 0)
+                for lane, _ in budget.waiting:
+                    depths[LANES[lane]] += 1
+                breaker, _ = budget.breaker.state()
+                snapshot[budget.name] = dict(
+                    budget.stats,
+                    queued=depths,
+                    in_flight=budget.in_flight,
+                    max_concurrency=budget.max_concurrency,
+                    tokens=(
+                        budget.shared.available() if budget.shared is not None
+                        else {bucket: limiter.available() for bucket, limiter in budget.buckets.items()}
+                    ),
+                    breaker=breaker,
+                    breaker_opened=budget.breaker.opened,
+                )
+        return snapshot
+
+    def _admit(self, budget, source, cost):
+        ticket = (_resolve(source), next(self._sequence))
+        started = time.monotonic()
+        with budget.cond:
+            heapq.heappush(budget.waiting, ticket)
+            try:
+                while True:
+                    lane = _resolve(source)
+                    if lane != ticket[0]:
+                        # Promoted while waiting: keep its place among the calls of the new lane
+                        budget.waiting.remove(ticket)
+                        ticket = (lane, ticket[1])
+                        budget.waiting.append(ticket)
+                        heapq.heapify(budget.waiting)
+                    delay = None  # wait until notified
+                    if budget.waiting[0] == ticket:
+                        state, remaining = budget.breaker.state()
+                        if state == 'open':
+                            if lane == INTERACTIVE:
+                                budget.stats['rejected'] += 1
+                                raise CircuitOpenError(f"{budget.name} is failing; retry in {remaining or 0:.0f}s")
+                            delay = remaining
+                        elif budget.max_concurrency is None or budget.in_flight < budget.max_concurrency:
+                            delay = self._reserve(budget, cost)
+                            if delay <= 0:
+                                if state == 'half_open':
+                                    budget.breaker.probing = True
+                                heapq.heappop(budget.waiting)
+                                budget.in_flight += 1
+                                budget.stats['calls'] += 1
+                                return
+                    if callable(source):
+                        # Nothing notifies a promotion, so look again now and then
+                        delay = _PROMOTION_CHECK if delay is None else min(delay, _PROMOTION_CHECK)
+                    budget.cond.wait(delay)
+            finally:
+                if ticket in budget.waiting:
+                    budget.waiting.remove(ticket)
+                    heapq.heapify(budget.waiting)
+                budget.stats['wait_seconds'] += time.monotonic() - started
+                budget.cond.notify_all()
+
+    def _reserve(self, budget, cost):
+        # Called with budget.cond held; takes the cost from every bucket and returns 0.0, or
+        # takes nothing and returns the seconds until it could.
+        if budget.shared is not None:
+            return budget.shared.reserve(cost)
+        delay = max(
+            [limiter.time_until(cost.get(bucket, 1)) for bucket, limiter in budget.buckets.items()],
+            default=0.0,
+        )
+        if delay <= 0:
+            for bucket, limiter in budget.buckets.items():
+                limiter.try_acquire(cost.get(bucket, 1))
+        return delay
+
+    def _release(self, budget, failed):
+        with budget.cond:
+            budget.in_flight -= 1
+            if failed:
+                budget.breaker.failure()
+            elif failed is not None:
+                budget.breaker.success()
+            elif budget.breaker.probing:
+                budget.breaker.probing = False
+            budget.cond.notify_all()
+
+
+_scheduler = Scheduler()
+
+
+def get_scheduler():
+    """Return the process-wide scheduler."""
+    return _scheduler
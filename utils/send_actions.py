@@ -0,0 +1,74 @@
+# utils/send_actions.py
+
+import config
+from config import SHEET_ID
+from services.gmail_mailer import get_mailer
+from services.linkedin_services import authenticate_linkedin, send_linkedin_message
+from services.sheet_writer import queue_contact_update
+from utils.contact_store import get_contact_store
+
+# How long a Gmail action waits for its message to leave the queue before reporting it as queued.
+ACTION_TIMEOUT = getattr(config, 'ACTION_TIMEOUT', 30.0)
+
+
+def save_draft(row, subject, body):
+    """Save the draft to Gmail; returns (level, message)."""
+    # Keyed by the draft's content, so saving the same draft twice only creates it once
+    mailer = get_mailer()
+    job = mailer.submit('draft', subject, body, row.recipient_email)
+    mailer.flush()
+    status = mailer.wait(job['key'], timeout=ACTION_TIMEOUT)['status']
+    if status == 'sent':
+        store = get_contact_store()
+        if (store.get(row) or {}).get('status') in ('new', 'prepared'):
+            store.mark(row, 'drafted')
+        return 'success', f"Draft to {row.recipient_email} saved."
+    if status == 'failed':
+        return 'error', f"Could not save the draft to {row.recipient_email}."
+    return 'info', f"Draft to {row.recipient_email} queued; it will be saved shortly."
+
+
+def send_email(row, subject, body, key):
+    """Send the email through the Gmail queue under key; returns (level, message)."""
+    # The mailer marks the row in the sheet and the contact store only after Gmail accepts the message
+    mailer = get_mailer()
+    mailer.submit('send', subject, body, row.recipient_email, key=key, sheet_id=SHEET_ID, row_number=row.row_number)
+    mailer.flush()
+    status = mailer.wait(key, timeout=ACTION_TIMEOUT)['status']
+    if status == 'sent':
+        return 'success', f"Email to {row.recipient_email} sent."
+    if status == 'failed':
+        return 'error', f"Could not send the email to {row.recipient_email}."
+    return 'info', f"Email to {row.recipient_email} queued; it will be sent within the Gmail sending limits."
+
+
+def send_linkedin(row, urn_id, message):
+    """Send the LinkedIn message to an already resolved profile; returns (level, message).
+
+    At most once per row: a second click, or the job run again after its worker crashed,
+    finds the row sent (or mid-send) in the contact store and does not send.
+    """
+    store = get_contact_store()
+    previous = store.begin_send(row, "LinkedIn")
+    if previous is None:
+        if (store.get(row) or {}).get('status') == 'sent':
+            return 'info', f"A LinkedIn message to {row.first_name} was already sent."
+        return 'error', (
+            f"A LinkedIn message to {row.first_name} may already have been sent; check LinkedIn before sending it again."
+        )
+    # Reuses the shared session, no search or generation happens here
+    if not send_linkedin_message(authenticate_linkedin(), urn_id, message):
+        store.abort_send(row, previous)
+        return 'error', f"Could not send the LinkedIn message to {row.first_name}."
+    # Recorded only once LinkedIn has accepted the message
+    queue_contact_update(SHEET_ID, row.row_number, "LinkedIn", message)
+    store.mark(row, 'sent', "LinkedIn")
+    return 'success', f"LinkedIn message to {row.first_name} sent."
+
+
+# Actions by name; each takes the sheet Contact plus JSON-serialisable arguments.
+ACTIONS = {
+    'draft': save_draft,
+    'send': send_email,
+    'linkedin': send_linkedin,
+}
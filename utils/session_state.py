@@ -1,19 +1,24 @@
 # utils/session_state.py
 
+import uuid
+from utils.tracing import Recorder
+
 def init_session_state(st):
+    # Per-contact work lives in the contact store; the session only keeps a cursor.
+    # The cursor and operator come back from the URL after a browser refresh.
+    params = st.query_params
+    if 'operator_id' not in st.session_state:
+        st.session_state.operator_id = params.get('operator') or uuid.uuid4().hex[:12]
     if 'current_index' not in st.session_state:
-        st.session_state.current_index = 0
-    if 'email_content' not in st.session_state:
-        st.session_state.email_content = ''
-    if 'post_text' not in st.session_state:
-        st.session_state.post_text = ''
-    if 'profile' not in st.session_state:
-        st.session_state.profile = None
+        try:
+            st.session_state.current_index = max(0, int(params.get('jump', '0')))
+        except ValueError:
+            st.session_state.current_index = 0
     if 'cancelled' not in st.session_state:
         st.session_state.cancelled = False
-    if 'subject' not in st.session_state:
-        st.session_state.subject = ''
     if 'jump_to_line' not in st.session_state:
         st.session_state.jump_to_line = 1
     if 'jump_to_line_manual' not in st.session_state:
         st.session_state.jump_to_line_manual = ''
+    if 'trace' not in st.session_state:
+        st.session_state.trace = Recorder()  # Span timings for this session
@@ -0,0 +1,228 @@
+# utils/sheet_data.py
+
+import re
+import threading
+import time
+from collections import OrderedDict, namedtuple
+import config
+from services.google_clients import google_service, execute
+
+# Rows are loaded in pages of this size; at most SHEET_MAX_PAGES pages stay in memory.
+SHEET_PAGE_SIZE = getattr(config, 'SHEET_PAGE_SIZE', 500)
+SHEET_MAX_PAGES = getattr(config, 'SHEET_MAX_PAGES', 20)
+# Seconds between change checks (one Drive metadata call, no sheet data).
+SHEET_CHECK_INTERVAL = getattr(config, 'SHEET_CHECK_INTERVAL', 30)
+
+# One sheet row. row_number is the 1-based row in the spreadsheet; cells keeps the raw values.
+Contact = namedtuple('Contact', ['row_number', 'first_name', 'company_name', 'recipient_email', 'cells'])
+
+_RANGE_RE = re.compile(r"^(?:(?P<sheet>.+)!)?(?P<start_col>[A-Z]{1,3})(?P<start_row>\d+)?(?::(?P<end_col>[A-Z]{1,3})(?P<end_row>\d+)?)?$")
+# A bare sheet name or a named range is resolved to one of the form above through the spreadsheet's metadata.
+_METADATA_FIELDS = 'namedRanges(name,range),sheets(properties(sheetId,title,gridProperties(columnCount)))'
+
+
+def make_contact(row_number, cells):
+    """Build a Contact from a row's cells (name in the 1st, company in the 3rd, email in the 5th)."""
+    cells = tuple(cells)
+    return Contact(
+        row_number,
+        cells[0] if len(cells) > 0 and cells[0] else None,
+        cells[2] if len(cells) > 2 and cells[2] else None,
+        cells[4] if len(cells) > 4 and cells[4] else None,
+        cells,
+    )
+
+
+class SheetData:
+    """Paged, change-aware view of the contact rows in a sheet range.
+
+    Behaves like a read-only list of Contact records. Pages are fetched on first access and
+    kept across Streamlit reruns; refresh() asks Drive for the file's version, so an
+    unchanged sheet costs no data reads. After a change each cached page is re-read the
+    next time it is used and replaced only if its rows differ (the Sheets API cannot say
+    which rows changed), so Contact records of untouched pages are kept.
+    """
+
+    def __init__(self, sheet_id, range_name, page_size=SHEET_PAGE_SIZE, max_pages=SHEET_MAX_PAGES,
+                 check_interval=SHEET_CHECK_INTERVAL):
+        self.sheet_id = sheet_id
+        self.range_name = range_name
+        match = _RANGE_RE.match(range_name) or _RANGE_RE.match(self._resolve_range(range_name))
+        self.sheet = match.group('sheet')
+        self.start_col = match.group('start_col')
+        self.end_col = match.group('end_col') or self.start_col
+        self.start_row = int(match.group('start_row') or 1)
+        self.end_row = int(match.group('end_row')) if match.group('end_row') else None
+        self.page_size = page_size
+        self.max_pages = max_pages
+        self.check_interval = check_interval
+        self._lock = threading.RLock()
+        self._pages = OrderedDict()  # page number -> list of Contact
+        self._stale = set()  # cached pages to re-read on next use, after a change
+        self._length = None
+        self._version = None
+        self._checked_at = 0.0
+        self._drive_error = None
+        self._stats = {'page_loads': 0, 'page_hits': 0, 'change_checks': 0, 'changes': 0,
+                       'pages_rechecked': 0, 'pages_changed': 0}
+
+    def __len__(self):
+        with self._lock:
+            if self._length is None:
+                self._length = self._count_rows()
+            return self._length
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if index < 0 or index >= len(self):
+            raise IndexError(index)
+        page = self._page(index // self.page_size)
+        offset = index % self.page_size
+        if offset < len(page):
+            return page[offset]
+        # Trailing empty rows are not returned by the API
+        return make_contact(self.start_row + index, ())
+
+    def __iter__(self):
+        for index in range(len(self)):
+            yield self[index]
+
+    def refresh(self, force=False):
+        """Mark cached rows for re-checking if the sheet changed since the last check. Returns True if it did."""
+        with self._lock:
+            if not force and time.monotonic() - self._checked_at < self.check_interval:
+                return False
+            self._checked_at = time.monotonic()
+            self._stats['change_checks'] += 1
+            version = self._fetch_version()
+            changed = force or version is None or version != self._version
+            self._version = version
+            if changed and (self._pages or self._length is not None):
+                # Rows may have been added or removed anywhere, so the count is read again too
+                self._stale.update(self._pages)
+                self._length = None
+                self._stats['changes'] += 1
+            return changed
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats['cached_pages'] = len(self._pages)
+        return stats
+
+    def _page(self, number):
+        with self._lock:
+            cached = self._pages.get(number)
+            if cached is not None and number not in self._stale:
+                self._pages.move_to_end(number)
+                self._stats['page_hits'] += 1
+                return cached
+
+            first_row = self.start_row + number * self.page_size
+            last_row = first_row + self.page_size - 1
+            if self.end_row is not None:
+                last_row = min(last_row, self.end_row)
+            values = self._get_values(f'{self.start_col}{first_row}:{self.end_col}{last_row}')
+            page = [make_contact(first_row + offset, cells) for offset, cells in enumerate(values)]
+
+            if cached is not None:
+                self._stale.discard(number)
+                self._stats['pages_rechecked'] += 1
+                if page == cached:
+                    page = cached
+                else:
+                    self._stats['pages_changed'] += 1
+            self._pages[number] = page
+            self._pages.move_to_end(number)
+            self._stats['page_loads'] += 1
+            while len(self._pages) > self.max_pages:
+                self._stale.discard(self._pages.popitem(last=False)[0])
+            return page
+
+    def _count_rows(self):
+        # Only the first column is read to find where the data ends
+        end = self.end_row if self.end_row is not None else ''
+        values = self._get_values(f'{self.start_col}{self.start_row}:{self.start_col}{end}')
+        return len(values)
+
+    def _get_values(self, cell_range):
+        range_name = f'{self.sheet}!{cell_range}' if self.sheet else cell_range
+        with google_service('sheets', 'v4') as service:
+            result = execute(
+                'sheets', service.spreadsheets().values().get(spreadsheetId=self.sheet_id, range=range_name),
+                'sheets.get',
+            )
+        return result.get('values', [])
+
+    def _fetch_version(self):
+        """Return the Drive version of the spreadsheet, or None when Drive can't be queried."""
+        try:
+            with google_service('drive', 'v3') as service:
+                metadata = execute(
+                    'drive', service.files().get(fileId=self.sheet_id, fields='version,modifiedTime'), 'drive.version',
+                )
+            version = metadata.get('version') or metadata.get('modifiedTime')
+        except Exception as error:
+            # Without Drive access (e.g. scope not granted), every check counts as a change
+            if str(error) != self._drive_error:
+                print(f"Could not check the sheet for changes, re-checking rows every "
+                      f"{self.check_interval}s instead: {error}")
+            self._drive_error = str(error)
+            return None
+        self._drive_error = None
+        return version
+
+    def _resolve_range(self, range_name):
+        """Return the A1 range of a named range or a whole sheet, from the spreadsheet's metadata."""
+        with google_service('sheets', 'v4') as service:
+            metadata = execute(
+                'sheets', service.spreadsheets().get(spreadsheetId=self.sheet_id, fields=_METADATA_FIELDS),
+                'sheets.metadata',
+            )
+        sheets = {sheet['properties']['sheetId']: sheet['properties'] for sheet in metadata.get('sheets', [])}
+        name = range_name.strip("'")
+        for named_range in metadata.get('namedRanges', []):
+            if named_range['name'] == range_name:
+                grid = named_range['range']
+                properties = sheets[grid.get('sheetId', 0)]
+                break
+        else:
+            properties = next((p for p in sheets.values() if p['title'] == name), None)
+            if properties is None:
+                raise ValueError(f"Unsupported range: {range_name}")
+            grid = {}
+        size = properties.get('gridProperties', {})
+        start_row = grid.get('startRowIndex', 0) + 1
+        end_row = grid.get('endRowIndex')  # Open-ended, so rows appended later are included
+        start_col = _column_letters(grid.get('startColumnIndex', 0))
+        end_col = _column_letters(grid.get('endColumnIndex', size.get('columnCount', 26)) - 1)
+        title = properties['title'].replace("'", "''")
+        return f"'{title}'!{start_col}{start_row}:{end_col}{end_row or ''}"
+
+
+def _column_letters(index):
+    # 0 -> A, 25 -> Z, 26 -> AA
+    letters = ''
+    index += 1
+    while index:
+        index, remainder = divmod(index - 1, 26)
+        letters = chr(ord('A') + remainder) + letters
+    return letters
+
+
+_sheets = {}
+_sheets_lock = threading.Lock()
+
+
+def get_sheet_data(sheet_id, range_name):
+    """Return the process-wide SheetData for a range, checking it for changes first."""
+    with _sheets_lock:
+        key = (sheet_id, range_name)
+        if key not in _sheets:
+            _sheets[key] = SheetData(sheet_id, range_name)
+        sheet_data = _sheets[key]
+    sheet_data.refresh()
+    return sheet_data
@@ -0,0 +1,73 @@
+# utils/startup.py
+
+import importlib
+import sys
+import threading
+import time
+import config
+from utils.tracing import span, record
+
+# Log in to Google, Gemini and LinkedIn on a background thread as soon as the app starts
+# (LinkedIn only when it is used online and from this process).
+STARTUP_WARMUP = getattr(config, 'STARTUP_WARMUP', True)
+
+_lock = threading.Lock()
+_import_recorded = False
+_warmup_thread = None
+
+
+def import_sdk(name):
+    """Import a heavy SDK module on first use; the first import is timed as 'startup.import.<name>'."""
+    module = sys.modules.get(name)
+    if module is None:
+        with span(f'startup.import.{name}'):
+            module = importlib.import_module(name)
+    return module
+
+
+def record_import_time(seconds):
+    """Record how long the app's own imports took, once per process ('startup.import')."""
+    global _import_recorded
+    with _lock:
+        if _import_recorded:
+            return
+        _import_recorded = True
+    record('startup.import', seconds)
+
+
+def record_first_paint(st, started):
+    """Record the time from script start until the page shell is drawn, once per session ('startup.first_paint')."""
+    if st.session_state.get('first_paint_recorded'):
+        return
+    st.session_state.first_paint_recorded = True
+    record('startup.first_paint', time.perf_counter() - started)
+
+
+def start_warmup():
+    """Build the Google clients, load the Gemini SDK and log in to LinkedIn on a background thread, once per process."""
+    global _warmup_thread
+    if not STARTUP_WARMUP:
+        return
+    with _lock:
+        if _warmup_thread is None:
+            _warmup_thread = threading.Thread(target=_warmup, name='startup-warmup', daemon=True)
+            _warmup_thread.start()
+
+
+def _warmup():
+    # Imported here: these modules are what the warm-up loads off the UI thread
+    from services.ai_services import warm_up_model
+    from services.google_clients import warm_up_clients
+    from services.linkedin_session import get_linkedin_session
+
+    steps = [('google', warm_up_clients), ('gemini', warm_up_model)]
+    # Offline (cache-only) mode never logs in, and with worker processes the workers do the
+    # LinkedIn lookups and sends; this app process logs in on first use if it has to.
+    if not getattr(config, 'LINKEDIN_CACHE_ONLY', False) and getattr(config, 'DEPLOYMENT_MODE', 'single') != 'workers':
+        steps.append(('linkedin', lambda: get_linkedin_session().client()))
+    for name, func in steps:
+        try:
+            with span(f'startup.warmup.{name}'):
+                func()
+        except Exception as error:
+            print(f"Warm-up of {name} failed; it will be retried on first use: {error}")
@@ -0,0 +1,22 @@
+# utils/stats.py
+
+import math
+
+
+def percentile(values, pct):
+    """Return the pct-th percentile (0-100) of values using nearest-rank, or 0.0 if empty."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(1, math.ceil(pct / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+
+def summarize(values):
+    """Return count, p50, p95 and max for a list of durations in seconds."""
+    return {
+        'count': len(values),
+        'p50': percentile(values, 50),
+        'p95': percentile(values, 95),
+        'max': max(values) if values else 0.0,
+    }
@@ -0,0 +1,169 @@
+# utils/tracing.py
+
+import contextvars
+import functools
+import json
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+import config
+from utils.stats import summarize
+
+# Optional JSON-lines file that receives every finished span.
+TRACE_JSONL_PATH = getattr(config, 'TRACE_JSONL_PATH', None)
+# Durations kept per stage for percentiles; counters are never truncated.
+TRACE_WINDOW = getattr(config, 'TRACE_WINDOW', 2000)
+
+
+class Recorder:
+    """Per-stage span timings, call counts, errors and retries."""
+
+    def __init__(self, window=TRACE_WINDOW):
+        self.window = window
+        self._lock = threading.Lock()
+        self._stages = {}
+
+    def record(self, stage, duration, error=False):
+        with self._lock:
+            entry = self._entry(stage)
+            entry['durations'].append(duration)
+            entry['calls'] += 1
+            entry['total_seconds'] += duration
+            if error:
+                entry['errors'] += 1
+
+    def record_retry(self, stage):
+        with self._lock:
+            self._entry(stage)['retries'] += 1
+
+    def snapshot(self):
+        """Return {stage: {calls, errors, retries, total_seconds, p50, p95, max}}."""
+        with self._lock:
+            stages = {stage: (list(entry['durations']), dict(entry)) for stage, entry in self._stages.items()}
+        snapshot = {}
+        for stage, (durations, entry) in sorted(stages.items()):
+            summary = summarize(durations)
+            snapshot[stage] = {
+                'calls': entry['calls'],
+                'errors': entry['errors'],
+                'retries': entry['retries'],
+                'total_seconds': entry['total_seconds'],
+                'p50': summary['p50'],
+                'p95': summary['p95'],
+                'max': summary['max'],
+            }
+        return snapshot
+
+    def reset(self):
+        with self._lock:
+            self._stages.clear()
+
+    def _entry(self, stage):
+        # Called with self._lock held.
+        entry = self._stages.get(stage)
+        if entry is None:
+            entry = self._stages[stage] = {
+                'durations': deque(maxlen=self.window), 'calls': 0, 'errors': 0, 'retries': 0, 'total_seconds': 0.0,
+            }
+        return entry
+
+
+process_recorder = Recorder()
+_session_recorder = contextvars.ContextVar('session_recorder', default=None)
+_capture_recorder = contextvars.ContextVar('capture_recorder', default=None)
+_jsonl_lock = threading.Lock()
+
+
+def use_session_recorder(recorder):
+    """Also record spans from the current thread/context into recorder (one per Streamlit session)."""
+    _session_recorder.set(recorder)
+
+
+@contextmanager
+def capture():
+    """Collect the spans of one block (e.g. a single send) in a fresh Recorder."""
+    recorder = Recorder()
+    token = _capture_recorder.set(recorder)
+    try:
+        yield recorder
+    finally:
+        _capture_recorder.reset(token)
+
+
+def call_counts(recorder, prefixes=('linkedin.api.', 'gemini.generate_content', 'gmail.', 'sheets.')):
+    """Return {stage: calls} for the external API stages in a recorder."""
+    return {
+        stage: stats['calls'] for stage, stats in recorder.snapshot().items()
+        if stage.startswith(prefixes)
+    }
+
+
+@contextmanager
+def span(stage):
+    """Time a block as one call to stage, e.g. `with span('gmail.send'):`."""
+    started = time.perf_counter()
+    error = False
+    try:
+        yield
+    except BaseException:
+        error = True
+        raise
+    finally:
+        record(stage, time.perf_counter() - started, error)
+
+
+def record(stage, duration, error=False):
+    """Record a duration measured elsewhere (e.g. time to first token) as one call to stage."""
+    process_recorder.record(stage, duration, error)
+    for recorder in (_session_recorder.get(), _capture_recorder.get()):
+        if recorder is not None:
+            recorder.record(stage, duration, error)
+    if TRACE_JSONL_PATH:
+        _write_jsonl({'stage': stage, 'seconds': duration, 'error': error, 'at': time.time()})
+
+
+def traced(stage):
+    """Decorator form of span()."""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(stage):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def record_retry(stage):
+    """Count a retry of stage (e.g. after a 429) in the process and session recorders."""
+    process_recorder.record_retry(stage)
+    for recorder in (_session_recorder.get(), _capture_recorder.get()):
+        if recorder is not None:
+            recorder.record_retry(stage)
+
+
+def prometheus_text(recorder=None, prefix='outreach'):
+    """Render a recorder's snapshot in the Prometheus text exposition format."""
+    snapshot = (recorder or process_recorder).snapshot()
+    lines = [
+        f'# TYPE {prefix}_stage_seconds summary',
+    ]
+    for stage, stats in snapshot.items():
+        label = f'stage="{stage}"'
+        lines.append(f'{prefix}_stage_seconds{{{label},quantile="0.5"}} {stats["p50"]:.6f}')
+        lines.append(f'{prefix}_stage_seconds{{{label},quantile="0.95"}} {stats["p95"]:.6f}')
+        lines.append(f'{prefix}_stage_seconds_sum{{{label}}} {stats["total_seconds"]:.6f}')
+        lines.append(f'{prefix}_stage_seconds_count{{{label}}} {stats["calls"]}')
+    lines.append(f'# TYPE {prefix}_stage_errors_total counter')
+    for stage, stats in snapshot.items():
+        lines.append(f'{prefix}_stage_errors_total{{stage="{stage}"}} {stats["errors"]}')
+    lines.append(f'# TYPE {prefix}_stage_retries_total counter')
+    for stage, stats in snapshot.items():
+        lines.append(f'{prefix}_stage_retries_total{{stage="{stage}"}} {stats["retries"]}')
+    return '\n'.join(lines) + '\n'
+
+
+def _write_jsonl(record):
+    with _jsonl_lock:
+        with open(TRACE_JSONL_PATH, 'a') as f:
+            f.write(json.dumps(record) + '\n')
@@ -0,0 +1,70 @@
+# worker.py
+#
+# Background workers for the multi-process deployment (DEPLOYMENT_MODE = 'workers' in config.py):
+# they prepare the contacts the app.py processes prefetch and run the operators' send actions,
+# taking jobs from the job queue every process on this host shares.
+#
+#   python worker.py                  # one process with WORKER_THREADS threads
+#   python worker.py --processes 4 --threads 2
+
+import argparse
+import multiprocessing
+import os
+import signal
+import socket
+import threading
+from utils.action_queue import action_job
+from utils.job_queue import run_worker, WORKER_THREADS
+from utils.prefetch import prepare_job
+
+# Job kind -> handler(payload, progress)
+HANDLERS = {
+    'prepare': prepare_job,
+    'action': action_job,
+}
+
+
+def serve(name, threads=WORKER_THREADS, exit_when_idle=False):
+    """Run jobs in this process until it is interrupted (or, with exit_when_idle, the queue is empty)."""
+    stop_event = threading.Event()
+    if threading.current_thread() is threading.main_thread():
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            signal.signal(signum, lambda *_: stop_event.set())
+    print(f"Worker {name} started with {threads} threads.")
+    run_worker(HANDLERS, name=name, threads=threads, stop_event=stop_event, exit_when_idle=exit_when_idle)
+    print(f"Worker {name} stopped.")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the outreach job workers for a multi-process deployment.")
+    parser.add_argument('--processes', type=int, default=1, help="worker processes to start")
+    parser.add_argument('--threads', type=int, default=WORKER_THREADS, help="jobs run at once per process")
+    parser.add_argument('--exit-when-idle', action='store_true', help="stop once the queue is empty")
+    args = parser.parse_args()
+
+    base = f'{socket.gethostname()}:{os.getpid()}'
+    if args.processes == 1:
+        serve(base, args.threads, args.exit_when_idle)
+        return
+
+    # Separate interpreters, so each process has its own SQLite connections and clients
+    context = multiprocessing.get_context('spawn')
+    processes = [
+        context.Process(
+            target=serve, args=(f'{base}-{index}', args.threads, args.exit_when_idle), name=f'worker-{index}',
+        )
+        for index in range(args.processes)
+    ]
+    for process in processes:
+        process.start()
+    try:
+        for process in processes:
+            process.join()
+    except KeyboardInterrupt:
+        # The children got the same SIGINT and finish their current jobs
+        for process in processes:
+            process.join()
+
+
+if __name__ == '__main__':
+    main()